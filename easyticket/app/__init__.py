@@ -39,15 +39,70 @@ def create_app(test_config: dict | None = None) -> Flask:
     app.config.setdefault("SQLALCHEMY_DATABASE_URI", _default_db_uri())
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["QR_SECRET"] = os.getenv("QR_SECRET", "change-this-to-a-long-random-secret")
+    # xoay khóa ký QR: QR_KEYS="kid:secret,..." + QR_ACTIVE_KID; QR_SECRET vẫn verify token cũ
+    app.config["QR_KEYS"] = os.getenv("QR_KEYS", "")
+    app.config["QR_ACTIVE_KID"] = os.getenv("QR_ACTIVE_KID", "")
+    # "v1" = token JSON (header.payload.sig), "v2" = token nhị phân gọn 37 ký tự; verify nhận cả hai
+    app.config["QR_TOKEN_FORMAT"] = os.getenv("QR_TOKEN_FORMAT", "v1")
+
+    # giữ chỗ vé khi tạo đơn + reaper giải phóng giữ chỗ hết hạn (0 = tắt reaper)
+    app.config["HOLD_TTL_SECONDS"] = int(os.getenv("HOLD_TTL_SECONDS", 600))
+    app.config["HOLD_REAPER_INTERVAL"] = int(os.getenv("HOLD_REAPER_INTERVAL", 30))
+    app.config["HOLD_REAPER_BATCH"] = int(os.getenv("HOLD_REAPER_BATCH", 500))
+
+    # dọn đơn chưa thanh toán quá hạn (0 = tắt sweeper nền, vẫn chạy được bằng `flask orders sweep`)
+    app.config["ORDER_SWEEP_AFTER_SECONDS"] = int(os.getenv("ORDER_SWEEP_AFTER_SECONDS", 24 * 3600))
+    app.config["ORDER_SWEEPER_INTERVAL"] = int(os.getenv("ORDER_SWEEPER_INTERVAL", 600))
+    app.config["ORDER_SWEEPER_BATCH"] = int(os.getenv("ORDER_SWEEPER_BATCH", 500))
+
+    # hàng chờ cho sự kiện nhu cầu cao (số phiên được vào trang mua vé cùng lúc / sự kiện)
+    app.config["WAITING_ROOM_CAPACITY"] = int(os.getenv("WAITING_ROOM_CAPACITY", 200))
+    app.config["WAITING_ROOM_ADMISSION_TTL"] = int(os.getenv("WAITING_ROOM_ADMISSION_TTL", 600))
+    app.config["WAITING_ROOM_IDLE_TIMEOUT"] = int(os.getenv("WAITING_ROOM_IDLE_TIMEOUT", 60))
+    app.config["WAITING_ROOM_FLAG_TTL"] = int(os.getenv("WAITING_ROOM_FLAG_TTL", 15))
+
+    # cache ảnh QR đã render (LRU trong process, thêm thư mục đĩa nếu cấu hình)
+    app.config["QR_IMAGE_CACHE_SIZE"] = int(os.getenv("QR_IMAGE_CACHE_SIZE", 2048))
+    app.config["QR_IMAGE_CACHE_DIR"] = os.getenv("QR_IMAGE_CACHE_DIR") or None
+
+    # chế độ "mở cổng" (soát vé từ bộ nhớ) tự tắt sau khoảng này nếu organizer quên đóng
+    app.config["DOORS_OPEN_MAX_SECONDS"] = int(os.getenv("DOORS_OPEN_MAX_SECONDS", 6 * 3600))
+
+    # dashboard check-in (SSE): nhịp gửi khi không có lượt quét + chu kỳ nạp lại bộ đếm từ DB
+    app.config["CHECKIN_STATS_HEARTBEAT"] = int(os.getenv("CHECKIN_STATS_HEARTBEAT", 15))
+    app.config["CHECKIN_STATS_RESYNC_SECONDS"] = int(os.getenv("CHECKIN_STATS_RESYNC_SECONDS", 30))
+
+    # cache số kết quả của trang chủ / tìm kiếm; vượt ngưỡng thì hiển thị số ước lượng (0 = luôn đếm đủ)
+    app.config["LISTING_COUNT_TTL"] = int(os.getenv("LISTING_COUNT_TTL", 60))
+    app.config["LISTING_COUNT_APPROX_THRESHOLD"] = int(os.getenv("LISTING_COUNT_APPROX_THRESHOLD", 10000))
+    app.config["LISTING_COUNT_CACHE_SIZE"] = int(os.getenv("LISTING_COUNT_CACHE_SIZE", 1024))
+    # cache kết quả tìm kiếm (id từng trang); TTL giới hạn độ cũ khi worker khác sửa sự kiện
+    app.config["SEARCH_CACHE_TTL"] = int(os.getenv("SEARCH_CACHE_TTL", 60))
+    app.config["SEARCH_CACHE_SIZE"] = int(os.getenv("SEARCH_CACHE_SIZE", 2048))
 
     if test_config:
         app.config.update(test_config)
 
+    # số thread phát hành vé nền sau thanh toán (0 = phát hành ngay trong request, mặc định khi test)
+    app.config.setdefault(
+        "ISSUANCE_WORKERS",
+        0 if app.config.get("TESTING") else int(os.getenv("ISSUANCE_WORKERS", 4)),
+    )
+    # số process render ảnh vé (xuất PDF/ZIP, tờ in); 0 = render ngay trong request, mặc định khi test
+    app.config.setdefault(
+        "RENDER_PROCESSES",
+        0 if app.config.get("TESTING") else int(os.getenv("RENDER_PROCESSES", max(1, (os.cpu_count() or 2) // 2))),
+    )
+    # font TrueType có dấu tiếng Việt cho ảnh vé (mặc định DejaVu Sans đi kèm trong app/static/fonts)
+    app.config.setdefault("RENDER_FONT_PATH", os.getenv("RENDER_FONT_PATH") or None)
+
     # -------- init extensions --------
     db.init_app(app)
     bcrypt.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
+    # API JSON của máy quét: chưa đăng nhập -> 401 thay vì redirect về trang login
+    login_manager.blueprint_login_views["qr"] = None
     migrate.init_app(app, db)
     babel.init_app(app)
 
@@ -64,7 +119,8 @@ def create_app(test_config: dict | None = None) -> Flask:
     with app.app_context():
         from app.models import (
             User, Category, EventType, Event,
-            TicketType, Ticket, Order, OrderDetail, Payment
+            TicketType, Ticket, Order, OrderDetail, Payment, TicketHold, TicketTypeShard,
+            IssuanceLedger
         )
         init_admin(admin, db.session)
 
@@ -87,6 +143,63 @@ def create_app(test_config: dict | None = None) -> Flask:
     app.register_blueprint(momo_bp)
     app.register_blueprint(qr_bp)
 
+    # flask CLI (flask inventory rebuild, ...)
+    from app.commands import register_commands
+    register_commands(app)
+
+    # hàng chờ in-process cho sự kiện nhu cầu cao
+    from app.services.waiting_room import WaitingRoom
+    from app.dao.event_dao import get_high_demand_event_ids
+    app.extensions["waiting_room"] = WaitingRoom(
+        capacity=app.config["WAITING_ROOM_CAPACITY"],
+        admission_ttl=app.config["WAITING_ROOM_ADMISSION_TTL"],
+        idle_timeout=app.config["WAITING_ROOM_IDLE_TIMEOUT"],
+        flag_ttl=app.config["WAITING_ROOM_FLAG_TTL"],
+        flag_loader=get_high_demand_event_ids,
+    )
+
+    # khóa ký QR: HMAC nạp khóa sẵn 1 lần, ký/verify chỉ copy()
+    from app.utils.qr_utils import build_keyring
+    app.extensions["qr_keyring"] = build_keyring(app.config)
+
+    from app.services.qr_image_cache import QRImageCache
+    app.extensions["qr_images"] = QRImageCache(
+        max_items=app.config["QR_IMAGE_CACHE_SIZE"],
+        disk_dir=app.config["QR_IMAGE_CACHE_DIR"],
+    )
+
+    # trạng thái soát vé trong bộ nhớ cho các sự kiện đang "mở cổng"
+    from app.services.doors_cache import DoorsRegistry
+    app.extensions["doors"] = DoorsRegistry(max_open_seconds=app.config["DOORS_OPEN_MAX_SECONDS"])
+
+    # cache số kết quả + kết quả tìm kiếm, tự xóa khi sự kiện / loại vé được commit thay đổi
+    from app.services.listing_cache import init_listing_cache
+    init_listing_cache(app)
+
+    # bộ đếm check-in + pub/sub cho dashboard SSE
+    from app.services.checkin_stats import CheckinStatsHub
+    app.extensions["checkin_stats"] = CheckinStatsHub(resync_seconds=app.config["CHECKIN_STATS_RESYNC_SECONDS"])
+
+    # worker phát hành vé nền (thread chỉ được tạo khi có việc)
+    from app.services.issuance_worker import IssuanceWorker
+    app.extensions["issuance_worker"] = IssuanceWorker(app, max_workers=app.config["ISSUANCE_WORKERS"])
+
+    # process pool render ảnh vé (chỉ tạo process khi có việc)
+    from app.services.ticket_render import RenderPool
+    app.extensions["render_pool"] = RenderPool(processes=app.config["RENDER_PROCESSES"])
+
+    # thread nền chạy trong process (chỉ khởi động khi app phục vụ request)
+    from app.services.background import init_background_workers
+    from app.dao.hold_dao import release_expired_holds
+    from app.dao.order_dao import sweep_abandoned_orders
+    init_background_workers(app, [
+        ("hold-reaper", "HOLD_REAPER_INTERVAL",
+         lambda: release_expired_holds(batch_size=app.config["HOLD_REAPER_BATCH"])),
+        ("order-sweeper", "ORDER_SWEEPER_INTERVAL",
+         lambda: sweep_abandoned_orders(app.config["ORDER_SWEEP_AFTER_SECONDS"],
+                                        batch_size=app.config["ORDER_SWEEPER_BATCH"])),
+    ])
+
     @login_manager.user_loader
     def load_user(user_id: str):
         from app.models import User
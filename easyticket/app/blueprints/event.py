@@ -1,39 +1,75 @@
-from flask import Blueprint, render_template, abort, request
+from flask import Blueprint, render_template, abort, request, jsonify
 from decimal import Decimal
-from app.dao.event_dao import get_event_by_id, search_events
+from app.dao.event_dao import get_event_by_id
 from datetime import datetime
 from flask import Blueprint, render_template, abort, flash, redirect, url_for
 from flask_login import login_required, current_user
 from app.dao.event_dao import get_event_by_id
-from app.dao.ticket_dao import get_ticket_type_by_event_id, count_sold_by_ticket_type
-from app.dao.ticket_type_dao import get_ticket_types_by_event
+from app.dao.ticket_dao import get_ticket_type_by_event_id
+from app.dao.ticket_type_dao import get_ticket_types_by_event, set_shard_layout
+from sqlalchemy.orm import selectinload
 from app.forms import EventForm, TicketTypeForm
 from app import db, dao
 from app.models import Event, EventType, Category, TicketType
 from app.services.cloudinary_service import CloudinaryService
+from app.services.listing_cache import count_events_cached, search_events_cached
+from app.services.waiting_room import (
+    get_waiting_room, has_admission, read_queue_token, session_queue_token
+)
 
 events_bp = Blueprint("event", __name__, url_prefix="/events")
 
 
 @events_bp.route("/<int:event_id>")
 def event_details(event_id: int):
+    # Sự kiện nhu cầu cao: phiên chưa được vào thì chuyển sang hàng chờ (không chạm DB)
+    if not has_admission(event_id):
+        return redirect(url_for("event.waiting_room", event_id=event_id))
+
     # Load event
     event = get_event_by_id(event_id)
     if not event:
         abort(404)
 
-    # Load ticket types
+    # Load ticket types (t.remaining đọc từ bộ đếm sold/reserved, không cần COUNT)
     ticket_types = get_ticket_type_by_event_id(event_id) or []
-    sold_map = count_sold_by_ticket_type([t.id for t in ticket_types])
-
-    # Tính remaining cho từng loại vé (nếu có DAO đếm số vé đã phát hành)
-    # count_sold_by_ticket_type trả về dict {ticket_type_id: sold_count}
-    for t in ticket_types:
-        sold = sold_map.get(t.id, 0)
-        t.remaining = max(0, (t.quantity or 0) - sold)
 
     return render_template("events/detail.html", event=event, ticket_types=ticket_types)
 
+# Hàng chờ cho sự kiện nhu cầu cao: trang chờ + endpoint trạng thái đọc từ bộ nhớ
+@events_bp.route("/<int:event_id>/queue")
+def waiting_room(event_id: int):
+    room = get_waiting_room()
+    if not room.is_gated(event_id):
+        return redirect(url_for("event.event_details", event_id=event_id))
+
+    token = session_queue_token(event_id, create=True)
+    position = room.join(event_id, read_queue_token(token, event_id))
+    if position is None:
+        return redirect(url_for("event.event_details", event_id=event_id))
+    return render_template("events/waiting_room.html", event_id=event_id, position=position, token=token)
+
+
+@events_bp.route("/<int:event_id>/queue/status")
+def waiting_room_status(event_id: int):
+    room = get_waiting_room()
+    token = request.args.get("token") or session_queue_token(event_id)
+    visitor_id = read_queue_token(token, event_id)
+    if not visitor_id:
+        return jsonify(ok=False, error="invalid_token"), 400
+
+    admitted, position = room.status(event_id, visitor_id)
+    if not admitted and position is None:
+        # bị loại khỏi hàng do không poll quá lâu -> xếp lại cuối hàng
+        position = room.join(event_id, visitor_id)
+        admitted = position is None
+    return jsonify(
+        ok=True,
+        admitted=admitted,
+        position=position,
+        redirect=url_for("event.event_details", event_id=event_id) if admitted else None,
+    )
+
 def _parse_date(s: str | None):
     if not s: return None
     try:
@@ -48,13 +84,14 @@ def _parse_date(s: str | None):
 @events_bp.route("/search")
 def search():
     q = request.args.get("q", "").strip()
-    page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor")
     event_type_id = request.args.get("event_type_id", type=int)
     category_id = request.args.get("category_id", type=int)
     start_date = _parse_date(request.args.get("start_date"))
     end_date = _parse_date(request.args.get("end_date"))
     location = request.args.get("location") or None
-    order_by = request.args.get("order_by", "newest")
+    # có từ khóa thì mặc định xếp theo mức liên quan
+    order_by = request.args.get("order_by") or ("relevance" if q else "newest")
 
     is_free_param = request.args.get("is_free")  # "1" | "0" | None
     is_free = None
@@ -63,17 +100,18 @@ def search():
     elif is_free_param == "0":
         is_free = False
 
-    page_obj = search_events(
+    filters = dict(
         q=q,
-        page=page, per_page=12,
         event_type_id=event_type_id,
         category_id=category_id,
         start_date=start_date,
         end_date=end_date,
         location=location,
         is_free=is_free,
-        order_by=order_by
     )
+    page_obj = search_events_cached(cursor=cursor, per_page=12, order_by=order_by, **filters)
+    # số kết quả lấy từ cache (chung cho mọi trang / thứ tự sắp xếp của cùng bộ lọc)
+    total = count_events_cached(**filters)
 
     events_type = EventType.query.filter_by(active=True).order_by(EventType.name.asc()).all()
     categories = Category.query.filter_by(active=True).order_by(Category.name.asc()).all()
@@ -90,7 +128,8 @@ def search():
         end_date=end_date.isoformat() if end_date else "",
         location=location or "",
         is_free=("1" if is_free is True else ("0" if is_free is False else "")),
-        order_by=order_by
+        order_by=order_by,
+        total=total
     )
 
 
@@ -124,11 +163,13 @@ def create_event():
             end_datetime=form.end_datetime.data,
             address=form.address.data,
             banner_image=uploaded_url,
+            high_demand=bool(form.high_demand.data),
             created_at=datetime.now(),
             updated_at=datetime.now()
         )
         db.session.add(new_event)
         db.session.commit()
+        get_waiting_room().invalidate_flags()
 
         flash("Sự kiện đã được tạo thành công!", "success")
         return redirect(url_for("organizer.dashboard"))
@@ -154,9 +195,11 @@ def edit_event(event_id):
         event.end_datetime = form.end_datetime.data
         event.address = form.address.data
         event.banner_image = form.banner_image.data or None
+        event.high_demand = bool(form.high_demand.data)
         event.updated_at = datetime.now()
 
         db.session.commit()
+        get_waiting_room().invalidate_flags()
         flash("Sự kiện đã được cập nhật!", "success")
         return redirect(url_for("event.view_event", event_id=event.id))
 
@@ -185,7 +228,7 @@ def api_get_ticket_types(event_id):
     q = request.args.get("q", "")
 
     # Lấy tất cả ticket types (không phân trang)
-    query = TicketType.query.filter(TicketType.event_id == event_id)
+    query = TicketType.query.filter(TicketType.event_id == event_id).options(selectinload(TicketType.shards))
     if q:
         query = query.filter(TicketType.name.ilike(f"%{q}%"))
 
@@ -194,8 +237,8 @@ def api_get_ticket_types(event_id):
 
     # Tính toán số liệu
     total_quantity = sum(t.quantity for t in ticket_types)
-    total_sold = 0
-    total_revenue = 0
+    total_sold = sum(t.sold_count for t in ticket_types)
+    total_revenue = sum((t.price or 0) * t.sold_count for t in ticket_types)
     best_selling_ticket = 0
 
     return render_template(
@@ -234,6 +277,9 @@ def create_ticket_type(event_id):
             updated_at=datetime.now()
         )
         db.session.add(new_ticket_type)
+        if (form.shard_count.data or 1) > 1:
+            db.session.flush()
+            set_shard_layout(new_ticket_type, form.shard_count.data)
         db.session.commit()
 
         flash("Loại vé đã được tạo thành công!", "success")
@@ -253,6 +299,7 @@ def edit_ticket_type(ticket_type_id):
 
     form = TicketTypeForm(obj=ticket_type)
     form.set_active_value(ticket_type)  # set giá trị active ban đầu
+    old_quantity = ticket_type.quantity
 
     if form.validate_on_submit():
         ticket_type.name = form.name.data
@@ -262,6 +309,14 @@ def edit_ticket_type(ticket_type_id):
         ticket_type.active = bool(form.active.data)
         ticket_type.updated_at = datetime.now()
 
+        # đổi chế độ shard / đổi số lượng của loại vé đang chia shard -> chia lại tồn kho
+        shard_count = form.shard_count.data or 1
+        if shard_count != ticket_type.shard_count or (ticket_type.is_sharded and ticket_type.quantity != old_quantity):
+            if not set_shard_layout(ticket_type, shard_count):
+                db.session.rollback()
+                flash("Loại vé đang có khách giữ chỗ, chưa thể đổi số shard hoặc số lượng. Vui lòng thử lại sau.", "warning")
+                return redirect(url_for("event.edit_ticket_type", ticket_type_id=ticket_type.id))
+
         db.session.commit()
         flash("Loại vé đã được cập nhật!", "success")
         return redirect(url_for("event.api_get_ticket_types", event_id=event.id))
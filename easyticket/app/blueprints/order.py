@@ -1,24 +1,27 @@
-from datetime import datetime, timezone
 from decimal import Decimal
-from io import BytesIO
 
-import qrcode
-from flask import Blueprint, request, redirect, url_for, render_template, flash, abort, send_file
+from flask import Blueprint, request, redirect, url_for, render_template, flash, abort, current_app, jsonify
 from flask_login import login_required
 from sqlalchemy.orm import joinedload
 from app import db
 from app.blueprints.vnpay import vnpay_service
-from app.dao.ticket_dao import count_sold_by_ticket_type
+from app.dao.hold_dao import hold_tickets
 from app.models import (
     Order, OrderDetail, Payment, Ticket, TicketType,
-    TicketStatus, PaymentStatus, PaymentMethod
+    TicketStatus, PaymentStatus, PaymentMethod, IssuanceStatus
 )
 from app.dao.order_dao import *
-from app.dao.ticket_dao import get_tickets_of_user
+from app.dao.ticket_dao import get_tickets_of_user, get_tickets_of_order
 from flask_login import current_user
 from app.services.momo_service import MoMoService, AccessDeniedException
 from app.services.vnpay_service import VNPayServiceImpl, AccessDeniedException
-from app.utils.qr_utils import sign_payload  # ở đầu file
+from app.services.issuance_service import request_issuance
+from app.dao.issuance_dao import get_issuance_status
+from app.services.waiting_room import has_admission, release_admission
+from app.services.qr_image_cache import get_qr_image_cache, qr_etag, qr_version, MIMETYPES
+from app.services.ticket_render import (
+    get_render_pool, ticket_card, card_png, card_pdf_page, stream_pdf, stream_zip
+)
 orders_bp = Blueprint("order", __name__, url_prefix="/orders")
 
 def _gen_order_code():
@@ -29,9 +32,8 @@ def _gen_txn_id():
     from uuid import uuid4
     return f"TXN-{str(uuid4())[:10].upper()}"
 
-def _gen_ticket_code():
-    from uuid import uuid4
-    return f"TKT-{str(uuid4())[:10].upper()}"
+def _lack_messages(ticket_types) -> list[str]:
+    return [f"'{t.name}' chỉ còn {t.remaining} vé." for t in ticket_types]
 
 @orders_bp.route("/create", methods=["POST"])
 def create():
@@ -42,6 +44,11 @@ def create():
     customer_id = current_user.id
     event_id = request.form.get("event_id", type=int)
 
+    # Sự kiện nhu cầu cao: chỉ phiên đã qua hàng chờ mới được tạo đơn
+    if not has_admission(event_id):
+        flash("Vui lòng xếp hàng trước khi mua vé cho sự kiện này.", "warning")
+        return redirect(url_for("event.waiting_room", event_id=event_id))
+
     # Parse items[<ticket_type_id>] = qty
     raw = {k: v for k, v in request.form.items() if k.startswith("items[")}
     items = []
@@ -75,14 +82,8 @@ def create():
         flash(" ".join(errors), "danger")
         return redirect(url_for("event.event_details", event_id=event_id))
 
-    # Kiểm tra remaining
-    sold = count_sold_by_ticket_type(ttype_ids)
-    lacks = []
-    for tid, qty in items:
-        t = tt_map[tid]
-        remaining = max(0, (t.quantity or 0) - sold.get(t.id, 0))
-        if qty > remaining:
-            lacks.append(f"'{t.name}' chỉ còn {remaining} vé.")
+    # Kiểm tra remaining (đọc bộ đếm trên TicketType)
+    lacks = _lack_messages([tt_map[tid] for tid, qty in items if qty > tt_map[tid].remaining])
     if lacks:
         flash(" ".join(lacks), "danger")
         return redirect(url_for("event.event_details", event_id=event_id))
@@ -109,8 +110,17 @@ def create():
         total += (t.price or Decimal("0")) * qty
 
     order.total_amount = total + (order.extra_fee or 0) - (order.discount or 0)
+
+    # Giữ chỗ có thời hạn (UPDATE reserved có điều kiện), cùng transaction với Order
+    lacking_ids = hold_tickets(order.id, items, current_app.config["HOLD_TTL_SECONDS"])
+    if lacking_ids:
+        db.session.rollback()
+        flash(" ".join(_lack_messages([db.session.get(TicketType, tid) for tid in lacking_ids])), "danger")
+        return redirect(url_for("event.event_details", event_id=event_id))
     db.session.commit()
 
+    # đơn đã giữ chỗ xong -> nhường suất vào cho người kế tiếp trong hàng chờ
+    release_admission(event_id)
     return redirect(url_for("order.checkout", order_id=order.id))
 
 
@@ -178,86 +188,77 @@ def pay(order_id):
 # ========== 4) Trang thành công + danh sách vé ==========
 @orders_bp.route("/<int:order_id>/success")
 def success(order_id):
-    tickets = (
-        db.session.query(Ticket)
-        .filter(Ticket.order_id == order_id)
-        .options(
-            joinedload(Ticket.event),
-            joinedload(Ticket.ticket_type)
-        )
-        .all()
-    )
+    tickets = get_tickets_of_order(order_id)
     if tickets is None:
         abort(404)
     return render_template("order/success.html", tickets=tickets)
 
 # ========== Helper: phát hành vé sau khi thanh toán ==========
-def _issue_tickets(order_id: int):
-    # Lấy các dòng order
-    ods = (
-        db.session.query(OrderDetail)
-        .options(joinedload(OrderDetail.ticket_type))
-        .filter(OrderDetail.order_id == order_id)
-        .all()
-    )
-    if not ods:
-        return
-
-    # Re-check capacity lần cuối (flow A)
-    ttype_ids = [od.ticket_type_id for od in ods]
-    sold = count_sold_by_ticket_type((ttype_ids))
-    for od in ods:
-        t = od.ticket_type
-        remaining = max(0, (t.quantity or 0) - sold.get(t.id, 0))
-        if od.quantity > remaining:
-            # Ở bản thật: đánh dấu Payment REFUND và báo hết vé.
-            raise ValueError(f"Hết vé {t.name} trong lúc thanh toán.")
-        sold[od.ticket_type_id] = sold.get(od.ticket_type_id, 0) + od.quantity
-
-    # Tạo Ticket
-
-    # for od in ods:
-    #     t = od.ticket_type
-    #     for _ in range(od.quantity):
-    #         db.session.add(Ticket(
-    #             ticket_code=_gen_ticket_code(),
-    #             status=TicketStatus.ACTIVE,
-    #             order_id=order_id,
-    #             ticket_type_id=od.ticket_type_id,
-    #             event_id=t.event_id,
-    #         ))
-    # Tạo Ticket + gắn QR
-    for od in ods:
-        ttype = od.ticket_type
-        for _ in range(od.quantity):
-            tk = Ticket(
-                ticket_code=_gen_ticket_code(),
-                status=TicketStatus.ACTIVE,
-                order_id=order_id,
-                ticket_type_id=od.ticket_type_id,
-                event_id=ttype.event_id,
-            )
-            db.session.add(tk)
-            db.session.flush()  # lấy tk.id
-
-            # ký QR cho vé
-            payload = {"tid": tk.id, "oid": order_id, "eid": ttype.event_id}
-            tk.qr_data = sign_payload(payload)
-            tk.issued_at = datetime.utcnow()
+def _issue_tickets(order_id: int, payment_id: int | None = None):
+    # idempotent: ghi sổ phát hành rồi giao cho worker nền (hoặc phát hành ngay nếu tắt worker),
+    # các lần sau chỉ trả lại bản ghi sổ (xem request_issuance)
+    return request_issuance(order_id, payment_id)
+
+def _issuance_result(order_id: int, payment_id: int | None = None):
+    # (status, tickets, error) cho trang kết quả thanh toán
+    entry = _issue_tickets(order_id, payment_id)
+    if entry.status == IssuanceStatus.ISSUED:
+        return "SUCCESS", get_tickets_of_order(order_id), None
+    if entry.status == IssuanceStatus.PENDING:
+        return "PROCESSING", [], None
+    return "FAILED", [], entry.error
+
+@orders_bp.route("/<int:order_id>/issuance-status")
+@login_required
+def issuance_status(order_id):
+    # endpoint nhẹ cho trang kết quả thanh toán poll: 1 query (sổ phát hành + chủ đơn)
+    row = get_issuance_status(order_id)
+    if not row:
+        return jsonify(ok=False, error="not_found"), 404
+    if row.customer_id != current_user.id:
+        abort(403)
+    return jsonify(ok=True, status=row.status.value, ticket_count=row.ticket_count, error=row.error)
 
-    db.session.commit()
 
 
+#Tải toàn bộ vé của 1 đơn: 1 file PDF (mỗi vé 1 trang) hoặc ZIP ảnh PNG, stream theo từng vé đã render
+@orders_bp.route("/<int:order_id>/tickets.<fmt>")
+@login_required
+def export_order_tickets(order_id, fmt):
+    if fmt not in ("pdf", "zip"):
+        abort(404)
+    order = get_order_by_id(order_id)
+    if not order:
+        abort(404)
+    if order.customer_id != current_user.id:
+        abort(403)
+    # dữ liệu render lấy hết trong request (1 query joinedload), process con không đụng DB
+    cards = [ticket_card(t) for t in get_tickets_of_order(order_id) if t.qr_data]
+    if not cards:
+        abort(404)
+
+    pool = get_render_pool()
+    font = current_app.config["RENDER_FONT_PATH"]
+    if fmt == "pdf":
+        body, mimetype = stream_pdf(pool.imap(card_pdf_page, cards, font)), "application/pdf"
+    else:
+        pngs = pool.imap(card_png, cards, font)
+        body, mimetype = stream_zip((f"{c['code']}.png", png) for c, png in zip(cards, pngs)), "application/zip"
+    resp = current_app.response_class(body, mimetype=mimetype)
+    resp.headers["Content-Disposition"] = f'attachment; filename="{order.order_code}-tickets.{fmt}"'
+    resp.headers["Cache-Control"] = "private, no-store"
+    return resp
+
 
 @orders_bp.route("/my-tickets")
 @login_required
 def my_tickets():
     q = request.args.get("q", "")
     status = request.args.get("status")  # ACTIVE/USED/CANCELLED/REFUNDED hoặc None
-    page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor")
 
     page_obj = get_tickets_of_user(
-        user_id=current_user.id, status=status, q=q, page=page, per_page=6
+        user_id=current_user.id, status=status, q=q, cursor=cursor, per_page=6
     )
 
     return render_template("order/my_tickets.html",
@@ -269,20 +270,11 @@ def momo_return():
     info = svc.verifyReturn(request.args.to_dict())
     MoMoService().processIPN(request.args.to_dict())
     tickets = []
+    status = "FAILED"
     if info["ok"] and str(info["resultCode"]) == "00":
-        _issue_tickets(int(info["orderId"]))
-        tickets = (
-            db.session.query(Ticket)
-            .filter(Ticket.order_id == int(info["orderId"]))
-            .options(
-                joinedload(Ticket.event),
-                joinedload(Ticket.ticket_type)
-            )
-            .all()
-        )
-        status = "SUCCESS"
-    else:
-        status = "FAILED"
+        status, tickets, error = _issuance_result(int(info["orderId"]), int(info["paymentId"]))
+        if error:
+            info["message"] = error
     return render_template(
         "payment/payment_return.html",
         status=status,
@@ -293,27 +285,18 @@ def momo_return():
         message=info["message"],
         resultCode=info["resultCode"],
         tickets=tickets
-    ), (200 if status=="SUCCESS" else 400)
+    ), (400 if status == "FAILED" else 200)
 
 @orders_bp.route("/payment/vnpay/return")
 def vnpay_return():
     info = VNPayServiceImpl.verifyReturn(request.args.to_dict())
     VNPayServiceImpl().processReturnUrl(request.args.to_dict())#Gọi để cập nhật db
     tickets = []
+    status = "FAILED"
     if info["ok"] and str(info["resultCode"]) == "00":
-        _issue_tickets(int(info["orderId"]))
-        tickets = (
-            db.session.query(Ticket)
-            .filter(Ticket.order_id == int(info["orderId"]))
-            .options(
-                joinedload(Ticket.event),
-                joinedload(Ticket.ticket_type)
-            )
-            .all()
-        )
-        status="SUCCESS"
-    else:
-        status="FAILED"
+        status, tickets, error = _issuance_result(int(info["orderId"]), int(info["paymentId"]))
+        if error:
+            info["message"] = error
     return render_template("payment/payment_return.html", **{
         "status": status,
         "orderId": info["orderId"],
@@ -323,30 +306,13 @@ def vnpay_return():
         "message": info["message"],
         "resultCode": info["resultCode"],
         "tickets": tickets,
-    }), (200 if status == "SUCCESS" else 400)
+    }), (400 if status == "FAILED" else 200)
 
 
 
 #Xem chi tiết vé của người dùng
-def _ensure_ticket_qr(ticket: Ticket):
-    #Phát hành token QR (HS256) nếu vé chưa có
-    if ticket.qr_data:
-        return
-
-    iat = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
-
-    payload = {
-        "ver": 1,
-        "code": ticket.ticket_code,
-        "event_id": ticket.event_id,
-        "type_id": ticket.ticket_type_id,
-        "iat": iat,
-    }
-    token = sign_payload(payload)
-    ticket.qr_data = token
-    ticket.issued_at = datetime.utcnow()
-    db.session.commit()
-
+# Chỉ đọc: token QR được ký lúc phát hành (TicketIssuanceService); vé cũ còn
+# qr_data NULL được ký bằng `flask qr backfill`, không ghi DB trong GET
 @orders_bp.route("/ticket/<int:ticket_id>")
 @login_required
 def ticket_detail(ticket_id):
@@ -367,12 +333,13 @@ def ticket_detail(ticket_id):
     if not t.order or t.order.customer_id != current_user.id:
         abort(403)
 
-    _ensure_ticket_qr(t)
-    return render_template("order/ticket_detail.html", t=t)
+    qr_v = qr_version(t.qr_data) if t.qr_data else None
+    return render_template("order/ticket_detail.html", t=t, qr_v=qr_v)
 
-@orders_bp.route("/ticket/<int:ticket_id>/qr.png")
+@orders_bp.route("/ticket/<int:ticket_id>/qr.png", defaults={"fmt": "png"})
+@orders_bp.route("/ticket/<int:ticket_id>/qr.svg", defaults={"fmt": "svg"})
 @login_required
-def ticket_qr_image(ticket_id):
+def ticket_qr_image(ticket_id, fmt="png"):
     t = (
         Ticket.query.options(joinedload(Ticket.order))
         .filter(Ticket.id == ticket_id)
@@ -382,12 +349,20 @@ def ticket_qr_image(ticket_id):
         abort(404)
     if not t.order or t.order.customer_id != current_user.id:
         abort(403)
+    if not t.qr_data:
+        abort(404)
 
-    _ensure_ticket_qr(t)
-
-    # render QR PNG từ token
-    img = qrcode.make(t.qr_data)
-    buf = BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    return send_file(buf, mimetype="image/png")
\ No newline at end of file
+    # ETag suy ra từ token: lần xem lại trả 304 mà không render / đọc cache
+    etag = qr_etag(t.qr_data, fmt)
+    if request.if_none_match.contains(etag):
+        resp = current_app.response_class(status=304)
+    else:
+        resp = current_app.response_class(get_qr_image_cache().get(t.qr_data, fmt), mimetype=MIMETYPES[fmt])
+    resp.set_etag(etag)
+    # URL có ?v=<digest token> (xem ticket_detail) thì ảnh không bao giờ đổi -> cache dài hạn;
+    # URL trần vẫn phải hỏi lại vì token có thể được ký lại
+    if request.args.get("v") == qr_version(t.qr_data):
+        resp.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    else:
+        resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
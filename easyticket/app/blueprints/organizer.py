@@ -1,13 +1,21 @@
+import json
+import queue
+
 from flask_login import current_user, login_required
 from flask import (
     render_template, request, jsonify,
-    flash, redirect, url_for, abort
+    flash, redirect, url_for, abort,
+    current_app, stream_with_context
 )
 
 from flask import render_template, abort, Blueprint, request
 
+from app import db
 from app.models import UserRole
 from app.dao import event_dao
+from app.services.doors_cache import get_doors
+from app.services.checkin_stats import get_checkin_stats
+from app.services.ticket_render import event_sheets_zip
 organizer_bp = Blueprint("organizer", __name__, url_prefix="/organizer")
 @organizer_bp.route('/dashboard')
 @login_required
@@ -15,14 +23,14 @@ def dashboard():
     if current_user.user_role != UserRole.ORGANIZER:
         abort(403)
 
-    page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor")
     status = request.args.get("status")
     keyword = request.args.get("q")
 
 
     events_pagination = event_dao.get_events_by_organizer(
         organizer_id=current_user.id,
-        page=page,
+        cursor=cursor,
         per_page=5,
         status=status,
         keyword=keyword
@@ -48,7 +56,110 @@ def scan_qr_view(event_id:int):
     if current_user.user_role.name != "ORGANIZER" or event.organizer_id != current_user.id:
         flash("Bạn không có quyền truy cập trang quét QR này.", "danger")
         return redirect(url_for("organizer.dashboard"))
-    return render_template("organizer/scan_qr.html", event=event)
+    doors = get_doors().get(event_id)
+    return render_template("organizer/scan_qr.html", event=event, doors=doors.stats() if doors else None)
+
+
+def _own_event_or_403(event_id: int):
+    from app.dao.event_dao import get_event_by_id
+    event = get_event_by_id(event_id)
+    if not event:
+        abort(404)
+    if current_user.user_role.name != "ORGANIZER" or event.organizer_id != current_user.id:
+        abort(403)
+    return event
+
+
+# Chế độ "mở cổng": nạp trạng thái vé của sự kiện vào bộ nhớ process để soát vé không cần tra DB
+@organizer_bp.route("/events/<int:event_id>/doors", methods=["GET"])
+@login_required
+def doors_status(event_id: int):
+    _own_event_or_403(event_id)
+    doors = get_doors().get(event_id)
+    return jsonify(ok=True, open=doors is not None, stats=doors.stats() if doors else None)
+
+
+@organizer_bp.route("/events/<int:event_id>/doors/open", methods=["POST"])
+@login_required
+def open_doors(event_id: int):
+    _own_event_or_403(event_id)
+    doors = get_doors().open(event_id)
+    return jsonify(ok=True, open=True, stats=doors.stats())
+
+
+@organizer_bp.route("/events/<int:event_id>/doors/close", methods=["POST"])
+@login_required
+def close_doors(event_id: int):
+    _own_event_or_403(event_id)
+    get_doors().close(event_id)
+    return jsonify(ok=True, open=False, stats=None)
+
+
+# Tờ in QR của cả sự kiện (in trước cho sự kiện có chỗ ngồi / danh sách khách mời):
+# ZIP các tờ A4 PNG, render trên process pool và stream theo từng tờ xong
+@organizer_bp.route("/events/<int:event_id>/print-sheets.zip")
+@login_required
+def print_sheets_zip(event_id: int):
+    event = _own_event_or_403(event_id)
+    stream = event_sheets_zip(event, current_app.config["RENDER_FONT_PATH"])
+    resp = current_app.response_class(stream_with_context(stream), mimetype="application/zip")
+    resp.headers["Content-Disposition"] = f'attachment; filename="event-{event_id}-print-sheets.zip"'
+    resp.headers["Cache-Control"] = "private, no-store"
+    return resp
+
+
+# Dashboard check-in trực tiếp: số vé đã vào theo loại vé + tốc độ quét, đẩy qua SSE
+@organizer_bp.route("/events/<int:event_id>/checkins")
+@login_required
+def checkin_dashboard(event_id: int):
+    event = _own_event_or_403(event_id)
+    return render_template("organizer/checkin_live.html", event=event)
+
+
+@organizer_bp.route("/events/<int:event_id>/checkins/stream")
+@login_required
+def checkin_stream(event_id: int):
+    """
+    text/event-stream: snapshot ban đầu, rồi 1 snapshot mỗi khi có lượt quét (từ pub/sub
+    trong process, không query) hoặc sau mỗi nhịp CHECKIN_STATS_HEARTBEAT giây.
+    Mỗi kết nối giữ 1 thread của worker trong lúc mở, nhưng không giữ connection DB:
+    session được trả về pool ngay sau kiểm tra quyền và sau mỗi lần nạp lại bộ đếm, nên
+    stream mở hàng giờ không chiếm pool và mỗi lần nạp lại đọc snapshot mới (REPEATABLE READ).
+    """
+    _own_event_or_403(event_id)
+    db.session.remove()
+    hub = get_checkin_stats()
+    heartbeat = current_app.config["CHECKIN_STATS_HEARTBEAT"]
+
+    def snapshot():
+        try:
+            return hub.snapshot(event_id)
+        finally:
+            db.session.remove()
+
+    @stream_with_context
+    def events():
+        try:
+            q = hub.subscribe(event_id)
+        finally:
+            db.session.remove()
+        try:
+            yield _sse(snapshot())
+            while True:
+                try:
+                    snap = q.get(timeout=heartbeat)
+                except queue.Empty:
+                    # không có lượt quét: tốc độ giảm dần, bộ đếm tự nạp lại khi quá hạn
+                    snap = snapshot()
+                yield _sse(snap)
+        finally:
+            hub.unsubscribe(event_id, q)
 
+    resp = current_app.response_class(events(), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"  # nginx không gom buffer
+    return resp
 
 
+def _sse(data: dict) -> str:
+    return f"event: stats\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
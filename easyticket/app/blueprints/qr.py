@@ -1,12 +1,23 @@
 # app/blueprints/qr.py
-from flask import Blueprint, jsonify, request
+from datetime import datetime, timezone
+from flask import Blueprint, jsonify, request, abort
+from flask_login import login_required, current_user
+from app.dao.event_dao import get_event_by_id
 from app.dao.ticket_dao import (
-   get_ticket_by_id, get_ticket_by_qr, save_ticket_qr, mark_checked_in
+   get_ticket_by_id, save_ticket_qr, checkin_by_qr, checkin_batch
 )
+from app.models import TicketStatus
+from app.services.checkin_service import build_manifest, verify_manifest
+from app.services.checkin_stats import record_scans
+from app.services.doors_cache import checkin_from_memory
 from app.utils.qr_utils import *
 
 qr_bp = Blueprint("qr", __name__, url_prefix="/api/qr")
 
+# số lượt quét tối đa / request đồng bộ hoặc validate-batch (1 SELECT ... IN + 1 UPDATE)
+MAX_SYNC_SCANS = 500
+MAX_BATCH_SCANS = 300
+
 
 @qr_bp.post("/issue/<int:ticket_id>")
 def issue_qr(ticket_id: int):
@@ -21,8 +32,8 @@ def issue_qr(ticket_id: int):
        return jsonify(ok=True, ticket_id=t.id, qr=t.qr_data)
 
 
-   payload = {"tid": t.id, "oid": t.order_id, "eid": t.event_id}
-   token = sign_payload(payload)
+   # vé phát hành sau thanh toán đã có token; nhánh này chỉ cho dữ liệu cũ chưa backfill
+   token = ticket_token(t.ticket_code, t.order_id, t.event_id, ticket_id=t.id)
    save_ticket_qr(t, token)
    return jsonify(ok=True, ticket_id=t.id, qr=token)
 
@@ -49,79 +60,186 @@ def validate_and_checkin():
        return jsonify(ok=False, error="invalid_qr", detail=msg), 400
 
 
-   # lookup ticket by exact qr_data
-   t = get_ticket_by_qr(token)
-   if not t:
+   try:
+       event_id = int(event_id)
+   except (TypeError, ValueError):
+       return jsonify(ok=False, error="missing_qr_or_event"), 400
+
+   # sự kiện đang mở cổng: trả lời từ bộ nhớ, chỉ ghi check-in xuống DB
+   hit = checkin_from_memory(event_id, token, payload)
+   if hit is not None:
+       record_scans(event_id, [hit])
+       return _single_response(*hit)
+
+   # check-in bằng 1 UPDATE có điều kiện (status=ACTIVE) + 1 SELECT join dữ liệu hiển thị;
+   # rowcount quyết định thành công nên 2 cổng quét cùng lúc không thể cùng cho vào
+   checked_in, v = checkin_by_qr(token, event_id)
+   if not v:
+       record_scans(event_id, [("ticket_not_found", None, None)])
        return jsonify(ok=False, error="ticket_not_found"), 404
 
+   if checked_in:
+       error = None
+   elif v.event_id != event_id:
+       error = "wrong_event"
+   elif v.status == TicketStatus.USED:
+       error = "already_checked_in"
+   else:
+       error = "invalid_state"
+   record_scans(event_id, [(error, v, v.use_at)])
+   return _single_response(error, v, v.use_at)
+
 
-   # ensure ticket belongs to event being scanned
-   if t.event_id != int(event_id):
-       return jsonify(ok=False, error="wrong_event"), 400
+def _single_response(error, v, checked_at):
+   result = _scan_result(error, v, checked_at)
+   return jsonify(**result), (200 if error in (None, "already_checked_in") else 400)
 
 
-   # build buyer info (if available)
-   buyer = None
+@qr_bp.post("/validate-batch")
+@login_required
+def validate_and_checkin_batch():
+   """
+   Check-in nhiều vé 1 lần (cổng xoay / máy quét gom lượt): {"qr": [".", ...], "event_id": <id>}
+   Xác thực chữ ký từng token, tra tất cả vé bằng 1 query IN và check-in trong 1 transaction.
+   results[i] cùng dạng với /validate cho token thứ i (checked_in / already_checked_in / wrong_event / ...).
+   """
+   data = request.get_json(silent=True) or {}
+   tokens = data.get("qr")
+   event_id = data.get("event_id")
+   if not tokens or not isinstance(tokens, list) or not event_id:
+       return jsonify(ok=False, error="missing_qr_or_event"), 400
+   if len(tokens) > MAX_BATCH_SCANS:
+       return jsonify(ok=False, error="too_many_scans", max=MAX_BATCH_SCANS), 413
    try:
-       if getattr(t, "order", None) and getattr(t.order, "customer", None):
-           c = t.order.customer
-           buyer = {
-               "id": c.id,
-               "username": c.username,
-               "first_name": getattr(c, "first_name", None),
-               "last_name": getattr(c, "last_name", None),
-               "email": getattr(c, "email", None),
-               "phone": getattr(c, "phone", None)
-           }
-   except Exception:
-       buyer = None
-
-
-   # If already used (checked-in) -> return specific payload (don't re-mark)
-   from app.models import TicketStatus
-   if t.status == TicketStatus.USED:
-       # format checked time if exists
-       checked_at = t.use_at.isoformat() if getattr(t, "use_at", None) else None
-       return jsonify(
-           ok=False,
-           error="already_checked_in",
-           message="Ticket already checked-in",
-           ticket={
-               "id": t.id,
-               "ticket_code": t.ticket_code,
-               "ticket_type": getattr(t.ticket_type, "name", None),
-               "issued_at": t.issued_at.isoformat() if getattr(t, "issued_at", None) else None,
-           },
-           buyer=buyer,
-           checked_at=checked_at
-       ), 200
-
-
-   # Only ACTIVE allowed to be checked in
-   if t.status != TicketStatus.ACTIVE:
-       return jsonify(ok=False, error="invalid_state", message=f"Invalid state: {t.status.value}"), 400
-
-
-   # perform check-in
-   # (mark_checked_in will set status=USED and use_at to now)
-   prev_use_at = getattr(t, "use_at", None)
-   mark_checked_in(t)  # commits
-
-
-   # reload or use t.use_at (mark_checked_in already saved)
-   checked_at = t.use_at.isoformat() if getattr(t, "use_at", None) else None
-
-
-   return jsonify(
-       ok=True,
-       message="checked_in",
-       ticket={
-           "id": t.id,
-           "ticket_code": t.ticket_code,
-           "ticket_type": getattr(t.ticket_type, "name", None),
-           "issued_at": t.issued_at.isoformat() if getattr(t, "issued_at", None) else None,
-       },
-       buyer=buyer,
-       checkin_at=checked_at
-   ), 200
+       event_id = int(event_id)
+   except (TypeError, ValueError):
+       return jsonify(ok=False, error="missing_qr_or_event"), 400
+   _require_event_organizer(event_id)
+
+   results = [None] * len(tokens)
+   now = datetime.utcnow()
+   valid = []  # (vị trí trong request, token)
+   for i, token in enumerate(tokens):
+       ok, _, msg = verify_token(token) if isinstance(token, str) else (False, None, "Malformed QR")
+       if ok:
+           valid.append((i, token))
+       else:
+           results[i] = {"ok": False, "error": "invalid_qr", "detail": msg}
+
+   outcomes = checkin_batch(event_id, [(token, now) for _, token in valid])
+   for (i, _), (error, v, checked_at) in zip(valid, outcomes):
+       results[i] = _scan_result(error, v, checked_at)
+   record_scans(event_id, outcomes, invalid=len(tokens) - len(valid))
+
+   return jsonify(ok=True, checked_in=sum(1 for r in results if r["ok"]), results=results), 200
+
+
+def _scan_result(error, v, checked_at):
+   # kết quả 1 lượt quét, cùng dạng JSON với /validate
+   if error is None:
+       return {"ok": True, "message": "checked_in", "ticket": _ticket_json(v), "buyer": _buyer_json(v),
+               "checkin_at": checked_at.isoformat() if checked_at else None}
+   if error == "already_checked_in":
+       return {"ok": False, "error": error, "message": "Ticket already checked-in", "ticket": _ticket_json(v),
+               "buyer": _buyer_json(v), "checked_at": checked_at.isoformat() if checked_at else None}
+   if error == "invalid_state":
+       return {"ok": False, "error": error, "message": f"Invalid state: {v.status.value}"}
+   return {"ok": False, "error": error}
+
+
+def _ticket_json(v):
+   return {
+       "id": v.id,
+       "ticket_code": v.ticket_code,
+       "ticket_type": v.ticket_type,
+       "issued_at": v.issued_at.isoformat() if v.issued_at else None,
+   }
+
+
+def _buyer_json(v):
+   if v.buyer_id is None:
+       return None
+   return {
+       "id": v.buyer_id,
+       "username": v.username,
+       "first_name": v.first_name,
+       "last_name": v.last_name,
+       "email": v.email,
+       "phone": v.phone
+   }
+
+
+def _require_event_organizer(event_id: int):
+   event = get_event_by_id(event_id)
+   if not event:
+       abort(404)
+   if current_user.user_role.name != "ORGANIZER" or event.organizer_id != current_user.id:
+       abort(403)
+   return event
+
+
+def _parse_scanned_at(value, now: datetime) -> datetime:
+   # giờ quét do máy quét gửi (ISO, thường có 'Z'); lưu dạng UTC naive như use_at hiện tại
+   try:
+       at = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+   except (TypeError, ValueError):
+       return now
+   if at.tzinfo:
+       at = at.astimezone(timezone.utc).replace(tzinfo=None)
+   return min(at, now)
+
+
+@qr_bp.get("/manifest/<int:event_id>")
+@login_required
+def checkin_manifest(event_id: int):
+   """
+   Manifest check-in offline (digest + trạng thái của mọi vé đã có QR) để máy quét
+   tải về trước giờ mở cổng rồi tự xác thực vé khi mất mạng.
+   """
+   _require_event_organizer(event_id)
+   resp = jsonify(ok=True, manifest=build_manifest(event_id))
+   resp.headers["Cache-Control"] = "no-store"
+   return resp
+
 
+@qr_bp.post("/sync")
+@login_required
+def sync_offline_checkins():
+   """
+   Máy quét gửi lại các lượt check-in offline:
+   {"event_id": <id>, "manifest": {"generated_at", "kid", "sha256", "signature"},
+    "scans": [{"qr": ".", "scanned_at": "<iso>"}, ...]}
+   manifest là bằng chứng manifest máy quét đã dùng; sai chữ ký -> 400 invalid_manifest, không ghi gì.
+   Xung đột: vé đã check-in trong DB (cổng khác / lần đồng bộ trước) giữ nguyên, trong cùng lô lượt quét sớm nhất thắng.
+   Trả về kết quả từng lượt theo đúng thứ tự gửi lên.
+   """
+   data = request.get_json(silent=True) or {}
+   event_id = data.get("event_id")
+   scans = data.get("scans") or []
+   if not event_id or not isinstance(scans, list):
+       return jsonify(ok=False, error="missing_scans_or_event"), 400
+   if len(scans) > MAX_SYNC_SCANS:
+       return jsonify(ok=False, error="too_many_scans", max=MAX_SYNC_SCANS), 413
+   try:
+       event_id = int(event_id)
+   except (TypeError, ValueError):
+       return jsonify(ok=False, error="missing_scans_or_event"), 400
+   _require_event_organizer(event_id)
+   if not verify_manifest(event_id, data.get("manifest")):
+       return jsonify(ok=False, error="invalid_manifest"), 400
+
+   now = datetime.utcnow()
+   parsed = [(str(s.get("qr") or ""), _parse_scanned_at(s.get("scanned_at"), now))
+             for s in scans if isinstance(s, dict)]
+   results = []
+   outcomes = checkin_batch(event_id, parsed)
+   record_scans(event_id, outcomes)
+   for error, v, checked_at in outcomes:
+       results.append({
+           "ok": error is None,
+           "error": error,
+           "ticket_id": v.id if v else None,
+           "ticket_code": v.ticket_code if v else None,
+           "checked_at": checked_at.isoformat() if checked_at else None,
+       })
+   return jsonify(ok=True, checked_in=sum(1 for r in results if r["ok"]), results=results)
@@ -0,0 +1,102 @@
+# app/commands.py
+import click
+from flask.cli import AppGroup
+
+inventory_cli = AppGroup("inventory", help="Quản lý bộ đếm tồn kho vé.")
+
+
+@inventory_cli.command("rebuild")
+@click.option("--event-id", type=int, default=None, help="Chỉ tính lại cho 1 sự kiện.")
+def rebuild_inventory(event_id):
+    """Tính lại bộ đếm sold/reserved của TicketType từ bảng ticket và ticket_hold."""
+    from app.dao.ticket_type_dao import rebuild_inventory_counters
+    n = rebuild_inventory_counters(event_id=event_id)
+    click.echo(f"Đã tính lại tồn kho cho {n} loại vé.")
+
+
+holds_cli = AppGroup("holds", help="Giữ chỗ vé khi tạo đơn.")
+
+
+@holds_cli.command("reap")
+@click.option("--batch-size", type=int, default=500, show_default=True)
+def reap_holds(batch_size):
+    """Giải phóng các giữ chỗ đã hết hạn."""
+    from app.dao.hold_dao import release_expired_holds
+    n = release_expired_holds(batch_size=batch_size)
+    click.echo(f"Đã giải phóng {n} giữ chỗ hết hạn.")
+
+
+orders_cli = AppGroup("orders", help="Dọn dẹp đơn hàng.")
+
+
+@orders_cli.command("sweep")
+@click.option("--older-than", type=int, default=None,
+              help="Số giây kể từ lúc tạo đơn (mặc định ORDER_SWEEP_AFTER_SECONDS).")
+@click.option("--batch-size", type=int, default=500, show_default=True)
+def sweep_orders(older_than, batch_size):
+    """Xoá các đơn chưa thanh toán quá hạn (kèm chi tiết đơn, payment PENDING/FAILED, giữ chỗ)."""
+    from flask import current_app
+    from app.dao.order_dao import sweep_abandoned_orders
+    older_than = older_than if older_than is not None else current_app.config["ORDER_SWEEP_AFTER_SECONDS"]
+    n = sweep_abandoned_orders(older_than, batch_size=batch_size)
+    click.echo(f"Đã xoá {n} đơn hàng bị bỏ ngang.")
+
+
+qr_cli = AppGroup("qr", help="Mã QR của vé.")
+
+
+@qr_cli.command("resign")
+@click.option("--batch-size", type=int, default=1000, show_default=True)
+@click.option("--event-id", type=int, default=None, help="Chỉ ký lại vé của 1 sự kiện.")
+def resign_qr(batch_size, event_id):
+    """
+    Ký lại QR của các vé chưa dùng khóa QR_ACTIVE_KID (giữ định dạng v1/v2 và payload).
+    Soát vé so khớp qr_data nên QR cũ đã tải/in sẽ không còn khớp: chạy trước khi gửi lại vé.
+    """
+    from app.dao.ticket_dao import resign_tickets_qr
+    from app.utils.qr_utils import get_keyring, resign_token
+    ring = get_keyring()
+    n, skipped = resign_tickets_qr(resign_token, ring.active_prefixes(),
+                                   batch_size=batch_size, event_id=event_id)
+    click.echo(f"Đã ký lại {n} vé bằng khóa {ring.active_kid or '(QR_SECRET)'}; bỏ qua {skipped} QR không hợp lệ.")
+
+
+@qr_cli.command("backfill")
+@click.option("--batch-size", type=int, default=1000, show_default=True)
+def backfill_qr(batch_size):
+    """Ký QR cho các vé cũ còn qr_data NULL (cùng định dạng token với lúc phát hành)."""
+    from app.dao.ticket_dao import backfill_tickets_qr
+    from app.utils.qr_utils import ticket_token
+    n = backfill_tickets_qr(
+        lambda tid, code, order_id, event_id: ticket_token(code, order_id, event_id, ticket_id=tid),
+        batch_size=batch_size,
+    )
+    click.echo(f"Đã ký QR cho {n} vé.")
+
+
+@qr_cli.command("sheets")
+@click.argument("event_id", type=int)
+@click.option("--output", "-o", type=click.Path(dir_okay=False, writable=True), default=None,
+              help="File ZIP đích (mặc định event-<id>-print-sheets.zip).")
+def print_qr_sheets(event_id, output):
+    """Render tờ in QR (A4, nhiều nhãn / tờ) cho mọi vé của 1 sự kiện ra file ZIP."""
+    from flask import current_app
+    from app.services.ticket_render import event_sheets_zip
+    from app.dao.event_dao import get_event_by_id
+    event = get_event_by_id(event_id)
+    if not event:
+        raise click.ClickException(f"Không tìm thấy sự kiện {event_id}.")
+    output = output or f"event-{event_id}-print-sheets.zip"
+    size = 0
+    with open(output, "wb") as f:
+        for chunk in event_sheets_zip(event, current_app.config["RENDER_FONT_PATH"]):
+            f.write(chunk)
+            size += len(chunk)
+    click.echo(f"Đã ghi {output} ({size / 1024:.0f} KB).")
+
+
+def register_commands(app):
+    app.cli.add_command(inventory_cli)
+    app.cli.add_command(holds_cli)
+    app.cli.add_command(orders_cli)
+    app.cli.add_command(qr_cli)
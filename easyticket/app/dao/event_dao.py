@@ -1,11 +1,14 @@
 from app.models import db, Event, EventStatus, EventType, TicketType
-from sqlalchemy import or_, func
+from sqlalchemy import or_, and_, func, text, Integer, Float
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import joinedload
 from datetime import datetime
+from app.utils.search_utils import search_terms, fts5_query, mysql_boolean_query
+from app.utils.pagination import keyset_page
 
-# Lay het
-def get_all_events(page: int =1, per_page: int = 12):
-    return Event.query.order_by(Event.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+# Lay het (phan trang keyset theo (created_at, id), cursor lay tu trang truoc)
+def get_all_events(cursor: str | None = None, per_page: int = 12):
+    return keyset_page(Event.query, [(Event.created_at, True), (Event.id, True)], cursor, per_page)
 
 
 # lay theo id
@@ -13,20 +16,47 @@ def get_event_by_id(event_id):
     return Event.query.get(event_id)
 
 
-# tim kiem su kien
-def search_events(q: str | None, page: int = 1, per_page: int = 12, event_type_id: int | None = None,
-    category_id: int | None = None,start_date: datetime | None = None,
+# Lay nhieu su kien bang 1 query IN, giu dung thu tu ids (id khong con ton tai bi bo qua)
+def get_events_by_ids(ids) -> list:
+    if not ids:
+        return []
+    by_id = {e.id: e for e in Event.query.filter(Event.id.in_(ids))}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+# Loc full-text tren event.search_text (da bo dau) theo dialect.
+# Tra ve (query, (bieu thuc diem lien quan, giam dan?) | None)
+def _apply_fulltext(qry, terms: list[str]):
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        # bm25 cang nho cang lien quan
+        fts = (
+            text("SELECT rowid AS event_id, bm25(event_fts) AS rank FROM event_fts WHERE event_fts MATCH :fts_q")
+            .bindparams(fts_q=fts5_query(terms))
+            .columns(event_id=Integer, rank=Float)
+            .subquery("fts")
+        )
+        return qry.join(fts, fts.c.event_id == Event.id), (fts.c.rank, False)
+    if dialect == "mysql":
+        # MATCH ... AGAINST (... IN BOOLEAN MODE), diem cang lon cang lien quan
+        match = Event.search_text.match(mysql_boolean_query(terms))
+        return qry.filter(match), (match, True)
+    # dialect khac: khong co chi muc, van tim tren ban da bo dau
+    return qry.filter(and_(*[Event.search_text.like(f"%{t}%") for t in terms])), None
+
+
+# Query loc su kien da cong bo theo bo loc tim kiem. Tra ve (query, diem lien quan | None)
+def _search_query(q: str | None = None, event_type_id: int | None = None,
+    category_id: int | None = None, start_date: datetime | None = None,
     end_date: datetime | None = None,
     location: str | None = None,
-    is_free: bool | None = None,
-    order_by: str = "created_at"  ):
+    is_free: bool | None = None):
     qry = Event.query.filter(Event.status == EventStatus.PUBLISHED)
-    #Theo keyword
-    if q:
-        kw = f"%{q.strip()}%"
-        qry = qry.filter(or_(Event.name.ilike(kw),
-                             Event.description.ilike(kw),
-                             Event.address.ilike(kw)))
+    #Theo keyword: chi muc full-text tren ten/mo ta/dia chi da bo dau ("ha noi" khop "Hà Nội")
+    rank = None
+    terms = search_terms(q)
+    if terms:
+        qry, rank = _apply_fulltext(qry, terms)
 
     #Theo loai su kien
     if event_type_id:
@@ -44,31 +74,89 @@ def search_events(q: str | None, page: int = 1, per_page: int = 12, event_type_i
     if location:
         qry = qry.filter(Event.address.ilike(f"%{location.strip()}%"))
 
+    # EXISTS thay cho join: moi su kien chi 1 dong du co nhieu loai ve khop (keyset can dieu nay)
     if is_free is not None:
-        qry = qry.join(Event.ticket_types)
         if is_free:
-            qry = qry.filter(TicketType.price == 0)
+            qry = qry.filter(Event.ticket_types.any(TicketType.price == 0))
         else:
-            qry = qry.filter(TicketType.price > 0)
+            qry = qry.filter(Event.ticket_types.any(TicketType.price > 0))
+    return qry, rank
+
 
-        # sắp xếp
-    if order_by == "oldest":
-        qry = qry.order_by(Event.created_at.asc())
+# tim kiem su kien
+def search_events(q: str | None, cursor: str | None = None, per_page: int = 12, event_type_id: int | None = None,
+    category_id: int | None = None,start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    location: str | None = None,
+    is_free: bool | None = None,
+    order_by: str = "created_at"  ):
+    qry, rank = _search_query(q, event_type_id=event_type_id, category_id=category_id, start_date=start_date,
+                              end_date=end_date, location=location, is_free=is_free)
+
+        # sắp xếp: luôn kết thúc bằng id để khóa keyset là duy nhất
+    if order_by == "relevance" and rank is not None:
+        order = [rank, (Event.created_at, True), (Event.id, True)]
+    elif order_by == "oldest":
+        order = [(Event.created_at, False), (Event.id, False)]
     elif order_by == "start_asc":
-        qry = qry.order_by(Event.start_datetime.asc())
+        order = [(Event.start_datetime, False), (Event.id, False)]
     elif order_by == "name":
-        qry = qry.order_by(func.lower(Event.name).asc())
+        order = [(func.lower(Event.name), False), (Event.id, False)]
     else:  # newest
-        qry = qry.order_by(Event.created_at.desc())
-
-    return qry.paginate(page=page, per_page=per_page, error_out=False)
+        order = [(Event.created_at, True), (Event.id, True)]
+
+    return keyset_page(qry, order, cursor, per_page)
+
+
+# Dem su kien da cong bo theo bo loc (cung tham so voi search_events).
+# limit: chi dem toi da limit dong (COUNT tren subquery LIMIT) de gioi han chi phi khi tap ket qua rat lon
+def count_events(limit: int | None = None, **filters) -> int:
+    qry, _ = _search_query(**filters)
+    qry = qry.with_entities(Event.id).order_by(None)
+    if limit:
+        qry = qry.limit(limit)
+    return db.session.query(func.count()).select_from(qry.subquery()).scalar() or 0
+
+
+# Dem tat ca su kien (danh sach trang chu)
+def count_all_events(limit: int | None = None) -> int:
+    qry = db.session.query(Event.id)
+    if limit:
+        qry = qry.limit(limit)
+    return db.session.query(func.count()).select_from(qry.subquery()).scalar() or 0
+
+
+# Uoc luong so dong bang event tu thong ke cua DB (khong quet bang); None neu khong co thong ke
+def estimate_event_rows() -> int | None:
+    dialect = db.engine.dialect.name
+    if dialect == "mysql":
+        n = db.session.execute(text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'event'"
+        )).scalar()
+        return int(n) if n is not None else None
+    if dialect == "sqlite":
+        # sqlite_stat1 chi co sau ANALYZE; cot stat bat dau bang so dong cua bang
+        try:
+            stat = db.session.execute(text(
+                "SELECT stat FROM sqlite_stat1 WHERE tbl = 'event' LIMIT 1"
+            )).scalar()
+        except OperationalError:
+            return None
+        return int(stat.split()[0]) if stat else None
+    return None
+
+
+#Id cac su kien dang bat hang cho (waiting room)
+def get_high_demand_event_ids() -> list[int]:
+    return [eid for (eid,) in db.session.query(Event.id).filter(Event.high_demand == True).all()]
 
 
 def get_all_event_types():
     return EventType.query.all()
 
 
-def get_events_by_organizer(organizer_id, page=1, per_page=10, status=None, keyword=None):
+def get_events_by_organizer(organizer_id, cursor=None, per_page=10, status=None, keyword=None):
     query = Event.query.filter_by(organizer_id=organizer_id)
 
     # Lọc theo trạng thái (status)
@@ -84,8 +172,8 @@ def get_events_by_organizer(organizer_id, page=1, per_page=10, status=None, keyw
             )
         )
 
-    # Trả về đối tượng phân trang
-    return query.order_by(Event.start_datetime.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    # Trả về trang keyset theo (start_datetime, id)
+    return keyset_page(query, [(Event.start_datetime, True), (Event.id, True)], cursor, per_page)
 
 
 def delete_event_by_id(event_id):
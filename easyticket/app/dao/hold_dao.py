@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+from app.models import db, TicketHold
+from app.dao.ticket_type_dao import reserve_stock, release_reserved, convert_reserved
+
+
+#Giu cho cho cac dong don hang; tra ve danh sach ticket_type_id khong du ve (khong commit)
+def hold_tickets(order_id: int, items: list[tuple[int, int]], ttl_seconds: int) -> list[int]:
+    expires_at = datetime.now() + timedelta(seconds=ttl_seconds)
+    lacks = []
+    for ticket_type_id, qty in items:
+        parts = reserve_stock(ticket_type_id, qty)
+        if parts is None:
+            lacks.append(ticket_type_id)
+            continue
+        # loai ve chia shard co the giu cho tren nhieu shard -> 1 hold / shard
+        for shard_no, part_qty in parts:
+            db.session.add(TicketHold(
+                order_id=order_id,
+                ticket_type_id=ticket_type_id,
+                shard_no=shard_no,
+                quantity=part_qty,
+                expires_at=expires_at,
+            ))
+    return lacks
+
+def get_holds_of_order(order_id: int):
+    return TicketHold.query.filter_by(order_id=order_id).all()
+
+#Chuyen toan bo hold cua don thanh ve da ban; tra ve {ticket_type_id: qty} (khong commit)
+def convert_holds(order_id: int) -> dict[int, int]:
+    holds = (
+        db.session.query(TicketHold)
+        .filter(TicketHold.order_id == order_id)
+        .with_for_update()
+        .all()
+    )
+    converted = {}
+    for h in holds:
+        convert_reserved(h.ticket_type_id, h.quantity, h.shard_no)
+        converted[h.ticket_type_id] = converted.get(h.ticket_type_id, 0) + h.quantity
+        db.session.delete(h)
+    return converted
+
+#Huy hold cua 1 don va tra lai reserved (khong commit)
+def release_order_holds(order_id: int) -> int:
+    holds = (
+        db.session.query(TicketHold)
+        .filter(TicketHold.order_id == order_id)
+        .with_for_update()
+        .all()
+    )
+    for h in holds:
+        release_reserved(h.ticket_type_id, h.quantity, h.shard_no)
+        db.session.delete(h)
+    return len(holds)
+
+#Tra reserved cua 1 lo hold (gop theo loai ve/shard) roi xoa bang 1 lenh DELETE (khong commit)
+def _release_holds(holds: list[TicketHold]) -> None:
+    released = {}
+    for h in holds:
+        key = (h.ticket_type_id, h.shard_no)
+        released[key] = released.get(key, 0) + h.quantity
+    for (ticket_type_id, shard_no), qty in released.items():
+        release_reserved(ticket_type_id, qty, shard_no)
+    (
+        db.session.query(TicketHold)
+        .filter(TicketHold.id.in_([h.id for h in holds]))
+        .delete(synchronize_session=False)
+    )
+
+#Huy hold cua nhieu don 1 luc (don bi don dep) (khong commit)
+def release_holds_of_orders(order_ids: list[int]) -> int:
+    if not order_ids:
+        return 0
+    holds = (
+        db.session.query(TicketHold)
+        .filter(TicketHold.order_id.in_(order_ids))
+        .with_for_update()
+        .all()
+    )
+    if holds:
+        _release_holds(holds)
+    return len(holds)
+
+#Giai phong cac hold da het han theo tung lo, moi lo 1 transaction ngan
+def release_expired_holds(batch_size: int = 500, now: datetime | None = None) -> int:
+    now = now or datetime.now()
+    total = 0
+    while True:
+        holds = (
+            db.session.query(TicketHold)
+            .filter(TicketHold.expires_at < now)
+            .order_by(TicketHold.id)
+            .limit(batch_size)
+            .with_for_update()
+            .all()
+        )
+        if not holds:
+            break
+
+        _release_holds(holds)
+        db.session.commit()
+
+        total += len(holds)
+        if len(holds) < batch_size:
+            break
+    return total
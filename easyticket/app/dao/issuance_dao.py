@@ -0,0 +1,28 @@
+from app.models import db, IssuanceLedger, IssuanceStatus, Order
+
+
+def get_ledger_entry(order_id: int) -> IssuanceLedger | None:
+    return IssuanceLedger.query.filter_by(order_id=order_id).first()
+
+#Cap nhat trang thai so phat hanh (khong commit)
+def set_ledger_status(order_id: int, status: IssuanceStatus, ticket_count: int | None = None,
+                      error: str | None = None, from_status: IssuanceStatus | None = None) -> bool:
+    values = {IssuanceLedger.status: status, IssuanceLedger.error: error[:255] if error else None}
+    if ticket_count is not None:
+        values[IssuanceLedger.ticket_count] = ticket_count
+    query = db.session.query(IssuanceLedger).filter(IssuanceLedger.order_id == order_id)
+    if from_status is not None:
+        query = query.filter(IssuanceLedger.status == from_status)
+    return query.update(values, synchronize_session=False) == 1
+
+#Trang thai phat hanh cua don kem chu don (cho endpoint poll)
+def get_issuance_status(order_id: int):
+    return (
+        db.session.query(
+            IssuanceLedger.status, IssuanceLedger.ticket_count,
+            IssuanceLedger.error, Order.customer_id
+        )
+        .join(Order, Order.id == IssuanceLedger.order_id)
+        .filter(IssuanceLedger.order_id == order_id)
+        .first()
+    )
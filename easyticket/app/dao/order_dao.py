@@ -1,5 +1,51 @@
-from app.models import Order
+from datetime import datetime, timedelta
+from sqlalchemy import and_, exists
+from app.models import db, Order, OrderDetail, Payment, PaymentStatus, Ticket, IssuanceLedger
+from app.dao.hold_dao import release_holds_of_orders
 
 def get_order_by_id(order_id):
     order = Order.query.get(order_id)
-    return order
\ No newline at end of file
+    return order
+
+#Don bi bo ngang: tao truoc `cutoff`, khong co payment thanh cong, khong co payment nao moi cap nhat
+#sau cutoff (khach dang thu lai), chua vao so phat hanh va chua co ve
+def _abandoned_orders_filter(cutoff: datetime):
+    return and_(
+        Order.created_at < cutoff,
+        ~exists().where(and_(
+            Payment.order_id == Order.id,
+            (Payment.status == PaymentStatus.SUCCESS) | (Payment.updated_at >= cutoff)
+        )),
+        ~exists().where(IssuanceLedger.order_id == Order.id),
+        ~exists().where(Ticket.order_id == Order.id),
+    )
+
+#Xoa don chua thanh toan qua han theo tung lo, moi lo 1 transaction ngan; tra ve so don da xoa
+def sweep_abandoned_orders(older_than_seconds: int, batch_size: int = 500,
+                           now: datetime | None = None, max_batches: int | None = None) -> int:
+    cutoff = (now or datetime.now()) - timedelta(seconds=older_than_seconds)
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        order_ids = [
+            oid for (oid,) in (
+                db.session.query(Order.id)
+                .filter(_abandoned_orders_filter(cutoff))
+                .order_by(Order.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+        ]
+        if not order_ids:
+            break
+
+        release_holds_of_orders(order_ids)
+        for model, col in ((Payment, Payment.order_id), (OrderDetail, OrderDetail.order_id), (Order, Order.id)):
+            db.session.query(model).filter(col.in_(order_ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+        total += len(order_ids)
+        batches += 1
+        if len(order_ids) < batch_size:
+            break
+    return total
@@ -1,34 +1,20 @@
 from app.models import Ticket,TicketType, TicketStatus,  Order, Event
 from app import db
 from sqlalchemy import or_
-from sqlalchemy.orm import joinedload
-from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import func, case
 from datetime import datetime
+from app.utils.pagination import keyset_page
 from app import db
 from app.models import Ticket
 
 #Lay danh sach loai ve cua 1 su kien
 def get_ticket_type_by_event_id(event_id):
-    return TicketType.query.filter_by(event_id=event_id).all()
-
-#Dem so luong ve da ban
-def count_sold_by_ticket_type(ticket_type_ids: list[int]) -> dict[int, int]:
-    if not ticket_type_ids:
-        return {}
-
-    rows = (
-        db.session.query(Ticket.ticket_type_id, func.count(Ticket.id))
-        .filter(
-            Ticket.ticket_type_id.in_(ticket_type_ids),
-            Ticket.status.in_([TicketStatus.ACTIVE, TicketStatus.USED])
-        )
-        .group_by(Ticket.ticket_type_id)
-        .all()
-    )
-    return {tid: cnt for tid, cnt in rows}
+    # shard (neu co) nap kem 1 query de t.remaining khong phat sinh N+1
+    return TicketType.query.filter_by(event_id=event_id).options(selectinload(TicketType.shards)).all()
 
 #Lay ve cua nguoi dung
-def get_tickets_of_user(user_id: int, q: str = "", status: str = None, page: int = 1, per_page: int = 12):
+def get_tickets_of_user(user_id: int, q: str = "", status: str = None, cursor: str | None = None, per_page: int = 12):
     query = (
         db.session.query(Ticket)
         .join(Order)
@@ -37,7 +23,6 @@ def get_tickets_of_user(user_id: int, q: str = "", status: str = None, page: int
             joinedload(Ticket.event),
             joinedload(Ticket.ticket_type)
         )
-        .order_by(Ticket.created_at.desc())
     )
 
     if q:
@@ -53,22 +38,304 @@ def get_tickets_of_user(user_id: int, q: str = "", status: str = None, page: int
     if status:
         query = query.filter(Ticket.status == status)
 
-    return query.paginate(page=page, per_page=per_page)
+    return keyset_page(query, [(Ticket.created_at, True), (Ticket.id, True)], cursor, per_page)
 def get_ticket_by_id(ticket_id: int):
     return Ticket.query.get(ticket_id)
 
-def get_ticket_by_qr(qr_data: str):
-    return Ticket.query.filter_by(qr_data=qr_data).first()
-
 def save_ticket_qr(ticket: Ticket, qr_data: str):
     ticket.qr_data = qr_data
     ticket.issued_at = datetime.utcnow()
     db.session.add(ticket)
     db.session.commit()
 
-def mark_checked_in(ticket: Ticket):
-    from app.models import TicketStatus
-    ticket.status = TicketStatus.USED
-    ticket.use_at = datetime.utcnow()
-    db.session.add(ticket)
-    db.session.commit()
\ No newline at end of file
+#Du lieu hien thi khi soat ve: ve + loai ve + nguoi mua trong 1 query
+def get_checkin_view(qr_data: str):
+    from app.models import User
+    return (
+        db.session.query(
+            Ticket.id, Ticket.ticket_code, Ticket.status, Ticket.event_id, Ticket.use_at, Ticket.issued_at,
+            Ticket.ticket_type_id, TicketType.name.label("ticket_type"),
+            User.id.label("buyer_id"), User.username, User.first_name, User.last_name, User.email, User.phone,
+        )
+        .join(TicketType, TicketType.id == Ticket.ticket_type_id)
+        .outerjoin(Order, Order.id == Ticket.order_id)
+        .outerjoin(User, User.id == Order.customer_id)
+        .filter(Ticket.qr_data == qr_data)
+        .first()
+    )
+
+#Check-in nguyen tu: UPDATE co dieu kien status=ACTIVE, rowcount = 1 moi la lan check-in nay thanh cong
+#(2 cong cung quet 1 ve thi chi 1 cong thang). Tra ve (checked_in, view)
+def checkin_by_qr(qr_data: str, event_id: int):
+    checked_in = (
+        db.session.query(Ticket)
+        .filter(
+            Ticket.qr_data == qr_data,
+            Ticket.event_id == event_id,
+            Ticket.status == TicketStatus.ACTIVE
+        )
+        .update({Ticket.status: TicketStatus.USED, Ticket.use_at: datetime.utcnow()},
+                synchronize_session=False)
+    ) == 1
+    view = get_checkin_view(qr_data)
+    db.session.commit()
+    return checked_in, view
+
+#(qr_data, status) cua moi ve da phat hanh QR cua 1 su kien (dung dung manifest offline)
+def get_manifest_rows(event_id: int):
+    return (
+        db.session.query(Ticket.qr_data, Ticket.status)
+        .filter(Ticket.event_id == event_id, Ticket.qr_data.isnot(None))
+        .all()
+    )
+
+#Check-in hang loat trong 1 transaction: 1 SELECT ... IN khoa cac ve, 1 UPDATE cho cac ve thang.
+#scans = [(qr_data, scanned_at)]; trong cung lo, lan quet som nhat thang; ve da USED trong DB giu nguyen
+#(ghi truoc thang). Tra ve [(error | None, view, checked_at)] theo dung thu tu scans
+def checkin_batch(event_id: int, scans: list[tuple[str, datetime]]):
+    from app.models import User
+    tokens = list({qr for qr, _ in scans})
+    rows = []
+    if tokens:
+        rows = (
+            db.session.query(
+                Ticket.id, Ticket.qr_data, Ticket.ticket_code, Ticket.status, Ticket.event_id,
+                Ticket.use_at, Ticket.issued_at, Ticket.ticket_type_id,
+                TicketType.name.label("ticket_type"),
+                User.id.label("buyer_id"), User.username, User.first_name, User.last_name,
+                User.email, User.phone,
+            )
+            .join(TicketType, TicketType.id == Ticket.ticket_type_id)
+            .outerjoin(Order, Order.id == Ticket.order_id)
+            .outerjoin(User, User.id == Order.customer_id)
+            .filter(Ticket.qr_data.in_(tokens))
+            .with_for_update(of=Ticket)
+            .all()
+        )
+    by_qr = {r.qr_data: r for r in rows}
+
+    results = [None] * len(scans)
+    winners = {}
+    for i in sorted(range(len(scans)), key=lambda k: scans[k][1]):
+        qr, scanned_at = scans[i]
+        v = by_qr.get(qr)
+        if not v:
+            results[i] = ("ticket_not_found", None, None)
+        elif v.event_id != event_id:
+            results[i] = ("wrong_event", v, None)
+        elif v.status == TicketStatus.USED or v.id in winners:
+            results[i] = ("already_checked_in", v, v.use_at or winners.get(v.id))
+        elif v.status != TicketStatus.ACTIVE:
+            results[i] = ("invalid_state", v, None)
+        else:
+            winners[v.id] = scanned_at
+            results[i] = (None, v, scanned_at)
+
+    if winners:
+        (
+            db.session.query(Ticket)
+            .filter(Ticket.id.in_(list(winners)), Ticket.status == TicketStatus.ACTIVE)
+            .update({
+                Ticket.status: TicketStatus.USED,
+                Ticket.use_at: case(winners, value=Ticket.id),
+            }, synchronize_session=False)
+        )
+    db.session.commit()
+    return results
+
+#Tong ve da phat hanh / da check-in theo loai ve cua 1 su kien (1 query, nap bo dem dashboard check-in)
+#[(ticket_type_id, ten, so ve ACTIVE+USED, so ve USED)]
+def get_checkin_totals(event_id: int):
+    return (
+        db.session.query(
+            TicketType.id, TicketType.name,
+            func.count(Ticket.id),
+            func.sum(case((Ticket.status == TicketStatus.USED, 1), else_=0)),
+        )
+        .outerjoin(Ticket, (Ticket.ticket_type_id == TicketType.id)
+                   & Ticket.status.in_([TicketStatus.ACTIVE, TicketStatus.USED]))
+        .filter(TicketType.event_id == event_id)
+        .group_by(TicketType.id, TicketType.name)
+        .all()
+    )
+
+#Nhan in cua moi ve da co QR trong 1 su kien (theo loai ve, id), doc theo lo keyset de
+#khong nap 10k+ ve mot luc: yield {"code", "qr", "ticket_type"}
+def iter_print_labels(event_id: int, batch_size: int = 1000):
+    last = (0, 0)
+    while True:
+        rows = (
+            db.session.query(Ticket.ticket_type_id, Ticket.id, Ticket.ticket_code, Ticket.qr_data,
+                             TicketType.name)
+            .join(TicketType, TicketType.id == Ticket.ticket_type_id)
+            .filter(Ticket.event_id == event_id, Ticket.qr_data.isnot(None),
+                    Ticket.status.in_([TicketStatus.ACTIVE, TicketStatus.USED]))
+            .filter(or_(Ticket.ticket_type_id > last[0],
+                        (Ticket.ticket_type_id == last[0]) & (Ticket.id > last[1])))
+            .order_by(Ticket.ticket_type_id, Ticket.id)
+            .limit(batch_size)
+            .all()
+        )
+        for r in rows:
+            yield {"code": r.ticket_code, "qr": r.qr_data, "ticket_type": r.name}
+        if len(rows) < batch_size:
+            break
+        last = (rows[-1].ticket_type_id, rows[-1].id)
+
+#Nap du lieu soat ve cua 1 su kien cho che do "mo cong" (3 query: ve, loai ve, nguoi mua)
+def get_door_rows(event_id: int):
+    from app.models import User
+    tickets = (
+        db.session.query(
+            Ticket.id, Ticket.ticket_code, Ticket.status, Ticket.qr_data, Ticket.use_at,
+            Ticket.issued_at, Ticket.ticket_type_id, Ticket.order_id,
+        )
+        .filter(Ticket.event_id == event_id)
+        .order_by(Ticket.id)
+        .all()
+    )
+    types = dict(
+        db.session.query(TicketType.id, TicketType.name).filter(TicketType.event_id == event_id).all()
+    )
+    buyers = (
+        db.session.query(Order.id, User.id, User.username, User.first_name, User.last_name, User.email, User.phone)
+        .join(User, User.id == Order.customer_id)
+        .filter(Order.id.in_(
+            db.session.query(Ticket.order_id).filter(Ticket.event_id == event_id).distinct()
+        ))
+        .all()
+    )
+    return tickets, types, buyers
+
+#Check-in 1 ve theo id (che do mo cong, du lieu hien thi da co trong bo nho); rowcount quyet dinh (co commit)
+def checkin_ticket_id(ticket_id: int, use_at: datetime) -> bool:
+    updated = (
+        db.session.query(Ticket)
+        .filter(Ticket.id == ticket_id, Ticket.status == TicketStatus.ACTIVE)
+        .update({Ticket.status: TicketStatus.USED, Ticket.use_at: use_at}, synchronize_session=False)
+    )
+    db.session.commit()
+    return updated == 1
+
+#Huy / hoan ve: doi trang thai va tra lai bo dem sold trong cung transaction
+def cancel_tickets(ticket_ids: list[int], status: TicketStatus = TicketStatus.CANCELLED) -> int:
+    from app.dao.ticket_type_dao import release_sold
+    if not ticket_ids:
+        return 0
+
+    tickets = (
+        db.session.query(Ticket)
+        .filter(
+            Ticket.id.in_(ticket_ids),
+            Ticket.status.in_([TicketStatus.ACTIVE, TicketStatus.USED])
+        )
+        .with_for_update()
+        .all()
+    )
+    released = {}
+    for t in tickets:
+        t.status = status
+        released[t.ticket_type_id] = released.get(t.ticket_type_id, 0) + 1
+
+    for ticket_type_id, qty in released.items():
+        release_sold(ticket_type_id, qty)
+    db.session.commit()
+    return len(tickets)
+
+#Insert nhieu ve bang 1 lenh executemany (khong flush tung ve, khong commit)
+def bulk_insert_tickets(rows: list[dict]) -> None:
+    if rows:
+        db.session.execute(Ticket.__table__.insert(), rows)
+
+#Ve cua don chua co QR (id, event_id): token v2 can id nen ky sau khi insert
+def get_unsigned_tickets_of_order(order_id: int):
+    return (
+        db.session.query(Ticket.id, Ticket.event_id)
+        .filter(Ticket.order_id == order_id, Ticket.qr_data.is_(None))
+        .all()
+    )
+
+#Gan qr_data cho nhieu ve bang 1 UPDATE ... CASE id (khong commit)
+#issued_at: dien cho ve chua co (backfill)
+def bulk_set_qr_data(tokens: dict[int, str], issued_at: datetime | None = None) -> None:
+    if tokens:
+        values = {Ticket.qr_data: case(tokens, value=Ticket.id)}
+        if issued_at is not None:
+            values[Ticket.issued_at] = func.coalesce(Ticket.issued_at, issued_at)
+        (
+            db.session.query(Ticket)
+            .filter(Ticket.id.in_(list(tokens)))
+            .update(values, synchronize_session=False)
+        )
+
+#Ky QR cho cac ve con qr_data NULL (du lieu cu), theo lo keyset id, commit moi lo
+#sign(id, ticket_code, order_id, event_id) -> token
+def backfill_tickets_qr(sign, batch_size: int = 1000) -> int:
+    last_id = total = 0
+    while True:
+        rows = (
+            db.session.query(Ticket.id, Ticket.ticket_code, Ticket.order_id, Ticket.event_id)
+            .filter(Ticket.id > last_id, Ticket.qr_data.is_(None))
+            .order_by(Ticket.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        bulk_set_qr_data({r.id: sign(*r) for r in rows}, issued_at=datetime.utcnow())
+        db.session.commit()
+        total += len(rows)
+        last_id = rows[-1].id
+        if len(rows) < batch_size:
+            break
+    return total
+
+#Ky lai QR cua ve chua dung khoa hien tai, theo lo (keyset theo id, commit moi lo)
+#resign(token) -> token moi | None (token khong hop le thi bo qua). Tra ve (so ve da ky lai, so bo qua)
+#active_prefixes = (tien to header v1, ky tu dau token v2) cua khoa hien tai
+def resign_tickets_qr(resign, active_prefixes: tuple[str, str], batch_size: int = 1000,
+                      event_id: int | None = None) -> tuple[int, int]:
+    v1_prefix, v2_prefix = active_prefixes
+    last_id = 0
+    resigned = skipped = 0
+    while True:
+        q = (
+            db.session.query(Ticket.id, Ticket.qr_data)
+            .filter(Ticket.id > last_id, Ticket.qr_data.isnot(None))
+            .filter(~Ticket.qr_data.startswith(v1_prefix, autoescape=True))
+            # LIKE khong phan biet hoa thuong tren SQLite/MySQL: token v1 (co '.') khong tinh la v2
+            .filter(or_(~Ticket.qr_data.startswith(v2_prefix), Ticket.qr_data.contains(".")))
+        )
+        if event_id is not None:
+            q = q.filter(Ticket.event_id == event_id)
+        rows = q.order_by(Ticket.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        tokens = {}
+        for tid, token in rows:
+            new = resign(token)
+            if new is None:
+                skipped += 1
+            else:
+                tokens[tid] = new
+        bulk_set_qr_data(tokens)
+        db.session.commit()
+
+        resigned += len(tokens)
+        last_id = rows[-1][0]
+        if len(rows) < batch_size:
+            break
+    return resigned, skipped
+
+#Lay ve cua 1 don hang (kem event + loai ve de render)
+def get_tickets_of_order(order_id: int):
+    return (
+        db.session.query(Ticket)
+        .filter(Ticket.order_id == order_id)
+        .options(
+            joinedload(Ticket.event),
+            joinedload(Ticket.ticket_type)
+        )
+        .all()
+    )
@@ -1,5 +1,6 @@
-from app.models import db, TicketType
-from sqlalchemy import or_, func
+import random
+from app.models import db, TicketType, TicketTypeShard, Ticket, TicketStatus, TicketHold
+from sqlalchemy import or_, func, select, update
 
 
 def get_ticket_type_by_id(ticket_type_id):
@@ -24,4 +25,251 @@ def delete_ticket_type_by_id(ticket_type_id):
     except Exception as e:
         db.session.rollback()
         print(f"Error deleting ticket type {ticket_type_id}: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+#So shard cua loai ve (1 = khong chia shard); doc khong khoa
+def get_shard_count(ticket_type_id: int) -> int:
+    n = db.session.query(TicketType.shard_count).filter(TicketType.id == ticket_type_id).scalar()
+    return n or 1
+
+def _shard_remaining():
+    return TicketTypeShard.quantity - TicketTypeShard.sold - TicketTypeShard.reserved
+
+#Cong qty vao cot `field` (sold/reserved) cua 1 shard neu shard con du ve (khong commit)
+def _add_to_shard(ticket_type_id: int, shard_no: int, field: str, qty: int) -> bool:
+    col = getattr(TicketTypeShard, field)
+    updated = (
+        db.session.query(TicketTypeShard)
+        .filter(
+            TicketTypeShard.ticket_type_id == ticket_type_id,
+            TicketTypeShard.shard_no == shard_no,
+            TicketTypeShard.sold + TicketTypeShard.reserved + qty <= TicketTypeShard.quantity
+        )
+        .update({col: col + qty}, synchronize_session=False)
+    )
+    return updated == 1
+
+def _sub_from_shard(ticket_type_id: int, shard_no: int, field: str, qty: int) -> bool:
+    col = getattr(TicketTypeShard, field)
+    updated = (
+        db.session.query(TicketTypeShard)
+        .filter(
+            TicketTypeShard.ticket_type_id == ticket_type_id,
+            TicketTypeShard.shard_no == shard_no,
+            col >= qty
+        )
+        .update({col: col - qty}, synchronize_session=False)
+    )
+    return updated == 1
+
+#Lay qty ve tu cac shard: uu tien 1 shard ngau nhien du nguyen luong, neu khong thi gom tu nhieu shard.
+#Tra ve [(shard_no, qty)] hoac None neu khong du (khong commit)
+def _take_from_shards(ticket_type_id: int, field: str, qty: int) -> list[tuple[int, int]] | None:
+    # doc tom tat tat ca shard 1 lan (khong khoa), UPDATE co dieu kien moi la buoc quyet dinh
+    rows = (
+        db.session.query(TicketTypeShard.shard_no, _shard_remaining())
+        .filter(TicketTypeShard.ticket_type_id == ticket_type_id, _shard_remaining() > 0)
+        .all()
+    )
+    if sum(rem for _, rem in rows) < qty:
+        return None
+
+    whole = [no for no, rem in rows if rem >= qty]
+    random.shuffle(whole)
+    for shard_no in whole:
+        if _add_to_shard(ticket_type_id, shard_no, field, qty):
+            return [(shard_no, qty)]
+
+    # khong shard nao du nguyen luong -> gom tu nhieu shard, shard nhieu ve truoc
+    parts, need = [], qty
+    for shard_no, rem in sorted(rows, key=lambda r: -r[1]):
+        take = min(rem, need)
+        if take > 0 and _add_to_shard(ticket_type_id, shard_no, field, take):
+            parts.append((shard_no, take))
+            need -= take
+        if need == 0:
+            return parts
+    for shard_no, take in parts:
+        _sub_from_shard(ticket_type_id, shard_no, field, take)
+    return None
+
+#Tru qty khoi cot `field` cua cac shard (huy/hoan ve khong biet shard nao) (khong commit)
+def _release_from_shards(ticket_type_id: int, field: str, qty: int) -> None:
+    col = getattr(TicketTypeShard, field)
+    rows = (
+        db.session.query(TicketTypeShard.shard_no, col)
+        .filter(TicketTypeShard.ticket_type_id == ticket_type_id, col > 0)
+        .order_by(col.desc())
+        .all()
+    )
+    need = qty
+    for shard_no, have in rows:
+        take = min(have, need)
+        if _sub_from_shard(ticket_type_id, shard_no, field, take):
+            need -= take
+        if need == 0:
+            break
+
+#Tang bo dem da ban neu con du ve (UPDATE co dieu kien, khong commit).
+#Loai ve khong chia shard chi ton 1 lenh; UPDATE khong khop moi doc shard_count de chuyen sang shard
+def add_sold(ticket_type_id: int, qty: int) -> bool:
+    updated = (
+        db.session.query(TicketType)
+        .filter(
+            TicketType.id == ticket_type_id,
+            TicketType.shard_count <= 1,
+            TicketType.sold + TicketType.reserved + qty <= TicketType.quantity
+        )
+        .update({TicketType.sold: TicketType.sold + qty}, synchronize_session=False)
+    )
+    if updated == 1:
+        return True
+    if get_shard_count(ticket_type_id) > 1:
+        return _take_from_shards(ticket_type_id, "sold", qty) is not None
+    return False
+
+#Giam bo dem da ban khi huy / hoan ve (khong commit)
+def release_sold(ticket_type_id: int, qty: int) -> None:
+    updated = (
+        db.session.query(TicketType)
+        .filter(TicketType.id == ticket_type_id, TicketType.shard_count <= 1, TicketType.sold >= qty)
+        .update({TicketType.sold: TicketType.sold - qty}, synchronize_session=False)
+    )
+    if updated == 0 and get_shard_count(ticket_type_id) > 1:
+        _release_from_shards(ticket_type_id, "sold", qty)
+
+#Giu cho: tang bo dem reserved neu con du ve (chi loai ve khong chia shard) (khong commit)
+def add_reserved(ticket_type_id: int, qty: int) -> bool:
+    updated = (
+        db.session.query(TicketType)
+        .filter(
+            TicketType.id == ticket_type_id,
+            TicketType.shard_count <= 1,
+            TicketType.sold + TicketType.reserved + qty <= TicketType.quantity
+        )
+        .update({TicketType.reserved: TicketType.reserved + qty}, synchronize_session=False)
+    )
+    return updated == 1
+
+#Giu cho theo che do cua loai ve; tra ve [(shard_no, qty)] (shard_no None = khong chia shard)
+#hoac None neu khong du ve (khong commit)
+def reserve_stock(ticket_type_id: int, qty: int) -> list[tuple[int | None, int]] | None:
+    if add_reserved(ticket_type_id, qty):
+        return [(None, qty)]
+    if get_shard_count(ticket_type_id) > 1:
+        return _take_from_shards(ticket_type_id, "reserved", qty)
+    return None
+
+#Tra lai cho da giu (hold het han / don bi huy) (khong commit)
+def release_reserved(ticket_type_id: int, qty: int, shard_no: int | None = None) -> None:
+    if shard_no is not None:
+        _sub_from_shard(ticket_type_id, shard_no, "reserved", qty)
+        return
+    (
+        db.session.query(TicketType)
+        .filter(TicketType.id == ticket_type_id, TicketType.reserved >= qty)
+        .update({TicketType.reserved: TicketType.reserved - qty}, synchronize_session=False)
+    )
+
+#Chuyen cho da giu thanh ve da ban (khong commit)
+def convert_reserved(ticket_type_id: int, qty: int, shard_no: int | None = None) -> None:
+    if shard_no is not None:
+        (
+            db.session.query(TicketTypeShard)
+            .filter(
+                TicketTypeShard.ticket_type_id == ticket_type_id,
+                TicketTypeShard.shard_no == shard_no,
+                TicketTypeShard.reserved >= qty
+            )
+            .update({
+                TicketTypeShard.reserved: TicketTypeShard.reserved - qty,
+                TicketTypeShard.sold: TicketTypeShard.sold + qty,
+            }, synchronize_session=False)
+        )
+        return
+    (
+        db.session.query(TicketType)
+        .filter(TicketType.id == ticket_type_id, TicketType.reserved >= qty)
+        .update({
+            TicketType.reserved: TicketType.reserved - qty,
+            TicketType.sold: TicketType.sold + qty,
+        }, synchronize_session=False)
+    )
+
+#Chia tong so ve / so ve da ban ra n shard (shard dau nhan phan du)
+def _split_shards(quantity: int, sold: int, n: int) -> list[TicketTypeShard]:
+    base, extra = divmod(quantity, n)
+    shards = []
+    for no in range(n):
+        q = base + (1 if no < extra else 0)
+        take = min(q, sold) if no < n - 1 else sold  # shard cuoi nhan phan ban vuot (neu co)
+        sold -= take
+        shards.append(TicketTypeShard(shard_no=no, quantity=q, sold=take, reserved=0))
+    return shards
+
+#Bat/tat/doi so shard hoac chia lai sau khi doi quantity. Tu choi (False) khi con hold dang giu cho
+#vi hold ghi nho shard_no (khong commit)
+def set_shard_layout(ticket_type: TicketType, shard_count: int) -> bool:
+    shard_count = max(1, int(shard_count or 1))
+    db.session.query(TicketType).filter(TicketType.id == ticket_type.id).with_for_update().one()
+    if ticket_type.reserved_count or db.session.query(TicketHold.id).filter(
+            TicketHold.ticket_type_id == ticket_type.id).first():
+        return False
+
+    sold = ticket_type.sold_count
+    ticket_type.shards = []
+    db.session.flush()
+    if shard_count == 1:
+        ticket_type.sold = sold
+    else:
+        ticket_type.sold = 0
+        ticket_type.shards = _split_shards(ticket_type.quantity, sold, shard_count)
+    ticket_type.reserved = 0
+    ticket_type.shard_count = shard_count
+    return True
+
+#Tinh lai bo dem sold/reserved tu bang ticket va ticket_hold (dung khi bo dem bi lech)
+def rebuild_inventory_counters(event_id: int | None = None) -> int:
+    sold_sq = (
+        select(func.count(Ticket.id))
+        .where(
+            Ticket.ticket_type_id == TicketType.id,
+            Ticket.status.in_([TicketStatus.ACTIVE, TicketStatus.USED])
+        )
+        .scalar_subquery()
+    )
+    reserved_sq = (
+        select(func.coalesce(func.sum(TicketHold.quantity), 0))
+        .where(TicketHold.ticket_type_id == TicketType.id)
+        .scalar_subquery()
+    )
+    stmt = update(TicketType).values(sold=sold_sq, reserved=reserved_sq).execution_options(synchronize_session=False)
+    if event_id:
+        stmt = stmt.where(TicketType.event_id == event_id)
+    result = db.session.execute(stmt)
+    _rebuild_shards(event_id)
+    db.session.commit()
+    return result.rowcount
+
+#Loai ve chia shard: reserved tinh theo shard_no cua hold, sold chia lai vao cac shard con cho
+def _rebuild_shards(event_id: int | None = None) -> None:
+    q = TicketType.query.filter(TicketType.shard_count > 1).populate_existing()
+    if event_id:
+        q = q.filter(TicketType.event_id == event_id)
+    for tt in q.all():
+        held = dict(
+            db.session.query(TicketHold.shard_no, func.sum(TicketHold.quantity))
+            .filter(TicketHold.ticket_type_id == tt.id)
+            .group_by(TicketHold.shard_no)
+            .all()
+        )
+        sold = tt.sold  # vua tinh lai tu bang ticket
+        for shard in tt.shards:
+            shard.reserved = int(held.get(shard.shard_no) or 0)
+            shard.sold = min(sold, max(0, shard.quantity - shard.reserved))
+            sold -= shard.sold
+        if tt.shards and sold:
+            tt.shards[-1].sold += sold
+        tt.sold = 0
+        tt.reserved = 0
@@ -4,7 +4,7 @@ from wtforms import (
     SelectField, IntegerField, DecimalField, DateTimeField,
 )
 from flask_wtf.file import FileField, FileAllowed
-from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, NumberRange
+from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, NumberRange, Optional
 
 # Xử lý tương thích DateTimeLocalField
 try:
@@ -55,6 +55,7 @@ class EventForm(FlaskForm):
     banner_image = FileField("Ảnh banner (URL)", validators=[
         FileAllowed(["jpg", "jpeg", "png", "gif"], "Chỉ hỗ trợ ảnh JPG, PNG, GIF.")
     ])
+    high_demand = BooleanField("Sự kiện nhu cầu cao (bật hàng chờ khi mở bán)")
     submit = SubmitField("Tạo sự kiện")
 
     def set_choices(self):
@@ -67,6 +68,10 @@ class TicketTypeForm(FlaskForm):
     quantity = IntegerField("Số lượng", validators=[DataRequired(), NumberRange(min=1, message="Số lượng phải lớn hơn 0")])
     price = DecimalField("Giá vé", places=2, validators=[DataRequired(), NumberRange(min=0, message="Giá vé không được âm")])
     active = SelectField("Trạng thái", coerce=int, choices=[(1, "Kích hoạt"), (0, "Không kích hoạt")])
+    # > 1: chia tồn kho ra nhiều bộ đếm con cho loại vé bán rất nhanh (mở bán cao điểm)
+    shard_count = IntegerField("Số bộ đếm (shard)", default=1, validators=[
+        Optional(), NumberRange(min=1, max=64, message="Số shard từ 1 đến 64")
+    ])
     submit = SubmitField("Lưu loại vé")
 
     def set_active_value(self, ticket_type=None):
@@ -3,11 +3,13 @@ from decimal import Decimal
 from enum import Enum as PyEnum
 from flask_login import UserMixin
 from sqlalchemy import (
-    Column, Integer, String, Boolean, Enum, DateTime, ForeignKey, DECIMAL, Numeric, Index
+    Column, Integer, String, Boolean, Enum, DateTime, ForeignKey, DECIMAL, Numeric, Index,
+    UniqueConstraint, Text, DDL, event as sa_event
 )
 from sqlalchemy.orm import relationship
 
 from app import db
+from app.utils.search_utils import fold_text
 
 
 # ===== Enums (dùng UPPERCASE để khớp với MySQL enum trong ảnh) =====
@@ -38,6 +40,12 @@ class PaymentStatus(PyEnum):
     REFUNDED = "REFUNDED"
 
 
+class IssuanceStatus(PyEnum):
+    PENDING = "PENDING"
+    ISSUED = "ISSUED"
+    FAILED = "FAILED"
+
+
 class PaymentMethod(PyEnum):
     CREDIT_CARD   = "CREDIT_CARD"
     DEBIT_CARD    = "DEBIT_CARD"
@@ -130,6 +138,13 @@ class Event(db.Model):
     address = Column(String(200), nullable=False)
     banner_image = Column(String(200))
 
+    # Sự kiện nhu cầu cao: khách phải qua hàng chờ trước khi vào trang mua vé
+    high_demand = Column(Boolean, default=False, server_default="0", nullable=False)
+
+    # name + description + address đã bỏ dấu, chữ thường: nguồn của chỉ mục full-text
+    # (MySQL FULLTEXT / SQLite FTS5 event_fts), tự cập nhật khi insert/update qua ORM
+    search_text = Column(Text)
+
     # Time
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
@@ -146,6 +161,44 @@ class Event(db.Model):
     def __repr__(self):
         return f"<Event id={self.id} name={self.name!r}>"
 
+    def build_search_text(self) -> str:
+        return fold_text(" ".join(filter(None, (self.name, self.description, self.address))))
+
+
+@sa_event.listens_for(Event, "before_insert")
+@sa_event.listens_for(Event, "before_update")
+def _sync_event_search_text(mapper, connection, target):
+    target.search_text = target.build_search_text()
+
+
+# Chỉ mục full-text trên event.search_text:
+#  - MySQL: FULLTEXT với parser ngram (từ tiếng Việt ngắn, cần ngram_token_size=2).
+#    Phải tắt stopword khi tạo index: parser ngram bỏ mọi token chứa stopword ("a", "i", ...
+#    trong danh sách mặc định) nên "ha", "ai", "an", "in" sẽ không bao giờ được index.
+#    Danh sách stopword gắn với index lúc tạo -> mọi lần tạo lại index cũng phải SET như dưới.
+#  - SQLite: bảng FTS5 external-content + trigger đồng bộ (test / chạy local)
+EVENT_FULLTEXT_MYSQL_DDL = (
+    "SET SESSION innodb_ft_enable_stopword = OFF",
+    "ALTER TABLE event ADD FULLTEXT INDEX ix_event_search_text (search_text) WITH PARSER ngram",
+)
+for _ddl in EVENT_FULLTEXT_MYSQL_DDL:
+    sa_event.listen(Event.__table__, "after_create", DDL(_ddl).execute_if(dialect="mysql"))
+
+EVENT_FTS5_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS event_fts USING fts5("
+    "search_text, content='event', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_ai AFTER INSERT ON event BEGIN "
+    "INSERT INTO event_fts(rowid, search_text) VALUES (new.id, new.search_text); END",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_ad AFTER DELETE ON event BEGIN "
+    "INSERT INTO event_fts(event_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); END",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_au AFTER UPDATE OF search_text ON event BEGIN "
+    "INSERT INTO event_fts(event_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+    "INSERT INTO event_fts(rowid, search_text) VALUES (new.id, new.search_text); END",
+)
+for _ddl in EVENT_FTS5_DDL:
+    sa_event.listen(Event.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+sa_event.listen(Event.__table__, "after_drop", DDL("DROP TABLE IF EXISTS event_fts").execute_if(dialect="sqlite"))
+
 
 class TicketType(db.Model):
     __tablename__ = "ticket_type"
@@ -159,6 +212,13 @@ class TicketType(db.Model):
     active = Column(Boolean, default=True)
     price = Column(Numeric(10, 2), nullable=False)
 
+    # Bộ đếm tồn kho: cập nhật trong cùng transaction khi phát hành / huỷ / hoàn vé
+    sold = Column(Integer, nullable=False, default=0, server_default="0")
+    reserved = Column(Integer, nullable=False, default=0, server_default="0")
+    # > 1: tồn kho chia ra nhiều dòng ticket_type_shard để giảm tranh chấp khóa dòng;
+    # khi đó sold/reserved ở trên luôn = 0, bộ đếm thật nằm ở các shard
+    shard_count = Column(Integer, nullable=False, default=1, server_default="1")
+
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
@@ -166,11 +226,54 @@ class TicketType(db.Model):
     event = relationship("Event", back_populates="ticket_types")
     order_details = relationship("OrderDetail", back_populates="ticket_type")
     tickets = relationship("Ticket", back_populates="ticket_type")
+    shards = relationship("TicketTypeShard", back_populates="ticket_type",
+                          order_by="TicketTypeShard.shard_no", cascade="all, delete-orphan")
+
+    @property
+    def is_sharded(self) -> bool:
+        return (self.shard_count or 1) > 1
+
+    @property
+    def sold_count(self) -> int:
+        if self.is_sharded:
+            return sum(s.sold for s in self.shards)
+        return self.sold or 0
+
+    @property
+    def reserved_count(self) -> int:
+        if self.is_sharded:
+            return sum(s.reserved for s in self.shards)
+        return self.reserved or 0
+
+    @property
+    def remaining(self) -> int:
+        # số vé còn bán được = tổng - đã bán - đang giữ chỗ
+        return max(0, (self.quantity or 0) - self.sold_count - self.reserved_count)
 
     def __repr__(self):
         return f"<TicketType id={self.id} name={self.name!r} event_id={self.event_id}>"
 
 
+class TicketTypeShard(db.Model):
+    """Bộ đếm con của TicketType ở chế độ chia shard: mỗi shard giữ 1 phần tồn kho."""
+    __tablename__ = "ticket_type_shard"
+    __table_args__ = (UniqueConstraint("ticket_type_id", "shard_no", name="uq_ticket_type_shard"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticket_type_id = Column(Integer, ForeignKey("ticket_type.id"), nullable=False, index=True)
+    shard_no = Column(Integer, nullable=False)
+
+    quantity = Column(Integer, nullable=False, default=0)
+    sold = Column(Integer, nullable=False, default=0, server_default="0")
+    reserved = Column(Integer, nullable=False, default=0, server_default="0")
+
+    ticket_type = relationship("TicketType", back_populates="shards")
+
+    def __repr__(self):
+        return f"<TicketTypeShard ticket_type_id={self.ticket_type_id} shard={self.shard_no} " \
+               f"{self.sold}+{self.reserved}/{self.quantity}>"
+
+
 class Ticket(db.Model):
     __tablename__ = "ticket"
 
@@ -211,13 +314,14 @@ class Order(db.Model):
     total_amount = Column(DECIMAL(10, 2), nullable=False, default=Decimal("0.00"))
     extra_fee = Column(DECIMAL(10, 2), nullable=False, default=Decimal("0.00"))
     discount = Column(DECIMAL(10, 2), nullable=False, default=Decimal("0.00"))
-    created_at = Column(DateTime, default=datetime.now)
+    created_at = Column(DateTime, default=datetime.now, index=True)  # sweeper quét theo created_at
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
     # relationships
     customer = relationship("User", back_populates="orders")
     tickets = relationship("Ticket", back_populates="order")
     order_details = relationship("OrderDetail", back_populates="order", cascade="all, delete-orphan")
     payments = relationship("Payment", back_populates="order")
+    holds = relationship("TicketHold", back_populates="order", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"<Order id={self.id} code={self.order_code!r}>"
@@ -265,3 +369,42 @@ class Payment(db.Model):
         return f"<Payment id={self.id} order_id={self.order_id} status={self.status.value}>"
 
 
+class TicketHold(db.Model):
+    """Giữ chỗ có thời hạn cho 1 dòng đơn hàng (đã cộng vào TicketType.reserved hoặc shard shard_no)."""
+    __tablename__ = "ticket_hold"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    order_id = Column(Integer, ForeignKey("order.id"), nullable=False, index=True)
+    ticket_type_id = Column(Integer, ForeignKey("ticket_type.id"), nullable=False)
+    shard_no = Column(Integer, nullable=True)  # NULL: loại vé không chia shard
+
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.now)
+
+    order = relationship("Order", back_populates="holds")
+    ticket_type = relationship("TicketType")
+
+    def __repr__(self):
+        return f"<TicketHold id={self.id} order_id={self.order_id} ticket_type_id={self.ticket_type_id} qty={self.quantity}>"
+
+
+class IssuanceLedger(db.Model):
+    """Sổ phát hành vé: mỗi đơn hàng chỉ được phát hành 1 lần (unique order_id)."""
+    __tablename__ = "issuance_ledger"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    order_id = Column(Integer, ForeignKey("order.id"), nullable=False, unique=True, index=True)
+    payment_id = Column(Integer, ForeignKey("payment.id"), nullable=True, index=True)
+
+    status = Column(Enum(IssuanceStatus), default=IssuanceStatus.PENDING, nullable=False)
+    ticket_count = Column(Integer, nullable=False, default=0)
+    error = Column(String(255), nullable=True)
+
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    order = relationship("Order")
+
+    def __repr__(self):
+        return f"<IssuanceLedger order_id={self.order_id} status={self.status.value} tickets={self.ticket_count}>"
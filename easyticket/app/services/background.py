@@ -0,0 +1,68 @@
+# app/services/background.py
+import threading
+
+from app import db
+
+
+class PeriodicWorker:
+    """Chạy 1 hàm định kỳ trong thread nền (daemon), mỗi lần chạy có app context riêng."""
+
+    def __init__(self, app, name: str, interval: float, func):
+        self.app = app
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        with self.app.app_context():
+            try:
+                return self.func()
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception("Background worker %s failed", self.name)
+            finally:
+                db.session.remove()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+
+def init_background_workers(app, workers: list[tuple[str, str, callable]]):
+    """
+    Đăng ký các worker định kỳ: [(tên, config key của interval, hàm)].
+    Worker chỉ khởi động ở request đầu tiên (không chạy khi import app, chạy CLI hay test);
+    interval <= 0 nghĩa là tắt.
+    """
+    app.extensions["background_workers"] = {}
+    lock = threading.Lock()
+    state = {"started": False}
+
+    def _start_workers():
+        if state["started"] or app.testing:
+            return
+        with lock:
+            if state["started"]:
+                return
+            state["started"] = True
+            for name, interval_key, func in workers:
+                interval = app.config.get(interval_key) or 0
+                if interval <= 0:
+                    continue
+                w = PeriodicWorker(app, name, interval, func)
+                w.start()
+                app.extensions["background_workers"][name] = w
+
+    app.before_request(_start_workers)
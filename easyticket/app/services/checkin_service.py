@@ -0,0 +1,62 @@
+# app/services/checkin_service.py
+import hashlib
+import hmac
+from datetime import datetime, timezone
+
+from app.dao.ticket_dao import get_manifest_rows
+from app.models import TicketStatus
+from app.utils.qr_utils import get_keyring, token_digest
+
+# 8 byte sha256 / vé: 100k vé ~ 1.7MB JSON, xác suất trùng ~ 1e-10
+MANIFEST_DIGEST_BYTES = 8
+STATUS_CODES = {
+    TicketStatus.ACTIVE: "A",
+    TicketStatus.USED: "U",
+    TicketStatus.CANCELLED: "C",
+    TicketStatus.REFUNDED: "R",
+}
+
+
+def build_manifest(event_id: int) -> dict:
+    """
+    Manifest check-in offline cho máy quét ở cổng: chuỗi các bản ghi cố định
+    <digest hex><mã trạng thái>, sắp xếp theo digest để máy quét tìm nhị phân.
+    Không chứa token gốc, chỉ digest của qr_data, nên lộ manifest không làm giả được vé.
+    Ký HMAC (khóa QR đang dùng, kid đi kèm) trên (event_id, generated_at, sha256(entries));
+    máy quét gửi lại bằng chứng này khi đồng bộ, xem verify_manifest.
+    """
+    records = sorted(
+        token_digest(qr, MANIFEST_DIGEST_BYTES) + STATUS_CODES[status]
+        for qr, status in get_manifest_rows(event_id)
+    )
+    entries = "".join(records)
+    iat = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+    kid = get_keyring().active_kid
+    return {
+        "event_id": event_id,
+        "generated_at": iat,
+        "digest_bytes": MANIFEST_DIGEST_BYTES,
+        "record_size": MANIFEST_DIGEST_BYTES * 2 + 1,
+        "count": len(records),
+        "entries": entries,
+        "kid": kid,
+        "signature": _manifest_mac(kid, event_id, iat, hashlib.sha256(entries.encode()).hexdigest()),
+    }
+
+
+def _manifest_mac(kid: str, event_id: int, generated_at: str, entries_sha256: str) -> str:
+    return get_keyring().mac(kid, f"{event_id}|{generated_at}|{entries_sha256}".encode()).hex()
+
+
+def verify_manifest(event_id: int, proof) -> bool:
+    """
+    proof = {"generated_at", "kid", "sha256" (sha256 hex của entries máy quét đang giữ), "signature"}.
+    Sai nếu manifest bị sửa, của sự kiện khác, hoặc ký bằng khóa đã gỡ khỏi QR_KEYS.
+    """
+    if not isinstance(proof, dict):
+        return False
+    kid, sig = proof.get("kid"), proof.get("signature")
+    if not isinstance(kid, str) or not isinstance(sig, str) or kid not in get_keyring().kids():
+        return False
+    expect = _manifest_mac(kid, event_id, str(proof.get("generated_at")), str(proof.get("sha256")))
+    return hmac.compare_digest(expect, sig)
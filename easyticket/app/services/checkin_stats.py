@@ -0,0 +1,157 @@
+# app/services/checkin_stats.py
+import queue
+import threading
+import time
+from collections import deque
+
+from flask import current_app
+
+_RATE_WINDOW = 60  # giây: scans/phút và check-in/phút tính trên cửa sổ trượt này
+
+
+class EventCheckinCounters:
+    """
+    Bộ đếm check-in của 1 sự kiện trong process: tổng vé / đã check-in theo loại vé
+    (nạp bằng 1 query tổng hợp) + lượt quét gần đây để tính tốc độ. Cập nhật cộng dồn
+    từ đường check-in, không query lại.
+    """
+
+    def __init__(self, event_id: int, rows):
+        self.event_id = event_id
+        self.load(rows)
+        self.scans = deque()     # (ts, số lượt quét)
+        self.checkins = deque()  # (ts, số vé check-in)
+
+    def load(self, rows):
+        self.types = {
+            tid: {"id": tid, "name": name, "issued": int(issued or 0), "checked_in": int(used or 0)}
+            for tid, name, issued, used in rows
+        }
+        self.synced_at = time.time()
+
+    def record(self, scans: int, checked_in: dict[int, int], now: float):
+        if scans:
+            self.scans.append((now, scans))
+        n = 0
+        for tid, k in checked_in.items():
+            if tid in self.types:
+                self.types[tid]["checked_in"] += k
+            n += k
+        if n:
+            self.checkins.append((now, n))
+
+    @staticmethod
+    def _rate(window: deque, now: float) -> int:
+        while window and now - window[0][0] > _RATE_WINDOW:
+            window.popleft()
+        return sum(k for _, k in window)
+
+    def snapshot(self, now: float | None = None) -> dict:
+        now = now or time.time()
+        types = sorted(self.types.values(), key=lambda t: t["id"])
+        return {
+            "event_id": self.event_id,
+            "issued": sum(t["issued"] for t in types),
+            "checked_in": sum(t["checked_in"] for t in types),
+            "ticket_types": [dict(t) for t in types],
+            "scans_per_minute": self._rate(self.scans, now),
+            "checkins_per_minute": self._rate(self.checkins, now),
+            "at": int(now),
+        }
+
+
+class CheckinStatsHub:
+    """
+    Pub/sub trong process cho dashboard check-in (SSE). Chỉ sự kiện đang có người xem mới
+    có bộ đếm; mỗi lượt check-in đẩy 1 snapshot tới mọi dashboard đang mở nên N dashboard
+    không tạo N vòng query. Nhiều worker: mỗi process chỉ thấy check-in của mình nên bộ đếm
+    được nạp lại từ DB (1 query / sự kiện) sau mỗi `resync_seconds`.
+    """
+
+    def __init__(self, resync_seconds: float = 30, queue_size: int = 8):
+        self.resync_seconds = resync_seconds
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._events: dict[int, EventCheckinCounters] = {}
+        self._subscribers: dict[int, set] = {}
+
+    def subscribe(self, event_id: int) -> queue.Queue:
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(event_id, set()).add(q)
+        self._counters(event_id)
+        return q
+
+    def unsubscribe(self, event_id: int, q: queue.Queue):
+        with self._lock:
+            subs = self._subscribers.get(event_id)
+            if subs is not None:
+                subs.discard(q)
+                if not subs:
+                    # không còn ai xem: bỏ bộ đếm, lần mở sau nạp lại từ DB
+                    del self._subscribers[event_id]
+                    self._events.pop(event_id, None)
+
+    def _counters(self, event_id: int) -> EventCheckinCounters:
+        from app.dao.ticket_dao import get_checkin_totals
+        c = self._events.get(event_id)
+        if c is not None and time.time() - c.synced_at < self.resync_seconds:
+            return c
+        with self._lock:
+            c = self._events.get(event_id)
+            if c is not None:
+                if time.time() - c.synced_at < self.resync_seconds:
+                    return c
+                c.synced_at = time.time()  # chỉ 1 luồng nạp lại
+        rows = get_checkin_totals(event_id)
+        with self._lock:
+            if c is None:
+                c = self._events[event_id] = EventCheckinCounters(event_id, rows)
+            else:
+                c.load(rows)
+        return c
+
+    def snapshot(self, event_id: int) -> dict:
+        c = self._counters(event_id)
+        with self._lock:
+            return c.snapshot()
+
+    def record(self, event_id: int, scans: int, checked_in: dict[int, int]):
+        """Ghi nhận lượt quét + vé check-in thành công (theo ticket_type_id) rồi phát cho dashboard."""
+        if event_id not in self._subscribers:
+            return
+        with self._lock:
+            c = self._events.get(event_id)
+            if c is None:
+                return
+            c.record(scans, checked_in, time.time())
+            snap = c.snapshot()
+            subs = list(self._subscribers.get(event_id, ()))
+        for q in subs:
+            try:
+                q.put_nowait(snap)
+            except queue.Full:
+                # dashboard đọc chậm: bỏ snapshot cũ nhất, snapshot mới luôn đủ thông tin
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    q.put_nowait(snap)
+                except queue.Full:
+                    pass
+
+
+def get_checkin_stats() -> CheckinStatsHub:
+    return current_app.extensions["checkin_stats"]
+
+
+def record_scans(event_id: int, outcomes, invalid: int = 0):
+    """outcomes = [(error | None, view, checked_at)] như ticket_dao.checkin_batch / checkin_from_memory."""
+    checked_in = {}
+    scans = invalid
+    for error, v, _ in outcomes:
+        scans += 1
+        if error is None and v is not None:
+            checked_in[v.ticket_type_id] = checked_in.get(v.ticket_type_id, 0) + 1
+    get_checkin_stats().record(event_id, scans, checked_in)
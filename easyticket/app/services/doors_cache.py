@@ -0,0 +1,161 @@
+# app/services/doors_cache.py
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from types import SimpleNamespace
+
+from flask import current_app
+
+from app.models import TicketStatus
+from app.utils.qr_utils import token_digest
+
+_DIGEST_BYTES = 8
+_ACTIVE, _USED, _OTHER = 0, 1, 2
+_STATUS_BYTE = {TicketStatus.ACTIVE: _ACTIVE, TicketStatus.USED: _USED}
+
+
+class EventDoorState:
+    """
+    Trạng thái soát vé của 1 sự kiện trong bộ nhớ (chế độ "mở cổng").
+    Mỗi vé là 1 slot: id (array sắp xếp, tìm bằng bisect), trạng thái (bytearray),
+    digest qr_data (8 byte / vé) để chỉ nhận đúng token đang lưu trong DB.
+    """
+
+    def __init__(self, event_id: int, tickets, types: dict, buyers):
+        self.event_id = event_id
+        self.opened_at = time.time()
+        n = len(tickets)
+        self.ids = array("q", (t.id for t in tickets))
+        self.status = bytearray(_STATUS_BYTE.get(t.status, _OTHER) for t in tickets)
+        self.digests = b"".join(
+            bytes.fromhex(token_digest(t.qr_data, _DIGEST_BYTES)) if t.qr_data else bytes(_DIGEST_BYTES)
+            for t in tickets
+        )
+        self.codes = [t.ticket_code for t in tickets]
+        self.code_slot = {code: i for i, code in enumerate(self.codes)}
+        self.order_ids = array("q", (t.order_id or 0 for t in tickets))
+        self.issued_at = [t.issued_at for t in tickets]
+        self.use_at = {i: t.use_at for i, t in enumerate(tickets) if t.use_at}
+        self.type_ids = array("q", (t.ticket_type_id for t in tickets))
+        self.type_names = [types.get(t.ticket_type_id) for t in tickets]
+        self.buyers = {b[0]: b[1:] for b in buyers}
+        self.status_names = {i: t.status for i, t in enumerate(tickets) if t.status not in _STATUS_BYTE}
+        self.hits = 0
+        self.count = n
+
+    # ---------- tra cứu ----------
+    def slot_for(self, payload: dict, token: str) -> int | None:
+        """Slot của vé trong token (tid hoặc code), chỉ khi token trùng qr_data đã nạp."""
+        slot = None
+        tid = payload.get("tid")
+        if tid is not None:
+            i = bisect_left(self.ids, int(tid))
+            if i < self.count and self.ids[i] == int(tid):
+                slot = i
+        elif payload.get("code"):
+            slot = self.code_slot.get(payload["code"])
+        if slot is None:
+            return None
+        start = slot * _DIGEST_BYTES
+        if self.digests[start:start + _DIGEST_BYTES] != bytes.fromhex(token_digest(token, _DIGEST_BYTES)):
+            return None
+        return slot
+
+    def view(self, slot: int):
+        """Cùng các trường với ticket_dao.get_checkin_view để dùng chung định dạng JSON."""
+        buyer = self.buyers.get(self.order_ids[slot])
+        status = {_ACTIVE: TicketStatus.ACTIVE, _USED: TicketStatus.USED}.get(
+            self.status[slot], self.status_names.get(slot))
+        return SimpleNamespace(
+            id=self.ids[slot], ticket_code=self.codes[slot], status=status, event_id=self.event_id,
+            use_at=self.use_at.get(slot), issued_at=self.issued_at[slot],
+            ticket_type_id=self.type_ids[slot], ticket_type=self.type_names[slot],
+            buyer_id=buyer[0] if buyer else None,
+            username=buyer[1] if buyer else None, first_name=buyer[2] if buyer else None,
+            last_name=buyer[3] if buyer else None, email=buyer[4] if buyer else None,
+            phone=buyer[5] if buyer else None,
+        )
+
+    def is_used(self, slot: int) -> bool:
+        return self.status[slot] == _USED
+
+    def is_active(self, slot: int) -> bool:
+        return self.status[slot] == _ACTIVE
+
+    def mark_used(self, slot: int, use_at: datetime | None):
+        self.status[slot] = _USED
+        if use_at:
+            self.use_at[slot] = use_at
+
+    def stats(self) -> dict:
+        return {
+            "event_id": self.event_id,
+            "tickets": self.count,
+            "checked_in": self.status.count(_USED),
+            "scans_from_memory": self.hits,
+            "opened_at": datetime.fromtimestamp(self.opened_at).isoformat(timespec="seconds"),
+        }
+
+
+class DoorsRegistry:
+    """Các sự kiện đang mở cổng trong process này (mỗi worker tự nạp khi organizer bấm mở)."""
+
+    def __init__(self, max_open_seconds: float = 6 * 3600):
+        self.max_open_seconds = max_open_seconds
+        self._lock = threading.Lock()
+        self._events: dict[int, EventDoorState] = {}
+
+    def open(self, event_id: int) -> EventDoorState:
+        from app.dao.ticket_dao import get_door_rows
+        state = EventDoorState(event_id, *get_door_rows(event_id))
+        with self._lock:
+            self._events[event_id] = state
+        return state
+
+    def close(self, event_id: int) -> bool:
+        with self._lock:
+            return self._events.pop(event_id, None) is not None
+
+    def get(self, event_id: int) -> EventDoorState | None:
+        state = self._events.get(event_id)
+        if state and time.time() - state.opened_at > self.max_open_seconds:
+            # quên đóng cổng: tự quay về tra DB
+            self.close(event_id)
+            return None
+        return state
+
+
+def get_doors() -> DoorsRegistry:
+    return current_app.extensions["doors"]
+
+
+def checkin_from_memory(event_id: int, token: str, payload: dict):
+    """
+    Soát vé bằng bộ nhớ khi sự kiện đang mở cổng. Trả về (error | None, view, checked_at),
+    hoặc None nếu không trả lời được từ bộ nhớ (chưa mở cổng, vé mới phát hành, vé sự kiện khác...)
+    để caller đi đường DB. Check-in vẫn ghi xuống DB bằng UPDATE có điều kiện.
+    """
+    from app.dao.ticket_dao import checkin_ticket_id
+
+    state = get_doors().get(event_id)
+    if state is None or payload is None:
+        return None
+    slot = state.slot_for(payload, token)
+    if slot is None:
+        return None
+
+    state.hits += 1
+    if state.is_used(slot):
+        return "already_checked_in", state.view(slot), state.use_at.get(slot)
+    if not state.is_active(slot):
+        return "invalid_state", state.view(slot), None
+
+    now = datetime.utcnow()
+    if checkin_ticket_id(state.ids[slot], now):
+        state.mark_used(slot, now)
+        return None, state.view(slot), now
+    # worker / cổng khác đã check-in trước (DB là nguồn sự thật)
+    state.mark_used(slot, None)
+    return None
@@ -0,0 +1,169 @@
+# app/services/issuance_service.py
+from datetime import datetime
+from uuid import uuid4
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import OrderDetail, TicketStatus, IssuanceLedger, IssuanceStatus
+from app.dao.issuance_dao import get_ledger_entry, set_ledger_status
+from app.dao.hold_dao import convert_holds
+from app.dao.ticket_dao import bulk_insert_tickets, get_unsigned_tickets_of_order, bulk_set_qr_data
+from app.dao.ticket_type_dao import add_sold
+from app.utils.qr_utils import ticket_token, sign_compact
+
+
+def gen_ticket_code() -> str:
+    return f"TKT-{uuid4().hex[:12].upper()}"
+
+
+class TicketIssuanceService:
+    """
+    Phát hành vé cho 1 đơn hàng đã thanh toán:
+      - chuyển giữ chỗ thành vé đã bán (hoặc tăng sold có điều kiện nếu hold đã hết hạn)
+      - sinh ticket_code + ký QR theo ticket_code (không cần id auto-increment)
+      - insert toàn bộ vé bằng 1 lệnh executemany, commit 1 lần
+      - QR_TOKEN_FORMAT=v2: token cần ticket id nên insert trước, đọc id (1 SELECT)
+        rồi gán qr_data bằng 1 UPDATE ... CASE, vẫn trong cùng transaction
+    Mỗi đơn có 1 dòng trong sổ phát hành (unique order_id): PENDING -> ISSUED / FAILED.
+    Return URL, IPN và worker nền đều đi qua sổ này nên lặp lại (F5, back, IPN tới sau)
+    chỉ tốn 1 lookup theo order_id.
+    """
+
+    def issue_once(self, order_id: int, payment_id: int | None = None) -> IssuanceLedger:
+        """Phát hành đồng bộ (idempotent). Hết vé -> ValueError, sổ ghi FAILED."""
+        entry = self.ensure_ledger(order_id, payment_id)
+        if entry.status == IssuanceStatus.PENDING:
+            self.process(order_id, raise_errors=True)
+            entry = get_ledger_entry(order_id)
+        elif entry.status == IssuanceStatus.FAILED:
+            raise ValueError(entry.error or "Không phát hành được vé.")
+        return entry
+
+    def ensure_ledger(self, order_id: int, payment_id: int | None = None) -> IssuanceLedger:
+        entry = get_ledger_entry(order_id)
+        if entry:
+            return entry
+
+        entry = IssuanceLedger(order_id=order_id, payment_id=payment_id, status=IssuanceStatus.PENDING)
+        db.session.add(entry)
+        try:
+            # unique(order_id) chặn 2 request đồng thời cùng ghi sổ 1 đơn
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return get_ledger_entry(order_id)
+        return entry
+
+    def process(self, order_id: int, raise_errors: bool = False) -> bool:
+        """Phát hành cho 1 dòng sổ PENDING. Trả về False nếu đã có nơi khác xử lý."""
+        # chiếm dòng sổ: UPDATE có điều kiện nên chỉ 1 worker/request đi tiếp
+        claimed = (
+            db.session.query(IssuanceLedger)
+            .filter(IssuanceLedger.order_id == order_id, IssuanceLedger.status == IssuanceStatus.PENDING)
+            .update({IssuanceLedger.status: IssuanceStatus.ISSUED}, synchronize_session=False)
+        )
+        if claimed != 1:
+            db.session.rollback()
+            return False
+
+        try:
+            count = self.issue_for_order(order_id, commit=False)
+        except ValueError as ex:
+            # transaction đã rollback (kể cả bước chiếm sổ): chỉ ghi FAILED nếu chưa ai xử lý
+            set_ledger_status(order_id, IssuanceStatus.FAILED, error=str(ex),
+                              from_status=IssuanceStatus.PENDING)
+            db.session.commit()
+            if raise_errors:
+                raise
+            return True
+
+        set_ledger_status(order_id, IssuanceStatus.ISSUED, ticket_count=count)
+        db.session.commit()
+        return True
+
+    def issue_for_order(self, order_id: int, commit: bool = True) -> int:
+        ods = (
+            db.session.query(OrderDetail)
+            .options(joinedload(OrderDetail.ticket_type))
+            .filter(OrderDetail.order_id == order_id)
+            .all()
+        )
+        if not ods:
+            return 0
+
+        self._allocate_stock(order_id, ods)
+
+        compact = current_app.config.get("QR_TOKEN_FORMAT") == "v2"
+        rows = self.build_ticket_rows(order_id, ods, sign=not compact)
+        bulk_insert_tickets(rows)
+        if compact:
+            self.sign_compact_tickets(order_id)
+        if commit:
+            db.session.commit()
+        return len(rows)
+
+    @staticmethod
+    def _allocate_stock(order_id: int, ods) -> None:
+        # Chuyển giữ chỗ thành vé đã bán; phần không còn giữ chỗ (hold đã hết hạn
+        # và bị reaper thu hồi) thì tăng sold có điều kiện. Cùng transaction với Ticket
+        converted = convert_holds(order_id)
+        for od in ods:
+            held = min(converted.get(od.ticket_type_id, 0), od.quantity)
+            converted[od.ticket_type_id] = converted.get(od.ticket_type_id, 0) - held
+            missing = od.quantity - held
+            if missing and not add_sold(od.ticket_type_id, missing):
+                db.session.rollback()
+                # Ở bản thật: đánh dấu Payment REFUND và báo hết vé.
+                raise ValueError(f"Hết vé {od.ticket_type.name} trong lúc thanh toán.")
+
+    @staticmethod
+    def sign_compact_tickets(order_id: int) -> None:
+        iat = int(datetime.now().timestamp())
+        bulk_set_qr_data({
+            tid: sign_compact(tid, event_id, iat)
+            for tid, event_id in get_unsigned_tickets_of_order(order_id)
+        })
+
+    @staticmethod
+    def build_ticket_rows(order_id: int, ods, sign: bool = True) -> list[dict]:
+        now = datetime.now()
+        issued_at = datetime.utcnow()
+        rows = []
+        for od in ods:
+            event_id = od.ticket_type.event_id
+            for _ in range(od.quantity):
+                code = gen_ticket_code()
+                rows.append({
+                    "ticket_code": code,
+                    "status": TicketStatus.ACTIVE,
+                    "order_id": order_id,
+                    "ticket_type_id": od.ticket_type_id,
+                    "event_id": event_id,
+                    "qr_data": ticket_token(code, order_id, event_id) if sign else None,
+                    "issued_at": issued_at,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+        return rows
+
+
+def request_issuance(order_id: int, payment_id: int | None = None) -> IssuanceLedger:
+    """
+    Ghi sổ PENDING rồi giao cho worker nền (ISSUANCE_WORKERS > 0), hoặc phát hành
+    ngay trong request nếu tắt worker. Gọi lại nhiều lần vẫn an toàn.
+    """
+    entry = TicketIssuanceService().ensure_ledger(order_id, payment_id)
+    if entry.status == IssuanceStatus.PENDING:
+        worker = current_app.extensions["issuance_worker"]
+        if worker.submit(order_id) is None:
+            # chạy inline -> đọc lại trạng thái sau khi phát hành
+            db.session.expire(entry)
+    return entry
+
+
+def issue_tickets_after_payment(order_id: int, payment_id: int | None = None) -> IssuanceLedger:
+    """Dùng cho IPN: thanh toán thành công thì yêu cầu phát hành (idempotent)."""
+    return request_issuance(order_id, payment_id)
@@ -0,0 +1,77 @@
+# app/services/issuance_worker.py
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from app import db
+
+
+class IssuanceWorker:
+    """
+    Thread pool trong process để phát hành vé sau thanh toán, giúp return URL của
+    cổng thanh toán trả trang ngay. max_workers = 0 thì chạy inline trong request.
+    Trạng thái thật nằm ở sổ phát hành (issuance_ledger), nên nếu process chết giữa chừng,
+    lần gọi request_issuance kế tiếp (F5 / IPN retry) sẽ giao lại việc.
+    """
+
+    def __init__(self, app, max_workers: int = 4):
+        self.app = app
+        self.max_workers = max_workers
+        self._executor = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="issuance")
+            if max_workers > 0 else None
+        )
+        self._lock = threading.Lock()
+        self._inflight: set[int] = set()
+
+    def submit(self, order_id: int) -> Future | None:
+        """Giao việc phát hành cho đơn. Trả về None nếu đã chạy inline."""
+        if self._executor is None:
+            self._process(order_id)
+            return None
+        with self._lock:
+            if order_id in self._inflight:
+                return self._noop()
+            self._inflight.add(order_id)
+        return self._executor.submit(self._run, order_id)
+
+    def _run(self, order_id: int):
+        with self.app.app_context():
+            try:
+                self._process(order_id)
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception("Issuance worker failed for order %s", order_id)
+                self._mark_failed(order_id)
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._inflight.discard(order_id)
+
+    def _mark_failed(self, order_id: int):
+        # lỗi ngoài dự kiến (không phải hết vé): ghi FAILED để trang poll dừng chờ,
+        # nếu không sổ kẹt PENDING mãi vì endpoint poll không giao lại việc
+        from app.dao.issuance_dao import set_ledger_status
+        from app.models import IssuanceStatus
+        try:
+            set_ledger_status(order_id, IssuanceStatus.FAILED,
+                              error="Lỗi hệ thống khi phát hành vé, vui lòng liên hệ hỗ trợ.",
+                              from_status=IssuanceStatus.PENDING)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception("Could not mark issuance FAILED for order %s", order_id)
+
+    @staticmethod
+    def _process(order_id: int):
+        from app.services.issuance_service import TicketIssuanceService
+        TicketIssuanceService().process(order_id)
+
+    @staticmethod
+    def _noop() -> Future:
+        f = Future()
+        f.set_result(None)
+        return f
+
+    def shutdown(self, wait: bool = True):
+        if self._executor:
+            self._executor.shutdown(wait=wait)
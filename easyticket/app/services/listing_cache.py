@@ -0,0 +1,219 @@
+# app/services/listing_cache.py
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from itertools import chain
+from typing import NamedTuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session
+
+from app.utils.search_utils import search_terms
+
+
+class ListingCount(NamedTuple):
+    total: int
+    # None = đếm chính xác, "estimate" = thống kê bảng, "at_least" = đã chạm ngưỡng đếm
+    approx: str | None = None
+
+
+def listing_key(kind: str, **filters) -> tuple:
+    """
+    Khóa chuẩn hóa của 1 bộ lọc danh sách: bỏ tham số rỗng, từ khóa bỏ dấu + chữ thường,
+    ngày về ISO, sắp theo tên -> "Hà Nội " và "ha noi" dùng chung 1 mục cache.
+    """
+    items = []
+    for name, v in filters.items():
+        if v is None or v == "":
+            continue
+        if name == "q":
+            v = " ".join(search_terms(v))
+            if not v:
+                continue
+        elif isinstance(v, (datetime, date)):
+            v = v.isoformat()
+        elif isinstance(v, str):
+            v = " ".join(v.lower().split())
+        items.append((name, v))
+    return (kind, *sorted(items))
+
+
+class _GenerationLRU:
+    """
+    LRU + TTL trong process, xóa sạch bằng invalidate(). Giá trị đang tính dở khi có
+    invalidate (dữ liệu vừa đổi) sẽ không được lưu nhờ số thế hệ (generation).
+    """
+
+    def __init__(self, ttl: float, max_items: int):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._items: OrderedDict = OrderedDict()
+        self._generation = 0
+        self.hits = self.misses = 0
+
+    def lookup(self, key):
+        """(giá trị | None, thế hệ lúc tra) — truyền thế hệ lại cho store()."""
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is not None and hit[0] > time.monotonic():
+                self._items.move_to_end(key)
+                self.hits += 1
+                return hit[1], self._generation
+            self.misses += 1
+            return None, self._generation
+
+    def store(self, key, value, generation: int):
+        with self._lock:
+            if generation != self._generation or self.max_items <= 0:
+                return
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._items.clear()
+            self._generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"items": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+class ListingCountCache(_GenerationLRU):
+    """
+    Cache số kết quả của trang danh sách / tìm kiếm để mỗi lần tải trang chỉ còn chạy
+    query lấy danh sách. Khi số dòng vượt `approx_threshold` thì không đếm hết:
+    danh sách không lọc lấy số ước lượng từ thống kê bảng, có lọc thì dừng đếm ở ngưỡng.
+    Bị xóa sạch khi sự kiện / loại vé thay đổi (xem _after_commit).
+    """
+
+    def __init__(self, ttl: float = 60, approx_threshold: int = 10000, max_items: int = 1024):
+        super().__init__(ttl, max_items)
+        self.approx_threshold = approx_threshold
+
+    def get(self, key: tuple, counter, table_rows=None) -> ListingCount:
+        """
+        counter(limit) -> số dòng khớp (đếm tối đa `limit` dòng nếu limit khác None);
+        table_rows() -> số dòng ước lượng từ thống kê bảng, chỉ truyền cho danh sách không lọc.
+        """
+        value, generation = self.lookup(key)
+        if value is None:
+            value = self._count(counter, table_rows)
+            self.store(key, value, generation)
+        return value
+
+    def _count(self, counter, table_rows) -> ListingCount:
+        limit = self.approx_threshold
+        if not limit:
+            return ListingCount(counter(None))
+        if table_rows is not None:
+            rows = table_rows()
+            if rows is not None and rows > limit:
+                return ListingCount(rows, "estimate")
+        n = counter(limit + 1)
+        if n > limit:
+            return ListingCount(limit, "at_least")
+        return ListingCount(n)
+
+
+class CachedPage(NamedTuple):
+    ids: tuple
+    next_cursor: str | None
+    prev_cursor: str | None
+
+
+class SearchResultCache(_GenerationLRU):
+    """
+    Cache kết quả /events/search: chỉ giữ danh sách id + cursor của từng trang (vài trăm byte),
+    nạp lại Event bằng 1 query IN; giới hạn bộ nhớ bằng LRU theo số trang.
+    """
+
+    def get(self, key: tuple, search, per_page: int):
+        """search() -> KeysetPage; trả về KeysetPage (trang lấy từ cache không có total)."""
+        from app.dao.event_dao import get_events_by_ids
+        from app.utils.pagination import KeysetPage
+        cached, generation = self.lookup(key)
+        if cached is not None:
+            return KeysetPage(None, get_events_by_ids(cached.ids), per_page,
+                              cached.next_cursor, cached.prev_cursor)
+        page = search()
+        self.store(key, CachedPage(tuple(e.id for e in page.items), page.next_cursor, page.prev_cursor),
+                   generation)
+        return page
+
+
+def get_listing_counts() -> ListingCountCache:
+    return current_app.extensions["listing_counts"]
+
+
+def get_search_results() -> SearchResultCache:
+    return current_app.extensions["search_results"]
+
+
+def count_all_events_cached() -> ListingCount:
+    from app.dao.event_dao import count_all_events, estimate_event_rows
+    return get_listing_counts().get(listing_key("all"), lambda limit: count_all_events(limit=limit),
+                                    table_rows=estimate_event_rows)
+
+
+def search_events_cached(cursor: str | None = None, per_page: int = 12, order_by: str = "newest",
+                         **filters):
+    """search_events qua cache kết quả; filters như search_events."""
+    from app.dao.event_dao import search_events
+    # cursor phân biệt hoa thường nên không đưa qua listing_key
+    key = (listing_key("results", order_by=order_by, **filters), cursor, per_page)
+    return get_search_results().get(
+        key, lambda: search_events(cursor=cursor, per_page=per_page, order_by=order_by, **filters), per_page)
+
+
+def count_events_cached(**filters) -> ListingCount:
+    """filters như search_events (không gồm cursor / per_page / order_by)."""
+    from app.dao.event_dao import count_events
+    return get_listing_counts().get(listing_key("search", **filters),
+                                    lambda limit: count_events(limit=limit, **filters))
+
+
+# ---------- vô hiệu hóa khi dữ liệu danh sách thay đổi ----------
+def _watched():
+    from app.models import Event, TicketType
+    return Event, TicketType
+
+
+def _after_flush(session, flush_context):
+    # sau flush new/dirty/deleted vẫn còn trạng thái trước flush
+    watched = _watched()
+    if any(isinstance(o, watched) for o in chain(session.new, session.dirty, session.deleted)):
+        session.info["listing_changed"] = True
+
+
+def _after_commit(session):
+    if session.info.pop("listing_changed", False) and has_app_context():
+        for name in ("listing_counts", "search_results"):
+            cache = current_app.extensions.get(name)
+            if cache is not None:
+                cache.invalidate()
+
+
+def _after_rollback(session):
+    session.info.pop("listing_changed", None)
+
+
+def init_listing_cache(app):
+    app.extensions["listing_counts"] = ListingCountCache(
+        ttl=app.config["LISTING_COUNT_TTL"],
+        approx_threshold=app.config["LISTING_COUNT_APPROX_THRESHOLD"],
+        max_items=app.config["LISTING_COUNT_CACHE_SIZE"],
+    )
+    app.extensions["search_results"] = SearchResultCache(
+        ttl=app.config["SEARCH_CACHE_TTL"],
+        max_items=app.config["SEARCH_CACHE_SIZE"],
+    )
+    if not sa_event.contains(Session, "after_flush", _after_flush):
+        sa_event.listen(Session, "after_flush", _after_flush)
+        sa_event.listen(Session, "after_commit", _after_commit)
+        sa_event.listen(Session, "after_rollback", _after_rollback)
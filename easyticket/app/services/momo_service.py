@@ -9,6 +9,7 @@ from flask import Request
 from app.models import Order, Payment, PaymentStatus
 from app.configs import momo_configs as MoMoConfigs
 from app.dao.payment_dao import create_payment, update_payment_status
+from app.services.issuance_service import issue_tickets_after_payment
 
 class AccessDeniedException(Exception):
     pass
@@ -131,6 +132,7 @@ class MoMoService:
 
         if result_code == "0":
             update_payment_status(payment_id, PaymentStatus.SUCCESS, trans_id)
+            issue_tickets_after_payment(order_id, payment_id)
             return {"resultCode": 0, "message": "Success"}
         else:
             update_payment_status(payment_id, PaymentStatus.FAILED, trans_id)
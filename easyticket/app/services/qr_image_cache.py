@@ -0,0 +1,116 @@
+# app/services/qr_image_cache.py
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from flask import current_app
+
+from app.utils.qr_utils import token_digest
+
+MIMETYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def qr_etag(token: str, fmt: str) -> str:
+    """ETag mạnh suy ra từ token (không cần render): cùng token + định dạng -> cùng ảnh."""
+    return f"{token_digest(token, 16)}-{fmt}"
+
+
+def qr_version(token: str) -> str:
+    """Tham số ?v= cho URL ảnh QR: đổi khi token đổi nên URL có v được cache vĩnh viễn."""
+    return token_digest(token, 6)
+
+
+def render_qr(token: str, fmt: str = "png") -> bytes:
+    buf = BytesIO()
+    if fmt == "svg":
+        qrcode.make(token, image_factory=qrcode.image.svg.SvgPathImage).save(buf)
+    else:
+        qrcode.make(token).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class QRImageCache:
+    """
+    Cache ảnh QR đã render theo digest của token: LRU trong process giới hạn theo số ảnh
+    và tổng số byte, tùy chọn thêm thư mục trên đĩa dùng chung giữa các worker / lần restart.
+    """
+
+    def __init__(self, max_items: int = 2048, max_bytes: int = 32 * 1024 * 1024, disk_dir: str | None = None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._lock = threading.Lock()
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        self.hits = self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, token: str, fmt: str = "png") -> bytes:
+        key = qr_etag(token, fmt)
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        data = self._read_disk(key, fmt)
+        if data is None:
+            data = render_qr(token, fmt)
+            self._write_disk(key, fmt, data)
+        self._put(key, data)
+        return data
+
+    def _put(self, key: str, data: bytes):
+        if self.max_items <= 0 or len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._items[key] = data
+            self._bytes += len(data)
+            while len(self._items) > self.max_items or self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    # ---------- đĩa ----------
+    def _path(self, key: str, fmt: str) -> str:
+        # chia thư mục con theo 2 ký tự đầu để không dồn hàng trăm nghìn file vào 1 thư mục
+        return os.path.join(self.disk_dir, key[:2], f"{key}.{fmt}")
+
+    def _read_disk(self, key: str, fmt: str) -> bytes | None:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._path(key, fmt), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, fmt: str, data: bytes):
+        if not self.disk_dir:
+            return
+        path = self._path(key, fmt)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)  # ghi nguyên tử: worker khác không đọc phải file dở
+        except OSError:
+            current_app.logger.warning("Không ghi được cache QR %s", path, exc_info=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"items": len(self._items), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+def get_qr_image_cache() -> QRImageCache:
+    return current_app.extensions["qr_images"]
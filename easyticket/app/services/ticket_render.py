@@ -0,0 +1,266 @@
+# app/services/ticket_render.py
+"""
+Render vé ra ảnh (QR + nhãn) trên process pool và ghép thành PDF / ZIP dạng stream:
+mỗi trang / mỗi file được gửi cho client ngay khi render xong, không giữ cả file trong RAM.
+Các hàm render nhận dict thuần (picklable) để chạy được ở process con.
+"""
+import io
+import multiprocessing
+import os
+import threading
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import qrcode
+from flask import current_app
+from PIL import Image, ImageDraw, ImageFont
+
+RENDER_DPI = 150
+CARD_SIZE = (874, 1240)  # A6 dọc ở 150 dpi
+SHEET_SIZE = (1240, 1754)  # A4 dọc ở 150 dpi
+SHEET_GRID = (3, 5)  # cột x hàng nhãn trên 1 tờ in
+
+# font mặc định đi kèm repo: font có sẵn của Pillow không có glyph tiếng Việt ("ộ", "ờ" ra ô vuông)
+DEFAULT_FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static", "fonts", "DejaVuSans.ttf")
+
+_fonts = {}
+
+
+def _font(size: int, path: str | None = None):
+    path = path or DEFAULT_FONT_PATH
+    key = (size, path)
+    if key not in _fonts:
+        try:
+            _fonts[key] = ImageFont.truetype(path, size)
+        except (OSError, TypeError):
+            _fonts[key] = ImageFont.load_default()
+    return _fonts[key]
+
+
+def qr_image(token: str, box_size: int = 10, border: int = 2) -> Image.Image:
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=box_size, border=border)
+    qr.add_data(token)
+    qr.make(fit=True)
+    return qr.make_image().get_image().convert("L")
+
+
+def ticket_card(ticket) -> dict:
+    """Dữ liệu render 1 vé (Ticket đã joinedload event + ticket_type)."""
+    ev = ticket.event
+    return {
+        "code": ticket.ticket_code,
+        "qr": ticket.qr_data,
+        "event": ev.name if ev else "",
+        "when": ev.start_datetime.strftime("%d/%m/%Y %H:%M") if ev and ev.start_datetime else "",
+        "where": (ev.address or "") if ev else "",
+        "ticket_type": ticket.ticket_type.name if ticket.ticket_type else "",
+    }
+
+
+def render_card(card: dict, font_path: str | None = None) -> Image.Image:
+    w, h = CARD_SIZE
+    img = Image.new("L", CARD_SIZE, 255)
+    draw = ImageDraw.Draw(img)
+    draw.text((60, 60), card["event"][:40], font=_font(44, font_path), fill=0)
+    draw.text((60, 125), card["when"], font=_font(30, font_path), fill=60)
+    draw.text((60, 170), card["where"][:60], font=_font(26, font_path), fill=60)
+
+    qr = qr_image(card["qr"])
+    side = w - 200
+    qr = qr.resize((side, side), Image.NEAREST)
+    img.paste(qr, (100, 250))
+
+    y = 250 + side + 30
+    draw.text((60, y), card["ticket_type"][:40], font=_font(40, font_path), fill=0)
+    draw.text((60, y + 60), card["code"], font=_font(34, font_path), fill=0)
+    draw.rectangle((20, 20, w - 21, h - 21), outline=0, width=3)
+    return img
+
+
+def render_sheet(sheet: dict, font_path: str | None = None) -> Image.Image:
+    """1 tờ A4: tiêu đề + lưới nhãn (QR, loại vé, mã vé) kèm đường cắt."""
+    w, h = SHEET_SIZE
+    cols, rows = SHEET_GRID
+    img = Image.new("L", SHEET_SIZE, 255)
+    draw = ImageDraw.Draw(img)
+    draw.text((40, 30), f"{sheet['title'][:60]}  -  tờ {sheet['page']}", font=_font(28, font_path), fill=0)
+
+    top = 90
+    cw, ch = (w - 80) // cols, (h - top - 40) // rows
+    side = min(cw - 40, ch - 80)
+    for i, label in enumerate(sheet["labels"]):
+        x = 40 + (i % cols) * cw
+        y = top + (i // cols) * ch
+        draw.rectangle((x, y, x + cw - 1, y + ch - 1), outline=180)
+        qr = qr_image(label["qr"], box_size=4, border=1).resize((side, side), Image.NEAREST)
+        img.paste(qr, (x + (cw - side) // 2, y + 10))
+        draw.text((x + 12, y + side + 16), label["ticket_type"][:28], font=_font(22, font_path), fill=0)
+        draw.text((x + 12, y + side + 44), label["code"], font=_font(20, font_path), fill=0)
+    return img
+
+
+def sheet_png(sheet: dict, font_path: str | None = None) -> bytes:
+    buf = io.BytesIO()
+    render_sheet(sheet, font_path).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def print_sheets(title: str, labels, per_sheet: int = SHEET_GRID[0] * SHEET_GRID[1]):
+    """Gom nhãn (iterable, có thể lazy) thành các tờ {"title", "page", "labels"}."""
+    batch, page = [], 0
+    for label in labels:
+        batch.append(label)
+        if len(batch) == per_sheet:
+            page += 1
+            yield {"title": title, "page": page, "labels": batch}
+            batch = []
+    if batch:
+        yield {"title": title, "page": page + 1, "labels": batch}
+
+
+def event_sheets_zip(event, font_path: str | None = None):
+    """Các đoạn bytes của file ZIP tờ in cả sự kiện (dùng chung cho route và lệnh `flask qr sheets`)."""
+    from app.dao.ticket_dao import iter_print_labels
+    sheets = print_sheets(event.name, iter_print_labels(event.id))
+    pngs = get_render_pool().imap(sheet_png, sheets, font_path)
+    return stream_zip((f"sheet-{page:05d}.png", png) for page, png in enumerate(pngs, start=1))
+
+
+def card_png(card: dict, font_path: str | None = None) -> bytes:
+    buf = io.BytesIO()
+    render_card(card, font_path).save(buf, format="PNG", optimize=False)
+    return buf.getvalue()
+
+
+def card_pdf_page(card: dict, font_path: str | None = None):
+    return pdf_page(render_card(card, font_path))
+
+
+def pdf_page(img: Image.Image):
+    """(width, height, dữ liệu xám nén Flate) cho stream_pdf."""
+    img = img.convert("L")
+    return img.width, img.height, zlib.compress(img.tobytes(), 6)
+
+
+class RenderPool:
+    """
+    Process pool render ảnh vé (CPU nặng, giữ GIL nếu chạy trong thread của worker web).
+    processes = 0 thì render ngay trong request (dùng cho test / máy 1 core).
+    Pool chỉ được tạo khi có việc; dùng "spawn" để process con không kế thừa thread của worker.
+    """
+
+    def __init__(self, processes: int = 2):
+        self.processes = processes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def imap(self, fn, items, *args, window: int | None = None):
+        """Kết quả fn(item, *args) đúng thứ tự; tối đa `window` việc đang chờ để giới hạn bộ nhớ."""
+        if self.processes <= 0:
+            for it in items:
+                yield fn(it, *args)
+            return
+        pool = self._pool()
+        window = window or self.processes * 2
+        pending = deque()
+        try:
+            for it in items:
+                pending.append(pool.submit(fn, it, *args))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # client ngắt kết nối giữa chừng: bỏ các trang chưa render
+            for f in pending:
+                f.cancel()
+
+    def shutdown(self, wait: bool = True):
+        if self._executor:
+            self._executor.shutdown(wait=wait)
+
+
+def get_render_pool() -> RenderPool:
+    return current_app.extensions["render_pool"]
+
+
+class _Sink(io.RawIOBase):
+    # đích ghi không seek được: zipfile tự dùng data descriptor, ta lấy ra từng đoạn đã ghi
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries):
+    """entries = iterable (tên file, bytes) -> các đoạn bytes của file ZIP (không nén lại PNG)."""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+        for name, data in entries:
+            zf.writestr(name, data)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_pdf(pages, dpi: int = RENDER_DPI):
+    """
+    pages = iterable (width, height, ảnh xám nén Flate) -> các đoạn bytes của 1 file PDF,
+    mỗi trang 1 ảnh phủ kín. Cây /Pages được ghi cuối cùng nên không cần biết trước số trang.
+    """
+    offsets = {}
+    pos = 0
+
+    def obj(num: int, body: bytes) -> bytes:
+        nonlocal pos
+        offsets[num] = pos
+        data = b"%d 0 obj\n" % num + body + b"\nendobj\n"
+        pos += len(data)
+        return data
+
+    head = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    pos = len(head)
+    yield head + obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    kids = []
+    num = 3
+    for w, h, data in pages:
+        pw, ph = w * 72 / dpi, h * 72 / dpi
+        image, content, page = num, num + 1, num + 2
+        num += 3
+        ops = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (pw, ph)
+        chunk = obj(image, b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                           b"/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>\nstream\n%s\nendstream"
+                    % (w, h, len(data), data))
+        chunk += obj(content, b"<< /Length %d >>\nstream\n%s\nendstream" % (len(ops), ops))
+        chunk += obj(page, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] "
+                           b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+                     % (pw, ph, image, content))
+        kids.append(page)
+        yield chunk
+
+    tail = obj(2, b"<< /Type /Pages /Kids [%s] /Count %d >>"
+               % (b" ".join(b"%d 0 R" % k for k in kids), len(kids)))
+    xref = pos
+    tail += b"xref\n0 %d\n0000000000 65535 f \n" % num
+    tail += b"".join(b"%010d 00000 n \n" % offsets[i] for i in range(1, num))
+    tail += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (num, xref)
+    yield tail
@@ -13,6 +13,7 @@ from app.models import Order, Payment, PaymentStatus, PaymentMethod
 from app.configs import vnpay_configs as VNPayConfigs
 from app.utils.vnpay_utils import hmac_sha512
 from app.dao.payment_dao import *
+from app.services.issuance_service import issue_tickets_after_payment
 
 
 class AccessDeniedException(Exception):
@@ -129,6 +130,7 @@ class VNPayServiceImpl:
 
         if trans_status == "00" and rsp_code == "00":
             update_payment_status(payment_id, PaymentStatus.SUCCESS, trans_no)
+            issue_tickets_after_payment(order_id, payment_id)
         else:
             update_payment_status(payment_id, PaymentStatus.FAILED, trans_no)
 
@@ -0,0 +1,173 @@
+# app/services/waiting_room.py
+import threading
+import time
+from collections import deque
+from uuid import uuid4
+
+from flask import current_app, session
+from itsdangerous import URLSafeSerializer, BadSignature
+
+
+class WaitingRoom:
+    """
+    Hàng chờ vào trang mua vé cho các sự kiện nhu cầu cao (high_demand).
+
+    Toàn bộ trạng thái nằm trong bộ nhớ của process: mỗi sự kiện chỉ cho tối đa
+    `capacity` phiên được vào trang chi tiết / tạo đơn cùng lúc, các phiên còn lại
+    xếp hàng và poll trạng thái mà không chạm DB. Khi chạy nhiều worker, giới hạn
+    áp dụng cho từng worker.
+    """
+
+    def __init__(self, capacity: int = 200, admission_ttl: float = 600, idle_timeout: float = 60,
+                 flag_ttl: float = 15, flag_loader=None, clock=time.monotonic):
+        self.capacity = capacity
+        self.admission_ttl = admission_ttl
+        self.idle_timeout = idle_timeout
+        self.flag_ttl = flag_ttl
+        self.flag_loader = flag_loader
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._queues: dict[int, deque] = {}             # event_id -> deque[(seq, visitor_id)]
+        self._waiting: dict[int, dict[str, list]] = {}  # event_id -> {visitor_id: [seq, last_seen]}
+        self._admitted: dict[int, dict[str, float]] = {}  # event_id -> {visitor_id: expires_at}
+        self._next_seq: dict[int, int] = {}
+        self._gated: frozenset[int] = frozenset()
+        self._gated_loaded_at: float | None = None
+
+    # ---------- sự kiện nào cần xếp hàng ----------
+    def is_gated(self, event_id: int) -> bool:
+        now = self.clock()
+        if self.flag_loader and (self._gated_loaded_at is None or now - self._gated_loaded_at > self.flag_ttl):
+            self._gated = frozenset(self.flag_loader())
+            self._gated_loaded_at = now
+        return event_id in self._gated
+
+    def invalidate_flags(self):
+        self._gated_loaded_at = None
+
+    # ---------- hàng chờ ----------
+    def join(self, event_id: int, visitor_id: str) -> int | None:
+        """Vào hàng (idempotent). Trả về vị trí, hoặc None nếu đã được vào."""
+        with self._lock:
+            now = self.clock()
+            if self._is_admitted(event_id, visitor_id, now):
+                return None
+            waiting = self._waiting.setdefault(event_id, {})
+            if visitor_id not in waiting:
+                seq = self._next_seq.get(event_id, 0)
+                self._next_seq[event_id] = seq + 1
+                waiting[visitor_id] = [seq, now]
+                self._queues.setdefault(event_id, deque()).append((seq, visitor_id))
+            return self._status(event_id, visitor_id, now)[1]
+
+    def status(self, event_id: int, visitor_id: str) -> tuple[bool, int | None]:
+        """(đã được vào?, vị trí trong hàng). Vị trí None nếu không có trong hàng."""
+        with self._lock:
+            return self._status(event_id, visitor_id, self.clock())
+
+    def is_admitted(self, event_id: int, visitor_id: str | None) -> bool:
+        if not visitor_id:
+            return False
+        with self._lock:
+            return self._is_admitted(event_id, visitor_id, self.clock())
+
+    def release(self, event_id: int, visitor_id: str | None):
+        """Trả lại suất vào (vd: đã tạo đơn xong) để người tiếp theo được vào."""
+        with self._lock:
+            self._admitted.get(event_id, {}).pop(visitor_id, None)
+            self._pump(event_id, self.clock())
+
+    def stats(self, event_id: int) -> dict:
+        with self._lock:
+            return {
+                "waiting": len(self._waiting.get(event_id, {})),
+                "admitted": len(self._admitted.get(event_id, {})),
+                "capacity": self.capacity,
+            }
+
+    # ---------- nội bộ (đã giữ lock) ----------
+    def _is_admitted(self, event_id, visitor_id, now) -> bool:
+        expires_at = self._admitted.get(event_id, {}).get(visitor_id)
+        return expires_at is not None and expires_at > now
+
+    def _status(self, event_id, visitor_id, now):
+        waiting = self._waiting.get(event_id, {})
+        entry = waiting.get(visitor_id)
+        if entry:
+            entry[1] = now
+        self._pump(event_id, now)
+        if self._is_admitted(event_id, visitor_id, now):
+            return True, None
+        entry = waiting.get(visitor_id)
+        if not entry:
+            return False, None
+        queue = self._queues.get(event_id)
+        head_seq = queue[0][0] if queue else entry[0]
+        return False, entry[0] - head_seq + 1
+
+    def _pump(self, event_id, now):
+        admitted = self._admitted.setdefault(event_id, {})
+        for vid in [v for v, exp in admitted.items() if exp <= now]:
+            del admitted[vid]
+
+        queue = self._queues.get(event_id)
+        waiting = self._waiting.get(event_id, {})
+        while queue and len(admitted) < self.capacity:
+            seq, vid = queue.popleft()
+            entry = waiting.pop(vid, None)
+            # bỏ qua người đã rời hàng (không poll quá idle_timeout)
+            if entry is None or now - entry[1] > self.idle_timeout:
+                continue
+            admitted[vid] = now + self.admission_ttl
+
+
+# ---------- token hàng chờ (ký bằng SECRET_KEY) ----------
+def _serializer():
+    return URLSafeSerializer(current_app.secret_key, salt="waiting-room")
+
+
+def new_queue_token(event_id: int) -> str:
+    return _serializer().dumps({"e": event_id, "v": uuid4().hex})
+
+
+def read_queue_token(token: str | None, event_id: int) -> str | None:
+    """Trả về visitor_id nếu token hợp lệ và đúng sự kiện."""
+    if not token:
+        return None
+    try:
+        data = _serializer().loads(token)
+    except BadSignature:
+        return None
+    if data.get("e") != event_id:
+        return None
+    return data.get("v")
+
+
+def get_waiting_room() -> WaitingRoom:
+    return current_app.extensions["waiting_room"]
+
+
+# ---------- helper cho blueprint: token hàng chờ lưu trong session theo sự kiện ----------
+def session_queue_token(event_id: int, create: bool = False) -> str | None:
+    tokens = session.get("queue_tokens") or {}
+    token = tokens.get(str(event_id))
+    if token is None and create:
+        token = new_queue_token(event_id)
+        session["queue_tokens"] = {**tokens, str(event_id): token}
+    return token
+
+
+def has_admission(event_id: int) -> bool:
+    """True nếu sự kiện không cần xếp hàng hoặc phiên hiện tại đã được vào."""
+    room = get_waiting_room()
+    if not room.is_gated(event_id):
+        return True
+    return room.is_admitted(event_id, read_queue_token(session_queue_token(event_id), event_id))
+
+
+def release_admission(event_id: int):
+    room = get_waiting_room()
+    visitor_id = read_queue_token(session_queue_token(event_id), event_id)
+    if visitor_id:
+        room.release(event_id, visitor_id)
@@ -1,6 +1,9 @@
 import pytest
+from contextlib import contextmanager
+from flask import g
+from sqlalchemy import event as sa_event
 from app import create_app, db
-from app.models import User, Category, EventType, Event, TicketType, Ticket
+from app.models import User, Category, EventType, Event, TicketType, Ticket, Order
 from werkzeug.security import generate_password_hash
 from app.models import TicketStatus
 from datetime import datetime, timedelta, timezone
@@ -113,3 +116,54 @@ updated_at=datetime.now(timezone.utc)
     db_session.commit()
 
     yield {"organizer": organizer, "buyer": buyer, "event": ev, "ticket": tk}
+
+
+@pytest.fixture()
+def count_statements(app):
+    """
+    with count_statements() as statements: ... -> các câu SQL đã chạy trong khối with;
+    listener before_cursor_execute được gỡ khi ra khỏi khối.
+    """
+    @contextmanager
+    def _count():
+        statements = []
+        listener = lambda conn, cursor, stmt, *a: statements.append(stmt)
+        sa_event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            yield statements
+        finally:
+            sa_event.remove(db.engine, "before_cursor_execute", listener)
+    return _count
+
+
+@pytest.fixture()
+def paid_order(client, seed_minimal, login_as):
+    """
+    paid_order(qty=2, issue=True): buyer của seed_minimal đặt `qty` vé loại đầu tiên qua /orders/create,
+    issue=True thì phát hành vé luôn (như sau thanh toán). Trả về Order vừa tạo, None nếu đơn bị từ chối.
+    """
+    from app.services.issuance_service import TicketIssuanceService
+
+    def _create(qty=2, issue=True):
+        login_as(seed_minimal["buyer"])
+        tt = TicketType.query.filter_by(event_id=seed_minimal["event"].id).first()
+        last_id = db.session.query(db.func.max(Order.id)).scalar() or 0
+        client.post("/orders/create", data={"event_id": seed_minimal["event"].id, f"items[{tt.id}]": qty})
+        order = Order.query.filter(Order.id > last_id).one_or_none()
+        if order is not None and issue:
+            TicketIssuanceService().issue_once(order.id)
+        return order
+    return _create
+
+
+@pytest.fixture()
+def login_as(client):
+    """Đăng nhập trực tiếp qua session của Flask-Login (bỏ qua form /login)"""
+    def _login(user):
+        with client.session_transaction() as sess:
+            sess["_user_id"] = str(user.id)
+            sess["_fresh"] = True
+        # app context của fixture dùng chung g giữa các request -> bỏ user đã cache
+        g.pop("_login_user", None)
+        return user
+    return _login
@@ -3,3 +3,190 @@ def test_event_detail(client, seed_minimal):
     r = client.get(f"/events/{ev.id}")
     assert r.status_code == 200
     assert ev.name.encode() in r.data
+
+
+def test_high_demand_event_redirects_to_queue(client, seed_minimal):
+    from app import db
+    from app.services.waiting_room import get_waiting_room
+    ev = seed_minimal["event"]
+    ev.high_demand = True
+    db.session.commit()
+    get_waiting_room().invalidate_flags()
+
+    r = client.get(f"/events/{ev.id}")
+    assert r.status_code == 302
+    assert r.headers["Location"].endswith(f"/events/{ev.id}/queue")
+
+    # hàng chờ còn chỗ -> được vào ngay
+    r = client.get(f"/events/{ev.id}/queue")
+    assert r.status_code == 302
+    assert client.get(f"/events/{ev.id}").status_code == 200
+
+
+def test_search_folds_diacritics_and_ranks(client, seed_minimal):
+    from app import db
+    from app.dao.event_dao import search_events
+    from app.models import Event, EventStatus
+    seed = seed_minimal["event"]
+    other = Event(organizer_id=seed.organizer_id, name="Đêm nhạc Hà Nội", description="Hà Nội mùa thu ở Hà Nội",
+                  status=EventStatus.PUBLISHED, event_type_id=seed.event_type_id, category_id=seed.category_id,
+                  address="Nhà hát lớn Hà Nội")
+    weak = Event(organizer_id=seed.organizer_id, name="Workshop", description="Gặp gỡ tại hà nội",
+                 status=EventStatus.PUBLISHED, event_type_id=seed.event_type_id, category_id=seed.category_id,
+                 address="Online")
+    db.session.add_all([other, weak])
+    db.session.commit()
+
+    assert [e.name for e in search_events("vu").items] == ["Private Show Vũ."]
+    assert [e.name for e in search_events("ha noi", order_by="relevance").items] == ["Đêm nhạc Hà Nội", "Workshop"]
+    # gõ dở từ cuối vẫn khớp tiền tố
+    assert {e.name for e in search_events("theat").items} == {"Private Show Vũ."}
+
+    # sửa sự kiện -> chỉ mục cập nhật theo
+    weak.description = "Gặp gỡ tại Đà Nẵng"
+    db.session.commit()
+    assert [e.name for e in search_events("ha noi").items] == ["Đêm nhạc Hà Nội"]
+    assert [e.name for e in search_events("da nang").items] == ["Workshop"]
+
+    r = client.get("/events/search?q=Ha+Noi")
+    assert "Đêm nhạc Hà Nội".encode() in r.data
+
+
+def test_keyset_pages_walk_forward_and_back(client, seed_minimal):
+    from datetime import datetime
+    from app import db
+    from app.dao.event_dao import get_all_events, search_events
+    from app.models import Event, EventStatus
+    seed = seed_minimal["event"]
+    same = datetime(2030, 1, 1, 12, 0)
+    for i in range(7):
+        # 3 sự kiện trùng created_at: id phải phân định thứ tự
+        db.session.add(Event(organizer_id=seed.organizer_id, name=f"Keyset {i}", description="-", address="-", status=EventStatus.PUBLISHED,
+                             event_type_id=seed.event_type_id, category_id=seed.category_id,
+                             created_at=same if i < 3 else datetime(2030, 1, 2 + i)))
+    db.session.commit()
+    expected = [e.id for e in Event.query.order_by(Event.created_at.desc(), Event.id.desc())]
+
+    seen, pages, page = [], [], get_all_events(per_page=3)
+    while True:
+        pages.append(page)
+        seen += [e.id for e in page.items]
+        if not page.has_next:
+            break
+        page = get_all_events(page.next_cursor, per_page=3)
+    assert seen == expected
+    assert not pages[0].has_prev and pages[1].has_prev
+
+    back = get_all_events(pages[-1].prev_cursor, per_page=3)
+    assert [e.id for e in back.items] == [e.id for e in pages[-2].items]
+    assert back.has_next and back.has_prev
+
+    # cursor hỏng -> về trang đầu; tổng số chỉ đếm khi đọc tới
+    assert [e.id for e in get_all_events("không-hợp-lệ", per_page=3).items] == expected[:3]
+    by_name = search_events(None, per_page=4, order_by="name")
+    assert [e.name for e in by_name.items] == ["Keyset 0", "Keyset 1", "Keyset 2", "Keyset 3"]
+    assert by_name.total == 8
+
+    r = client.get(f"/?cursor={pages[1].next_cursor}")
+    assert r.status_code == 200 and b"Keyset 0" in r.data
+
+
+def test_listing_counts_are_cached_and_invalidated_on_commit(app, client, seed_minimal, monkeypatch):
+    from app import db
+    from app.dao import event_dao
+    from app.models import Event, EventStatus
+    from app.services.listing_cache import count_events_cached, count_all_events_cached, listing_key
+    counts = app.extensions["listing_counts"]
+    seed = seed_minimal["event"]
+
+    calls = []
+    real = event_dao.count_events
+    monkeypatch.setattr(event_dao, "count_events", lambda **kw: (calls.append(kw), real(**kw))[1])
+
+    assert listing_key("search", q=" Hà  Nội", location="", is_free=False) == \
+        listing_key("search", is_free=False, q="ha noi", location=None)
+    assert count_events_cached(q="show").total == 1
+    assert count_events_cached(q="Show ").total == 1
+    assert len(calls) == 1
+
+    # thêm sự kiện -> after_commit xóa cache, lần sau đếm lại
+    db.session.add(Event(organizer_id=seed.organizer_id, name="Show mới", description="-", address="-",
+                         status=EventStatus.PUBLISHED, event_type_id=seed.event_type_id,
+                         category_id=seed.category_id))
+    db.session.commit()
+    assert count_events_cached(q="show").total == 2
+    assert len(calls) == 2
+
+    # chế độ ước lượng: có lọc thì dừng ở ngưỡng, không lọc thì dùng thống kê bảng
+    counts.invalidate()
+    monkeypatch.setattr(counts, "approx_threshold", 1)
+    assert count_events_cached(q="show") == (1, "at_least")
+    monkeypatch.setattr(event_dao, "estimate_event_rows", lambda: 123456)
+    assert count_all_events_cached() == (123456, "estimate")
+
+    r = client.get("/events/search?q=show")
+    body = " ".join(r.get_data(as_text=True).split())
+    assert "Hơn 1 sự kiện phù hợp" in body
+
+
+def test_search_results_cache_stores_ids_and_hydrates(app, client, seed_minimal, monkeypatch):
+    from app import db
+    from app.dao import event_dao
+    from app.models import Event
+    from app.services.listing_cache import search_events_cached
+    cache = app.extensions["search_results"]
+    seed_id = seed_minimal["event"].id
+
+    calls = []
+    real = event_dao.search_events
+    monkeypatch.setattr(event_dao, "search_events", lambda **kw: (calls.append(kw), real(**kw))[1])
+
+    first = search_events_cached(q="Vũ", order_by="relevance")
+    # cùng truy vấn viết khác (dấu, khoảng trắng, tham số rỗng) -> trúng cache, chỉ 1 query IN
+    again = search_events_cached(q="  vu ", location="", order_by="relevance")
+    assert len(calls) == 1
+    assert [e.id for e in again.items] == [e.id for e in first.items] == [seed_id]
+    assert cache.stats()["hits"] == 1
+
+    # sửa sự kiện -> after_commit xóa cache kết quả
+    db.session.get(Event, seed_id).name = "Đêm nhạc"
+    db.session.commit()
+    assert search_events_cached(q="vu", order_by="relevance").items == []
+    assert len(calls) == 2
+
+    # giới hạn LRU
+    monkeypatch.setattr(cache, "max_items", 1)
+    search_events_cached(q="dem nhac")
+    search_events_cached(q="show")
+    assert cache.stats()["items"] == 1
+
+    r = client.get("/events/search?q=dem+nhac")
+    assert "Đêm nhạc".encode() in r.data
+
+
+def test_price_filter_pages_events_with_several_matching_ticket_types(seed_minimal):
+    from decimal import Decimal
+    from app import db
+    from app.dao.event_dao import search_events, count_events
+    from app.models import Event, EventStatus, TicketType
+    seed = seed_minimal["event"]
+    for i in range(7):
+        ev = Event(organizer_id=seed.organizer_id, name=f"Paid {i}", description="-", address="-",
+                   status=EventStatus.PUBLISHED, event_type_id=seed.event_type_id, category_id=seed.category_id)
+        # 2 loại vé có phí: join sẽ lặp sự kiện
+        ev.ticket_types = [TicketType(name=n, description="-", quantity=10, price=Decimal("100000"))
+                           for n in ("Thường", "VIP")]
+        db.session.add(ev)
+    db.session.commit()
+
+    for order_by in ("newest", "oldest"):
+        seen, cursor = [], None
+        while True:
+            page = search_events(None, cursor=cursor, per_page=3, is_free=False, order_by=order_by)
+            seen += [e.id for e in page.items]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        paid = {e.id for e in Event.query.filter(Event.name.like("Paid %"))} | {seed.id}
+        assert sorted(seen) == sorted(paid)
+    assert count_events(is_free=False) == 8
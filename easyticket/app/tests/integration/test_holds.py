@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import TicketType, TicketHold, Order, Ticket
+from app.blueprints.order import _issue_tickets
+from app.dao.hold_dao import release_expired_holds
+from app.utils.qr_utils import verify_token
+
+
+def _ticket_type(seed):
+    return TicketType.query.filter_by(event_id=seed["event"].id).first()
+
+
+def test_create_order_reserves_stock(client, seed_minimal, paid_order):
+    tt = _ticket_type(seed_minimal)
+
+    order = paid_order(3, issue=False)
+    assert order is not None
+
+    db.session.refresh(tt)
+    assert tt.reserved == 3
+    hold = TicketHold.query.one()
+    assert hold.quantity == 3
+    assert hold.expires_at > datetime.now()
+
+    page = client.get(f"/orders/{order.id}/checkout")
+    assert "được giữ đến".encode() in page.data
+
+
+def test_create_order_rejects_when_all_held(seed_minimal, paid_order):
+    tt = _ticket_type(seed_minimal)
+    tt.reserved = tt.quantity - 1
+    db.session.commit()
+
+    assert paid_order(2, issue=False) is None
+    assert Order.query.count() == 0
+    assert TicketHold.query.count() == 0
+
+
+def test_issue_tickets_converts_hold(seed_minimal, paid_order):
+    tt = _ticket_type(seed_minimal)
+    order = paid_order(2, issue=False)
+
+    _issue_tickets(order.id)
+
+    db.session.refresh(tt)
+    assert tt.reserved == 0
+    assert tt.sold == 2
+    assert TicketHold.query.count() == 0
+    tickets = Ticket.query.filter_by(order_id=order.id).all()
+    assert len(tickets) == 2
+    for tk in tickets:
+        ok, payload, _ = verify_token(tk.qr_data)
+        assert ok and payload["code"] == tk.ticket_code
+
+
+def test_reaper_releases_expired_holds(seed_minimal, paid_order):
+    tt = _ticket_type(seed_minimal)
+    paid_order(4, issue=False)
+
+    assert release_expired_holds() == 0
+    assert release_expired_holds(now=datetime.now() + timedelta(hours=1)) == 1
+
+    db.session.refresh(tt)
+    assert tt.reserved == 0
+    assert TicketHold.query.count() == 0
@@ -0,0 +1,105 @@
+from app import db
+from app.models import TicketType, Ticket, TicketStatus, TicketHold, TicketTypeShard
+from app.dao.ticket_dao import cancel_tickets
+from app.dao.ticket_type_dao import add_sold, set_shard_layout, rebuild_inventory_counters
+from app.dao.hold_dao import release_order_holds
+
+
+def test_event_detail_reads_counters(client, seed_minimal):
+    ev = seed_minimal["event"]
+    tt = TicketType.query.filter_by(event_id=ev.id).first()
+    tt.sold = tt.quantity
+    db.session.commit()
+
+    r = client.get(f"/events/{ev.id}")
+    assert r.status_code == 200
+    assert "Hết vé".encode() in r.data
+
+
+def test_add_sold_respects_capacity(app, seed_minimal, count_statements):
+    tt = TicketType.query.filter_by(event_id=seed_minimal["event"].id).first()
+    with count_statements() as statements:
+        assert add_sold(tt.id, 60) is True
+    # loại vé không chia shard: đúng 1 UPDATE có điều kiện, không SELECT shard_count
+    assert len(statements) == 1 and statements[0].startswith("UPDATE")
+    assert add_sold(tt.id, 60) is False
+    db.session.commit()
+    db.session.refresh(tt)
+    assert tt.sold == 60
+    assert tt.remaining == 40
+
+
+def test_rebuild_inventory_command(app, seed_minimal):
+    tt = TicketType.query.filter_by(event_id=seed_minimal["event"].id).first()
+    tt.sold = 42
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["inventory", "rebuild"])
+    assert result.exit_code == 0
+    db.session.refresh(tt)
+    assert tt.sold == 1  # seed_minimal có 1 vé ACTIVE
+
+
+def test_cancel_tickets_releases_counter(app, seed_minimal):
+    tk = seed_minimal["ticket"]
+    tt = db.session.get(TicketType, tk.ticket_type_id)
+    tt.sold = 1
+    db.session.commit()
+
+    assert cancel_tickets([tk.id], status=TicketStatus.REFUNDED) == 1
+    db.session.refresh(tt)
+    assert tt.sold == 0
+    assert db.session.get(Ticket, tk.id).status == TicketStatus.REFUNDED
+
+
+def test_sharded_counters_split_and_sum(app, seed_minimal):
+    tt = TicketType.query.filter_by(event_id=seed_minimal["event"].id).first()
+    tt.sold = 10
+    assert set_shard_layout(tt, 4) is True
+    db.session.commit()
+
+    assert [s.quantity for s in tt.shards] == [25, 25, 25, 25]
+    assert tt.sold == 0 and tt.sold_count == 10
+
+    # moi shard chi co 25 ve -> 40 ve phai gom tu nhieu shard
+    assert add_sold(tt.id, 40) is True
+    assert add_sold(tt.id, 40) is True
+    assert add_sold(tt.id, 20) is False
+    assert add_sold(tt.id, 10) is True
+    db.session.commit()
+    db.session.expire_all()
+    assert tt.sold_count == 100
+    assert tt.remaining == 0
+    assert all(s.sold <= s.quantity for s in tt.shards)
+
+
+def test_sharded_holds_remember_shard(client, seed_minimal, login_as):
+    tt = TicketType.query.filter_by(event_id=seed_minimal["event"].id).first()
+    set_shard_layout(tt, 8)
+    db.session.commit()
+
+    login_as(seed_minimal["buyer"])
+    client.post("/orders/create", data={"event_id": seed_minimal["event"].id, f"items[{tt.id}]": 5})
+    hold = TicketHold.query.one()
+    assert hold.shard_no is not None
+    shard = TicketTypeShard.query.filter_by(ticket_type_id=tt.id, shard_no=hold.shard_no).one()
+    assert shard.reserved == 5
+
+    # con hold -> khong cho doi layout
+    assert set_shard_layout(tt, 1) is False
+    db.session.rollback()
+
+    release_order_holds(hold.order_id)
+    db.session.commit()
+    db.session.expire_all()
+    assert tt.reserved_count == 0
+
+    # rebuild dua ve ACTIVE cua seed_minimal vao shard, bo dem tren TicketType giu = 0
+    rebuild_inventory_counters(tt.event_id)
+    db.session.expire_all()
+    assert tt.sold == 0 and tt.sold_count == 1
+
+    assert set_shard_layout(tt, 1) is True
+    db.session.commit()
+    assert TicketTypeShard.query.count() == 0
+    assert tt.sold == 1 and tt.shard_count == 1
@@ -0,0 +1,86 @@
+import pytest
+from app import db
+from app.models import TicketType, Ticket, IssuanceLedger, IssuanceStatus
+from app.services.issuance_service import TicketIssuanceService
+
+
+def test_issue_once_is_idempotent(paid_order):
+    order = paid_order(2, issue=False)
+    tt = TicketType.query.one()
+    svc = TicketIssuanceService()
+
+    first = svc.issue_once(order.id)
+    second = svc.issue_once(order.id)
+
+    assert first.id == second.id
+    assert second.ticket_count == 2
+    assert IssuanceLedger.query.count() == 1
+    assert Ticket.query.filter_by(order_id=order.id).count() == 2
+    db.session.refresh(tt)
+    assert tt.sold == 2
+
+
+def test_issue_once_sold_out_marks_ledger_failed(paid_order):
+    order = paid_order(2, issue=False)
+    tt = TicketType.query.one()
+    # hold bị thu hồi và vé đã bán hết trong lúc khách thanh toán
+    db.session.delete(order.holds[0])
+    tt.reserved = 0
+    tt.sold = tt.quantity
+    db.session.commit()
+
+    with pytest.raises(ValueError):
+        TicketIssuanceService().issue_once(order.id)
+    entry = IssuanceLedger.query.one()
+    assert entry.status == IssuanceStatus.FAILED
+    assert entry.error
+    assert Ticket.query.filter_by(order_id=order.id).count() == 0
+
+
+def test_issuance_status_endpoint(client, seed_minimal, login_as, paid_order):
+    order = paid_order(1, issue=False)
+    assert client.get(f"/orders/{order.id}/issuance-status").status_code == 404
+
+    TicketIssuanceService().issue_once(order.id)
+    j = client.get(f"/orders/{order.id}/issuance-status").get_json()
+    assert j["ok"] and j["status"] == "ISSUED"
+    assert j["ticket_count"] == 1
+
+    login_as(seed_minimal["organizer"])
+    assert client.get(f"/orders/{order.id}/issuance-status").status_code == 403
+
+
+def test_issue_with_compact_tokens(app, monkeypatch, paid_order):
+    from app.utils.qr_utils import verify_token
+    monkeypatch.setitem(app.config, "QR_TOKEN_FORMAT", "v2")
+    order = paid_order(3, issue=False)
+
+    TicketIssuanceService().issue_once(order.id)
+
+    tickets = Ticket.query.filter_by(order_id=order.id).all()
+    assert len(tickets) == 3
+    for tk in tickets:
+        ok, payload, _ = verify_token(tk.qr_data)
+        assert ok and payload["tid"] == tk.id and payload["eid"] == tk.event_id
+
+
+def test_worker_marks_ledger_failed_on_unexpected_error(app, client, login_as, monkeypatch, paid_order):
+    from app.services.issuance_worker import IssuanceWorker
+    from app.models import User
+    order = paid_order(1, issue=False)
+    order_id, buyer_id = order.id, order.customer_id
+    TicketIssuanceService().ensure_ledger(order_id)
+
+    def boom(self, order_id, raise_errors=False):
+        raise RuntimeError("db went away")
+    monkeypatch.setattr(TicketIssuanceService, "process", boom)
+
+    # chạy thân worker ngay trong thread test (cùng DB in-memory)
+    IssuanceWorker(app, max_workers=0)._run(order_id)
+
+    entry = IssuanceLedger.query.filter_by(order_id=order_id).one()
+    assert entry.status == IssuanceStatus.FAILED and entry.error
+    # worker đã remove session dùng chung của thread test -> đăng nhập lại bằng bản ghi mới
+    login_as(db.session.get(User, buyer_id))
+    j = client.get(f"/orders/{order_id}/issuance-status").get_json()
+    assert j["status"] == "FAILED"
@@ -0,0 +1,45 @@
+import io
+import zipfile
+
+from PIL import Image
+
+from app.models import Ticket
+
+
+def test_export_order_tickets_pdf(client, paid_order):
+    order_id = paid_order(3).id
+
+    r = client.get(f"/orders/{order_id}/tickets.pdf")
+    assert r.status_code == 200 and r.mimetype == "application/pdf"
+    assert r.is_streamed
+    pdf = r.get_data()
+    assert pdf.startswith(b"%PDF-1.4") and pdf.rstrip().endswith(b"%%EOF")
+    assert pdf.count(b"/Type /Page ") == 3 and b"/Count 3" in pdf
+    # startxref trỏ đúng vị trí bảng xref
+    xref = int(pdf.rsplit(b"startxref\n", 1)[1].split(b"\n")[0])
+    assert pdf[xref:xref + 4] == b"xref"
+
+
+def test_export_order_tickets_zip_and_owner_only(client, seed_minimal, login_as, paid_order):
+    order_id = paid_order(3).id
+
+    r = client.get(f"/orders/{order_id}/tickets.zip")
+    assert r.status_code == 200 and r.mimetype == "application/zip"
+    zf = zipfile.ZipFile(io.BytesIO(r.get_data()))
+    codes = {t.ticket_code for t in Ticket.query.filter_by(order_id=order_id)}
+    assert {n[:-4] for n in zf.namelist()} == codes
+    for name in zf.namelist():
+        assert Image.open(io.BytesIO(zf.read(name))).format == "PNG"
+
+    login_as(seed_minimal["organizer"])
+    assert client.get(f"/orders/{order_id}/tickets.zip").status_code == 403
+    assert client.get(f"/orders/{order_id}/tickets.doc").status_code == 404
+
+
+def test_default_font_has_vietnamese_glyphs():
+    from app.services.ticket_render import _font
+    font = _font(30)
+    # ký tự không có trong font ra cùng 1 glyph "ô vuông"; chữ có dấu phải có glyph riêng
+    missing = bytes(font.getmask("\ue000"))
+    for ch in "ộờđ":
+        assert bytes(font.getmask(ch)) != missing
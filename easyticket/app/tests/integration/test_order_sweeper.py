@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import TicketType, TicketHold, Order, OrderDetail, Payment, PaymentStatus
+from app.dao.order_dao import sweep_abandoned_orders
+from app.dao.payment_dao import create_payment
+
+
+def test_sweep_deletes_abandoned_orders_in_batches(paid_order):
+    orders = [paid_order(2, issue=False) for _ in range(5)]
+    tt = TicketType.query.one()
+    create_payment(orders[0].id, 600000)  # PENDING, khách bỏ ngang ở cổng thanh toán
+    later = datetime.now() + timedelta(hours=2)
+
+    assert sweep_abandoned_orders(3600) == 0  # chưa quá hạn
+    assert sweep_abandoned_orders(3600, batch_size=2, now=later) == 5
+
+    assert Order.query.count() == 0
+    assert OrderDetail.query.count() == 0
+    assert Payment.query.count() == 0
+    assert TicketHold.query.count() == 0
+    db.session.refresh(tt)
+    assert tt.reserved == 0
+
+
+def test_sweep_keeps_paid_and_issued_orders(client, paid_order):
+    paid = paid_order(1, issue=False)
+    issued = paid_order(1)
+    paid_order(1, issue=False)  # bỏ ngang
+    pay = create_payment(paid.id, 300000)
+    pay.status = PaymentStatus.SUCCESS
+    db.session.commit()
+
+    result = client.application.test_cli_runner().invoke(args=["orders", "sweep", "--older-than", "0"])
+    assert result.exit_code == 0
+    assert "Đã xoá 1 đơn" in result.output
+    assert {o.id for o in Order.query.all()} == {paid.id, issued.id}
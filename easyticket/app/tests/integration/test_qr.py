@@ -26,4 +26,262 @@ def test_qr_validate(client, seed_minimal):
     r2 = client.post("/api/qr/validate", json={"qr": token, "event_id": ev.id})
     j2 = r2.get_json()
     assert j2["ok"] is False
-    assert j2["error"] == "already_checked_in"
\ No newline at end of file
+    assert j2["error"] == "already_checked_in"
+
+def test_qr_validate_wrong_event_does_not_check_in(client, seed_minimal):
+    from app import db
+    from app.models import Ticket, TicketStatus
+    tk = seed_minimal["ticket"]
+    token = client.post(f"/api/qr/issue/{tk.id}").get_json()["qr"]
+
+    r = client.post("/api/qr/validate", json={"qr": token, "event_id": seed_minimal["event"].id + 1})
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "wrong_event"
+    db.session.expire_all()
+    assert db.session.get(Ticket, tk.id).status == TicketStatus.ACTIVE
+
+
+def test_qr_validate_uses_two_statements(client, seed_minimal, count_statements):
+    tk = seed_minimal["ticket"]
+    token = client.post(f"/api/qr/issue/{tk.id}").get_json()["qr"]
+    event_id = seed_minimal["event"].id
+
+    with count_statements() as statements:
+        j = client.post("/api/qr/validate", json={"qr": token, "event_id": event_id}).get_json()
+
+    assert j["ok"] is True and j["ticket"]["ticket_type"]
+    assert len(statements) == 2
+    assert statements[0].lstrip().upper().startswith("UPDATE")
+
+
+def _manifest_proof(m):
+    import hashlib
+    return {"generated_at": m["generated_at"], "kid": m["kid"], "signature": m["signature"],
+            "sha256": hashlib.sha256(m["entries"].encode()).hexdigest()}
+
+
+def test_offline_manifest_and_sync(client, seed_minimal, login_as):
+    from app.utils.qr_utils import token_digest
+    ev = seed_minimal["event"]
+    tk = seed_minimal["ticket"]
+    token = client.post(f"/api/qr/issue/{tk.id}").get_json()["qr"]
+
+    login_as(seed_minimal["buyer"])
+    assert client.get(f"/api/qr/manifest/{ev.id}").status_code == 403
+
+    login_as(seed_minimal["organizer"])
+    m = client.get(f"/api/qr/manifest/{ev.id}").get_json()["manifest"]
+    assert m["count"] == 1
+    assert m["entries"] == token_digest(token, m["digest_bytes"]) + "A"
+
+    # 2 máy quét offline cùng quét 1 vé: lượt sớm hơn thắng, lượt sau báo đã check-in
+    proof = _manifest_proof(m)
+    r = client.post("/api/qr/sync", json={"event_id": ev.id, "manifest": proof, "scans": [
+        {"qr": token, "scanned_at": "2030-01-01T10:00:05Z"},
+        {"qr": token, "scanned_at": "2025-01-01T10:00:00Z"},
+        {"qr": "bogus.token.value", "scanned_at": "2025-01-01T10:00:00Z"},
+    ]}).get_json()
+    assert r["checked_in"] == 1
+    later, earlier, bogus = r["results"]
+    assert earlier["ok"] and earlier["checked_at"].startswith("2025-01-01T10:00:00")
+    assert later["error"] == "already_checked_in"
+    assert bogus["error"] == "ticket_not_found"
+
+    # đồng bộ lại (retry) không check-in lần 2
+    again = client.post("/api/qr/sync", json={"event_id": ev.id, "manifest": proof,
+                                                 "scans": [{"qr": token}]}).get_json()
+    assert again["results"][0]["error"] == "already_checked_in"
+    m = client.get(f"/api/qr/manifest/{ev.id}").get_json()["manifest"]
+    assert m["entries"].endswith("U")
+
+    bad = client.post("/api/qr/sync", json={"event_id": "abc", "scans": []})
+    assert bad.status_code == 400 and bad.get_json()["error"] == "missing_scans_or_event"
+
+
+def test_sync_rejects_tampered_manifest(client, seed_minimal, login_as):
+    from app import db
+    from app.models import Ticket, TicketStatus
+    ev = seed_minimal["event"]
+    tk = seed_minimal["ticket"]
+    token = client.post(f"/api/qr/issue/{tk.id}").get_json()["qr"]
+    login_as(seed_minimal["organizer"])
+    m = client.get(f"/api/qr/manifest/{ev.id}").get_json()["manifest"]
+
+    # máy quét sửa trạng thái 1 bản ghi (A -> C)
+    m["entries"] = m["entries"][:-1] + "C"
+    for proof in (_manifest_proof(m), None):
+        r = client.post("/api/qr/sync", json={"event_id": ev.id, "manifest": proof, "scans": [{"qr": token}]})
+        assert r.status_code == 400 and r.get_json()["error"] == "invalid_manifest"
+    db.session.expire_all()
+    assert db.session.get(Ticket, tk.id).status == TicketStatus.ACTIVE
+
+
+def test_qr_validate_batch(client, seed_minimal, login_as, count_statements):
+    from app import db
+    from app.models import Event
+    ev = seed_minimal["event"]
+    ev_id = ev.id
+    tk = seed_minimal["ticket"]
+    token = client.post(f"/api/qr/issue/{tk.id}").get_json()["qr"]
+    forged = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+    other = Event(organizer_id=ev.organizer_id, name="Show 2", description="", status=ev.status, event_type_id=ev.event_type_id,
+                  category_id=ev.category_id, start_datetime=ev.start_datetime, end_datetime=ev.end_datetime,
+                  address=ev.address)
+    db.session.add(other)
+    db.session.commit()
+    other_id = other.id
+
+    payload = {"event_id": ev_id, "qr": [token]}
+    assert client.post("/api/qr/validate-batch", json=payload).status_code == 401
+    login_as(seed_minimal["buyer"])
+    assert client.post("/api/qr/validate-batch", json=payload).status_code == 403
+    login_as(seed_minimal["organizer"])
+
+    with count_statements() as statements:
+        j = client.post("/api/qr/validate-batch", json={"event_id": ev_id, "qr": [token, forged, token]}).get_json()
+
+    first, bad, dup = j["results"]
+    assert j["checked_in"] == 1
+    assert first["ok"] and first["message"] == "checked_in" and first["ticket"]["id"] == tk.id
+    assert bad["error"] == "invalid_qr"
+    assert dup["error"] == "already_checked_in"
+    assert len(statements) == 2  # 1 SELECT ... IN + 1 UPDATE
+
+    j = client.post("/api/qr/validate-batch", json={"event_id": other_id, "qr": [token]}).get_json()
+    assert j["results"][0]["error"] == "wrong_event"
+
+
+def test_doors_open_answers_scans_from_memory(client, seed_minimal, login_as, count_statements):
+    from app import db
+    from app.models import Ticket, TicketStatus
+    ev_id = seed_minimal["event"].id
+    tk_id = seed_minimal["ticket"].id
+    token = client.post(f"/api/qr/issue/{tk_id}").get_json()["qr"]
+
+    login_as(seed_minimal["organizer"])
+    opened = client.post(f"/organizer/events/{ev_id}/doors/open").get_json()
+    assert opened["open"] and opened["stats"]["tickets"] == 1
+
+    with count_statements() as statements:
+        j1 = client.post("/api/qr/validate", json={"qr": token, "event_id": ev_id}).get_json()
+        j2 = client.post("/api/qr/validate", json={"qr": token, "event_id": ev_id}).get_json()
+
+    assert j1["ok"] and j1["ticket"]["id"] == tk_id
+    assert j2["error"] == "already_checked_in" and j2["checked_at"] == j1["checkin_at"]
+    assert len(statements) == 1 and statements[0].lstrip().upper().startswith("UPDATE")
+    db.session.expire_all()
+    assert db.session.get(Ticket, tk_id).status == TicketStatus.USED
+
+    status = client.get(f"/organizer/events/{ev_id}/doors").get_json()
+    assert status["stats"]["checked_in"] == 1 and status["stats"]["scans_from_memory"] == 2
+    client.post(f"/organizer/events/{ev_id}/doors/close")
+    assert client.get(f"/organizer/events/{ev_id}/doors").get_json()["open"] is False
+
+
+def test_compact_token_roundtrip_and_validate(app, client, seed_minimal, monkeypatch):
+    from app.utils.qr_utils import verify_token, sign_compact
+    monkeypatch.setitem(app.config, "QR_TOKEN_FORMAT", "v2")
+    tk = seed_minimal["ticket"]
+    ev = seed_minimal["event"]
+
+    token = client.post(f"/api/qr/issue/{tk.id}").get_json()["qr"]
+    assert "." not in token and len(token) == 37
+    ok, payload, _ = verify_token(token)
+    assert ok and payload["ver"] == 2 and payload["tid"] == tk.id and payload["eid"] == ev.id
+
+    # sửa 1 ký tự trong phần dữ liệu -> chữ ký không khớp
+    forged = sign_compact(tk.id + 1, ev.id)
+    assert verify_token(forged[:8] + token[8:])[0] is False
+    assert verify_token(token[:-2])[0] is False
+
+    j = client.post("/api/qr/validate", json={"qr": token, "event_id": ev.id}).get_json()
+    assert j["ok"] is True and j["ticket"]["id"] == tk.id
+
+
+def test_key_rotation_and_resign(app, client, seed_minimal, monkeypatch):
+    from app import db
+    from app.models import Ticket
+    from app.utils.qr_utils import build_keyring, verify_token, sign_compact
+    tk = seed_minimal["ticket"]
+    old = client.post(f"/api/qr/issue/{tk.id}").get_json()["qr"]
+    old_v2 = sign_compact(tk.id, seed_minimal["event"].id)
+
+    monkeypatch.setitem(app.extensions, "qr_keyring", build_keyring({
+        "QR_SECRET": app.config["QR_SECRET"], "QR_KEYS": "k2:new-secret", "QR_ACTIVE_KID": "k2",
+    }))
+    # token ký bằng khóa cũ vẫn hợp lệ
+    assert verify_token(old)[0] and verify_token(old_v2)[0]
+    new_v2 = sign_compact(tk.id, seed_minimal["event"].id)
+    assert new_v2[0] != old_v2[0] and verify_token(new_v2)[0]
+
+    result = app.test_cli_runner().invoke(args=["qr", "resign", "--batch-size", "1"])
+    assert "Đã ký lại 1 vé" in result.output
+    db.session.expire_all()
+    token = db.session.get(Ticket, tk.id).qr_data
+    assert token != old and token.startswith(app.extensions["qr_keyring"].active_prefixes()[0])
+    ok, payload, _ = verify_token(token)
+    assert ok and payload["code"] == "TKT-TEST-001"
+
+    # khóa cũ bị gỡ -> token cũ không còn hợp lệ
+    monkeypatch.setitem(app.extensions, "qr_keyring", build_keyring({
+        "QR_SECRET": "rotated-away", "QR_KEYS": {"k2": "new-secret"}, "QR_ACTIVE_KID": "k2",
+    }))
+    assert not verify_token(old)[0] and verify_token(token)[0]
+
+
+def test_checkin_stream_pushes_counters(app, client, seed_minimal, login_as, monkeypatch, count_statements):
+    from app import db
+    monkeypatch.setitem(app.config, "CHECKIN_STATS_HEARTBEAT", 1)
+    ev_id = seed_minimal["event"].id
+    token = client.post(f"/api/qr/issue/{seed_minimal['ticket'].id}").get_json()["qr"]
+    login_as(seed_minimal["organizer"])
+
+    resp = client.get(f"/organizer/events/{ev_id}/checkins/stream")
+    assert resp.mimetype == "text/event-stream"
+    stream = iter(resp.response)
+
+    def next_stats():
+        chunk = next(stream)
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        assert chunk.startswith("event: stats\n")
+        return json.loads(chunk.split("data: ", 1)[1])
+
+    first = next_stats()
+    assert first["issued"] == 1 and first["checked_in"] == 0
+    # stream đang mở không giữ session / transaction DB
+    assert not db.session.registry.has()
+
+    client.post("/api/qr/validate", json={"qr": token, "event_id": ev_id})
+    client.post("/api/qr/validate", json={"qr": token, "event_id": ev_id})
+
+    # bộ đếm cộng dồn từ đường check-in: đọc snapshot không query DB
+    with count_statements() as statements:
+        after_first = next_stats()
+        after_second = next_stats()
+    assert statements == []
+    assert after_first["checked_in"] == 1 and after_first["ticket_types"][0]["checked_in"] == 1
+    assert after_second["checked_in"] == 1
+    assert after_second["scans_per_minute"] == 2 and after_second["checkins_per_minute"] == 1
+
+    # nạp lại bộ đếm từ DB (nhịp heartbeat) cũng trả session về pool ngay
+    monkeypatch.setattr(app.extensions["checkin_stats"], "resync_seconds", 0)
+    assert next_stats()["checked_in"] == 1
+    assert not db.session.registry.has()
+
+    resp.close()
+    assert ev_id not in app.extensions["checkin_stats"]._subscribers
+
+
+def test_keyring_rejects_kids_sharing_a_hint(app):
+    import pytest
+    from app.utils.qr_utils import QRKeyring, build_keyring
+    kids = {}
+    n = 0
+    while True:
+        n += 1
+        other = kids.setdefault(QRKeyring.hint(f"k{n}"), f"k{n}")
+        if other != f"k{n}":
+            break
+    # resign nhận token của khóa đang dùng chỉ qua gợi ý 4 bit -> 2 kid trùng gợi ý phải bị từ chối
+    with pytest.raises(ValueError):
+        build_keyring({"QR_SECRET": "s", "QR_KEYS": {other: "a", f"k{n}": "b"}, "QR_ACTIVE_KID": f"k{n}"})
@@ -0,0 +1,72 @@
+from app import db
+from app.models import Order
+
+
+def _own_ticket(seed, login_as, app=None):
+    # gắn vé của seed_minimal vào 1 đơn của buyer; vé seed chưa có QR -> backfill như dữ liệu cũ
+    order = Order(order_code="ORD-QRIMG", customer_id=seed["buyer"].id)
+    db.session.add(order)
+    db.session.flush()
+    seed["ticket"].order_id = order.id
+    db.session.commit()
+    if app is not None:
+        app.test_cli_runner().invoke(args=["qr", "backfill"])
+    login_as(seed["buyer"])
+    return seed["ticket"].id
+
+
+def test_qr_png_is_cached_and_revalidated(client, seed_minimal, login_as, app):
+    tk_id = _own_ticket(seed_minimal, login_as, app)
+    cache = app.extensions["qr_images"]
+
+    r1 = client.get(f"/orders/ticket/{tk_id}/qr.png")
+    assert r1.status_code == 200 and r1.mimetype == "image/png"
+    assert r1.data.startswith(b"\x89PNG")
+    etag = r1.headers["ETag"]
+    assert not etag.startswith("W/")
+    assert "no-cache" in r1.headers["Cache-Control"]
+
+    r2 = client.get(f"/orders/ticket/{tk_id}/qr.png")
+    assert r2.data == r1.data
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    r3 = client.get(f"/orders/ticket/{tk_id}/qr.png", headers={"If-None-Match": etag})
+    assert r3.status_code == 304 and not r3.data
+    assert cache.stats()["hits"] == 1  # 304 không chạm cache
+
+
+def test_qr_svg_and_versioned_url(client, seed_minimal, login_as, app):
+    tk_id = _own_ticket(seed_minimal, login_as, app)
+    page = client.get(f"/orders/ticket/{tk_id}")
+    assert b"qr.svg?v=" in page.data
+
+    r = client.get(f"/orders/ticket/{tk_id}/qr.png")
+    v = page.data.split(b"qr.png?v=")[1].split(b'"')[0].decode()
+    r_v = client.get(f"/orders/ticket/{tk_id}/qr.png?v={v}")
+    assert "immutable" in r_v.headers["Cache-Control"]
+    assert r_v.headers["ETag"] == r.headers["ETag"]
+
+    svg = client.get(f"/orders/ticket/{tk_id}/qr.svg")
+    assert svg.mimetype == "image/svg+xml" and b"<svg" in svg.data
+    assert svg.headers["ETag"] != r.headers["ETag"]
+
+
+def test_ticket_gets_are_read_only_until_backfill(client, seed_minimal, login_as, app, count_statements):
+    from app.models import Ticket
+    from app.utils.qr_utils import verify_token
+    tk_id = _own_ticket(seed_minimal, login_as)
+
+    with count_statements() as statements:
+        page = client.get(f"/orders/ticket/{tk_id}")
+        img = client.get(f"/orders/ticket/{tk_id}/qr.png")
+    assert page.status_code == 200 and b"qr.png" not in page.data
+    assert img.status_code == 404
+    assert {stmt.split()[0].upper() for stmt in statements} == {"SELECT"}
+
+    result = app.test_cli_runner().invoke(args=["qr", "backfill", "--batch-size", "1"])
+    assert "1 vé" in result.output
+    db.session.expire_all()
+    t = db.session.get(Ticket, tk_id)
+    ok, payload, _ = verify_token(t.qr_data)
+    assert ok and payload["code"] == t.ticket_code and t.issued_at is not None
+    assert client.get(f"/orders/ticket/{tk_id}/qr.png").status_code == 200
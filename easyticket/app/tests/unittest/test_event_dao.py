@@ -53,20 +53,20 @@ def sample_events():
 def test_get_all_events(monkeypatch, sample_events):
     events = [make_event(e) for e in sample_events]
 
-    mock_created_at = SimpleNamespace(desc=lambda: "created_at_desc")
-
-    mock_query = SimpleNamespace(
-        order_by=lambda *args, **kwargs: mock_query,
-        paginate=lambda **kwargs: SimpleNamespace(items=events)
-    )
-
+    mock_query = SimpleNamespace()
+    calls = []
+    monkeypatch.setattr(event_dao, "keyset_page",
+                        lambda qry, order, cursor, per_page: (calls.append((qry, order, cursor)),
+                                                              SimpleNamespace(items=events))[1])
     monkeypatch.setattr(
         event_dao,
         "Event",
-        SimpleNamespace(query=mock_query, created_at=mock_created_at)
+        SimpleNamespace(query=mock_query, created_at="created_at", id="id")
     )
 
-    result = event_dao.get_all_events()
+    result = event_dao.get_all_events(cursor="abc")
+    # keyset theo (created_at, id) giảm dần, cursor chuyển nguyên xuống
+    assert calls == [(mock_query, [("created_at", True), ("id", True)], "abc")]
 
     assert len(result.items) == 2
     assert result.items[0].name == "Music Night"
@@ -114,16 +114,12 @@ def test_get_all_event_types(monkeypatch, sample_event_types):
 # ---- Test search_events ----
 def test_search_events(monkeypatch, sample_events):
     published_events = [make_event(e) for e in sample_events if e["status"] == "PUBLISHED"]
-    mock_paginate = SimpleNamespace(items=published_events, page=1, per_page=12, total=len(published_events))
-
-    mock_created_at = SimpleNamespace(desc=lambda: "created_at_desc", asc=lambda: "created_at_asc")
-    mock_start_datetime = SimpleNamespace(asc=lambda: "start_datetime_asc")
+    mock_page = SimpleNamespace(items=published_events, per_page=12)
 
     mock_query = SimpleNamespace(
         filter=lambda *args, **kwargs: mock_query,
-        order_by=lambda *args, **kwargs: mock_query,
-        paginate=lambda **kwargs: mock_paginate
     )
+    monkeypatch.setattr(event_dao, "keyset_page", lambda qry, order, cursor, per_page: mock_page)
 
     monkeypatch.setattr(
         event_dao,
@@ -134,13 +130,20 @@ def test_search_events(monkeypatch, sample_events):
             name=SimpleNamespace(ilike=lambda x: True),
             description=SimpleNamespace(ilike=lambda x: True),
             address=SimpleNamespace(ilike=lambda x: True),
-            created_at=mock_created_at,
-            start_datetime=mock_start_datetime
+            created_at="created_at",
+            start_datetime="start_datetime",
+            id="id"
         )
     )
 
-    result = event_dao.search_events(q="Music")
+    # lọc full-text phụ thuộc dialect DB: ở đây chỉ kiểm tra từ khóa đã bỏ dấu được chuyển xuống
+    seen_terms = []
+    monkeypatch.setattr(event_dao, "_apply_fulltext",
+                        lambda qry, terms: (seen_terms.append(terms), (qry, None))[1])
+
+    result = event_dao.search_events(q="Music Hà Nội")
     assert result.items[0].name == "Music Night"
+    assert seen_terms == [["music", "ha", "noi"]]
 
     result = event_dao.search_events(q=None)
     assert len(result.items) == 1
@@ -149,23 +152,21 @@ def test_search_events(monkeypatch, sample_events):
 # ---- Test get_events_by_organizer ----
 def test_get_events_by_organizer(monkeypatch, sample_events):
     organizer_events = [make_event(e) for e in sample_events if e["organizer_id"] == 10]
-    mock_paginate = SimpleNamespace(items=organizer_events, page=1, per_page=10, total=len(organizer_events))
-
-    mock_start_datetime = SimpleNamespace(desc=lambda: "start_datetime_desc")
+    mock_page = SimpleNamespace(items=organizer_events, per_page=10)
 
     mock_query = SimpleNamespace(
         filter_by=lambda **kwargs: mock_query,
         filter=lambda x: mock_query,
-        order_by=lambda x: mock_query,
-        paginate=lambda **kwargs: mock_paginate
     )
+    monkeypatch.setattr(event_dao, "keyset_page", lambda qry, order, cursor, per_page: mock_page)
 
     monkeypatch.setattr(
         event_dao,
         "Event",
         SimpleNamespace(
             query=mock_query,
-            start_datetime=mock_start_datetime,
+            start_datetime="start_datetime",
+            id="id",
             status="PUBLISHED"   # FIX lỗi thiếu thuộc tính status
         )
     )
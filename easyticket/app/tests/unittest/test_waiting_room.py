@@ -0,0 +1,51 @@
+from app.services.waiting_room import WaitingRoom
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_room(**kwargs):
+    clock = FakeClock()
+    room = WaitingRoom(clock=clock, flag_loader=lambda: [1], **kwargs)
+    return room, clock
+
+
+def test_only_gated_events_need_queue():
+    room, _ = make_room()
+    assert room.is_gated(1) is True
+    assert room.is_gated(2) is False
+
+
+def test_admits_up_to_capacity_then_queues():
+    room, _ = make_room(capacity=2)
+    assert room.join(1, "a") is None
+    assert room.join(1, "b") is None
+    assert room.join(1, "c") == 1
+    assert room.join(1, "d") == 2
+    assert room.is_admitted(1, "a") and not room.is_admitted(1, "c")
+
+
+def test_release_admits_next_in_line():
+    room, _ = make_room(capacity=1)
+    room.join(1, "a")
+    room.join(1, "b")
+    room.release(1, "a")
+    assert room.status(1, "b") == (True, None)
+
+
+def test_admission_expires_and_idle_visitors_are_skipped():
+    room, clock = make_room(capacity=1, admission_ttl=100, idle_timeout=10)
+    room.join(1, "a")
+    room.join(1, "idle")
+    room.join(1, "c")
+
+    clock.now = 50
+    room.status(1, "c")   # c vẫn poll, "idle" thì không
+    clock.now = 101       # suất của a hết hạn
+    assert room.status(1, "c") == (True, None)
+    assert room.stats(1) == {"waiting": 0, "admitted": 1, "capacity": 1}
@@ -0,0 +1,107 @@
+# app/utils/pagination.py
+"""
+Phân trang keyset (seek): trang sau lọc "WHERE (khóa sắp xếp) < (khóa dòng cuối trang trước)"
+thay cho OFFSET, nên trang sâu nhanh như trang đầu và không cần COUNT(*) mỗi lần tải trang.
+Cursor gửi ra template là chuỗi base64 (mờ), chứa hướng đi + giá trị khóa của dòng biên.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_, DateTime
+
+
+def encode_cursor(direction: str, values) -> str:
+    vals = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps([direction, vals], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str | None, order: list) -> tuple[str, list] | None:
+    """(hướng "n"|"p", giá trị khóa) hoặc None nếu cursor rỗng / hỏng / không khớp thứ tự sắp xếp."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        direction, vals = json.loads(raw)
+        if direction not in ("n", "p") or len(vals) != len(order):
+            return None
+        out = []
+        for (expr, _), v in zip(order, vals):
+            if v is not None and isinstance(getattr(expr, "type", None), DateTime):
+                v = datetime.fromisoformat(v)
+            out.append(v)
+        return direction, out
+    except (ValueError, TypeError):
+        return None
+
+
+def _seek(order: list, values: list, forward: bool):
+    # (a, b) "sau" (va, vb) theo thứ tự: a > va OR (a = va AND b > vb), đảo dấu với cột DESC
+    clauses = []
+    for i, (expr, desc) in enumerate(order):
+        after = expr < values[i] if desc == forward else expr > values[i]
+        clauses.append(and_(*[order[j][0] == values[j] for j in range(i)], after))
+    return or_(*clauses)
+
+
+class KeysetPage:
+    """Trang kết quả: items + cursor trang trước/sau. `total` chỉ đếm khi được đọc tới."""
+
+    def __init__(self, query, items, per_page, next_cursor=None, prev_cursor=None):
+        self._query = query
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self._total = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+    @property
+    def total(self) -> int | None:
+        # trang dựng lại từ cache id không còn query gốc
+        if self._total is None and self._query is not None:
+            self._total = self._query.order_by(None).count()
+        return self._total
+
+
+def keyset_page(query, order: list, cursor: str | None = None, per_page: int = 12) -> KeysetPage:
+    """
+    order = [(biểu thức, giảm dần?), ...], cột cuối phải là khóa duy nhất (thường là id).
+    Lấy per_page + 1 dòng để biết còn trang tiếp hay không.
+    """
+    decoded = decode_cursor(cursor, order)
+    direction, values = decoded or ("n", None)
+    forward = direction == "n"
+
+    qry = query
+    if values is not None:
+        qry = qry.filter(_seek(order, values, forward))
+    qry = qry.order_by(*[
+        (expr.desc() if desc == forward else expr.asc()) for expr, desc in order
+    ])
+
+    keys = [expr for expr, _ in order]
+    rows = qry.add_columns(*keys).limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    items = [r[0] for r in rows]
+    first = list(rows[0][1:]) if rows else None
+    last = list(rows[-1][1:]) if rows else None
+    if forward:
+        next_cursor = encode_cursor("n", last) if more else None
+        prev_cursor = encode_cursor("p", first) if values is not None and rows else None
+    else:
+        next_cursor = encode_cursor("n", last) if rows else None
+        prev_cursor = encode_cursor("p", first) if more else None
+    return KeysetPage(query, items, per_page, next_cursor, prev_cursor)
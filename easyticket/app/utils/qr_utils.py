@@ -1,7 +1,14 @@
 # app/utils/qr_utils.py
-import base64, hmac, hashlib, json
+import base64, hmac, hashlib, json, struct, time
 from flask import current_app
 
+# Token v2 (gọn): version | ticket_id | event_id | issued_at (epoch giây) + HMAC cắt 10 byte,
+# base32 không padding -> 37 ký tự A-Z2-7, QR mã hoá ở chế độ alphanumeric (version 2, mức M)
+QR_TOKEN_V2 = 2
+_V2_FIELDS = struct.Struct(">BIII")
+_V2_MAC_BYTES = 10
+_V2_LEN = -(-(_V2_FIELDS.size + _V2_MAC_BYTES) * 8 // 5)
+
 def _b64url(b: bytes) -> str:
     return base64.urlsafe_b64encode(b).decode().rstrip("=")
 
@@ -9,28 +16,156 @@ def _b64url_decode(s: str) -> bytes:
     pad = '=' * (-len(s) % 4)
     return base64.urlsafe_b64decode(s + pad)
 
+class QRKeyring:
+    """
+    Các khóa ký QR theo kid. Mỗi khóa được nạp sẵn vào 1 đối tượng HMAC lúc khởi động app,
+    mỗi lần ký/verify chỉ .copy() (không băm lại khóa). Kid "" là khóa cũ QR_SECRET:
+    token không có kid (v1) hoặc gợi ý khóa 0 (v2) vẫn verify được sau khi xoay khóa.
+    """
+
+    LEGACY_KID = ""
+
+    def __init__(self, keys: dict[str, str], active_kid: str = LEGACY_KID):
+        if active_kid not in keys:
+            raise ValueError(f"QR_ACTIVE_KID {active_kid!r} không có trong QR_KEYS")
+        self.active_kid = active_kid
+        self._macs = {kid: hmac.new(secret.encode(), digestmod=hashlib.sha256) for kid, secret in keys.items()}
+        self._headers = {kid: self._encode_header(kid) for kid in keys}
+        self._kid_by_header = {h: kid for kid, h in self._headers.items()}
+        # mỗi gợi ý chỉ 1 kid: resign/active_prefixes nhận ra token của khóa đang dùng chỉ qua gợi ý
+        self._kids_by_hint = {}
+        for kid in keys:
+            other = self._kids_by_hint.setdefault(self.hint(kid), kid)
+            if other != kid:
+                raise ValueError(f"QR kid {kid!r} trùng gợi ý khóa với {other!r}, hãy đặt kid khác")
+
+    @staticmethod
+    def _encode_header(kid: str) -> str:
+        header = {"alg": "HS256", "typ": "QR"}
+        if kid:
+            header["kid"] = kid
+        return _b64url(json.dumps(header, separators=(",", ":"), ensure_ascii=False).encode())
+
+    @staticmethod
+    def hint(kid: str) -> int:
+        """Gợi ý khóa 4 bit cho token v2 (0 = khóa cũ)."""
+        return 1 + hashlib.sha256(kid.encode()).digest()[0] % 15 if kid else 0
+
+    def mac(self, kid: str, data: bytes) -> bytes:
+        m = self._macs[kid].copy()
+        m.update(data)
+        return m.digest()
+
+    def kids(self):
+        return self._macs.keys()
+
+    def header(self, kid: str) -> str:
+        return self._headers[kid]
+
+    def kid_of_header(self, h: str) -> str | None:
+        kid = self._kid_by_header.get(h)
+        if kid is None:
+            # header do nơi khác ký (thứ tự trường khác) -> đọc kid từ JSON
+            kid = json.loads(_b64url_decode(h)).get("kid", self.LEGACY_KID)
+        return kid if kid in self._macs else None
+
+    def kid_for_hint(self, hint: int) -> str | None:
+        return self._kids_by_hint.get(hint)
+
+    def active_prefixes(self) -> tuple[str, str]:
+        """Tiền tố qr_data của token ký bằng khóa đang dùng (v1: header, v2: ký tự base32 đầu)."""
+        first = base64.b32encode(bytes([self.hint(self.active_kid) << 4 | QR_TOKEN_V2]))[:1].decode()
+        return self.header(self.active_kid) + ".", first
+
+
+def build_keyring(config) -> QRKeyring:
+    """QR_SECRET (kid "") + QR_KEYS ({kid: secret} hoặc chuỗi "kid:secret,kid2:secret2")."""
+    keys = {QRKeyring.LEGACY_KID: config["QR_SECRET"]}
+    extra = config.get("QR_KEYS") or {}
+    if isinstance(extra, str):
+        extra = dict(item.split(":", 1) for item in extra.split(",") if item.strip())
+    keys.update({kid.strip(): secret for kid, secret in extra.items()})
+    return QRKeyring(keys, config.get("QR_ACTIVE_KID") or QRKeyring.LEGACY_KID)
+
+def get_keyring() -> QRKeyring:
+    return current_app.extensions["qr_keyring"]
+
 def sign_payload(payload: dict) -> str:
     """
     Tạo token QR: base64url(header).base64url(payload).base64url(signature)
+    header có "kid" của khóa đang dùng (trừ khóa cũ QR_SECRET)
     """
-    secret = current_app.config["QR_SECRET"].encode()
-    header = {"alg": "HS256", "typ": "QR"}
-    h = _b64url(json.dumps(header, separators=(",", ":"), ensure_ascii=False).encode())
+    ring = get_keyring()
+    h = ring.header(ring.active_kid)
     p = _b64url(json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode())
-    sig = _b64url(hmac.new(secret, f"{h}.{p}".encode(), hashlib.sha256).digest())
+    sig = _b64url(ring.mac(ring.active_kid, f"{h}.{p}".encode()))
     return f"{h}.{p}.{sig}"
 
+def sign_compact(ticket_id: int, event_id: int, issued_at: int | None = None) -> str:
+    """Token v2: các trường nhị phân cố định + HMAC-SHA256 cắt ngắn, base32.
+    4 bit cao của byte version là gợi ý khóa."""
+    ring = get_keyring()
+    iat = int(time.time()) if issued_at is None else int(issued_at)
+    body = _V2_FIELDS.pack(ring.hint(ring.active_kid) << 4 | QR_TOKEN_V2, ticket_id, event_id, iat)
+    mac = ring.mac(ring.active_kid, body)[:_V2_MAC_BYTES]
+    return base64.b32encode(body + mac).decode().rstrip("=")
+
+def _verify_compact(token: str):
+    if len(token) != _V2_LEN:
+        return False, None, "Malformed QR: bad length"
+    raw = base64.b32decode(token + "=" * (-len(token) % 8))
+    body, mac = raw[:_V2_FIELDS.size], raw[_V2_FIELDS.size:]
+    head, tid, eid, iat = _V2_FIELDS.unpack(body)
+    ver, hint = head & 0x0F, head >> 4
+    if ver != QR_TOKEN_V2:
+        return False, None, f"Unsupported QR version {ver}"
+    ring = get_keyring()
+    kid = ring.kid_for_hint(hint)
+    if kid is None:
+        return False, None, "Unknown key"
+    if not hmac.compare_digest(ring.mac(kid, body)[:_V2_MAC_BYTES], mac):
+        return False, None, "Invalid signature"
+    return True, {"ver": ver, "tid": tid, "eid": eid, "iat": iat}, "OK"
+
+def ticket_token(code: str, order_id: int | None, event_id: int, ticket_id: int | None = None) -> str:
+    """
+    Token QR duy nhất cho 1 vé, dùng chung cho phát hành, /api/qr/issue và backfill.
+    QR_TOKEN_FORMAT="v2" (cần ticket_id) -> token gọn; còn lại ký payload v1 {"code","oid","eid"}.
+    """
+    if current_app.config.get("QR_TOKEN_FORMAT") == "v2" and ticket_id is not None:
+        return sign_compact(ticket_id, event_id)
+    return sign_payload({"code": code, "oid": order_id, "eid": event_id})
+
 def verify_token(token: str):
     """
     Trả (is_valid: bool, payload: dict|None, message: str)
+    Nhận cả token v1 (có dấu '.') lẫn v2 (base32, payload có "ver": 2).
     """
     try:
+        if "." not in token:
+            return _verify_compact(token)
         h, p, sig = token.split(".")
-        secret = current_app.config["QR_SECRET"].encode()
-        expect = _b64url(hmac.new(secret, f"{h}.{p}".encode(), hashlib.sha256).digest())
+        ring = get_keyring()
+        kid = ring.kid_of_header(h)
+        if kid is None:
+            return False, None, "Unknown key"
+        expect = _b64url(ring.mac(kid, f"{h}.{p}".encode()))
         if not hmac.compare_digest(expect, sig):
             return False, None, "Invalid signature"
         payload = json.loads(_b64url_decode(p))
         return True, payload, "OK"
     except Exception as ex:
         return False, None, f"Malformed QR: {ex}"
+
+def resign_token(token: str) -> str | None:
+    """Ký lại token hợp lệ bằng khóa đang dùng, giữ nguyên định dạng và payload."""
+    ok, payload, _ = verify_token(token)
+    if not ok:
+        return None
+    if payload.get("ver") == QR_TOKEN_V2 and "." not in token:
+        return sign_compact(payload["tid"], payload["eid"], payload["iat"])
+    return sign_payload(payload)
+
+def token_digest(token: str, size: int = 8) -> str:
+    """sha256(token) cắt còn `size` byte (hex): khóa tra vé trong manifest check-in offline."""
+    return hashlib.sha256(token.encode()).hexdigest()[:size * 2]
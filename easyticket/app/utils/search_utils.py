@@ -0,0 +1,34 @@
+# app/utils/search_utils.py
+import re
+import unicodedata
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def fold_text(s: str | None) -> str:
+    """Bỏ dấu tiếng Việt + chữ thường + gộp khoảng trắng: "Hà Nội" -> "ha noi"."""
+    if not s:
+        return ""
+    s = s.replace("đ", "d").replace("Đ", "D")
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return " ".join(_TOKEN.findall(s.lower()))
+
+
+def search_terms(q: str | None, max_terms: int = 8) -> list[str]:
+    """Các từ khóa đã fold của chuỗi tìm kiếm (bỏ trùng, giữ thứ tự)."""
+    seen = []
+    for t in fold_text(q).split():
+        if t not in seen:
+            seen.append(t)
+    return seen[:max_terms]
+
+
+def fts5_query(terms: list[str]) -> str:
+    # SQLite FTS5: mọi từ đều phải có, cho phép khớp tiền tố khi đang gõ ("ha no" -> "ha noi")
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def mysql_boolean_query(terms: list[str]) -> str:
+    # MySQL FULLTEXT (parser ngram): mỗi từ là 1 cụm bắt buộc
+    return " ".join(f'+"{t}"' for t in terms)
@@ -0,0 +1,138 @@
+# benchmarks/bench_checkin_gates.py
+"""
+Tải check-in tại cổng: seed 1 sự kiện với N vé đã ký QR qua TicketIssuanceService thật,
+rồi nhiều cổng (mỗi cổng 1 thread + 1 test client) cùng bắn /api/qr/validate. Kế hoạch quét
+trộn lẫn lượt quét hợp lệ, quét trùng (cùng vé ở 2 cổng / quét lại), vé của sự kiện khác
+và QR giả. Báo cáo scans/s, p50/p95/p99, round trip DB / lượt quét và số vé bị cho vào 2 lần.
+
+    python -m benchmarks.bench_checkin_gates [--tickets 100000] [--gates 16] [--dup-rate 0.05]
+                                             [--wrong-rate 0.02] [--forged-rate 0.01] [--doors]
+
+--doors bật chế độ "mở cổng" (soát vé từ bộ nhớ) trước khi quét để so sánh với đường DB.
+Mặc định dùng SQLite file; BENCH_DATABASE_URI=mysql+pymysql://... để chạy trên MySQL.
+"""
+import argparse
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import make_app, RoundTripCounter, seed_event, make_user, make_paid_order, percentiles
+
+_ORDER_SIZE = 1000
+
+
+def _issue(db, buyer, tt, n_tickets: int):
+    from app.services.issuance_service import TicketIssuanceService
+    svc = TicketIssuanceService()
+    left = n_tickets
+    while left:
+        qty = min(_ORDER_SIZE, left)
+        order = make_paid_order(db, buyer, tt, qty)
+        svc.issue_for_order(order.id)
+        left -= qty
+
+
+def _plan(rnd, tokens, other_tokens, dup_rate, wrong_rate, forged_rate):
+    """Danh sách (loại lượt quét, token) đã xáo trộn."""
+    scans = [("first", tk) for tk in tokens]
+    scans += [("duplicate", rnd.choice(tokens)) for _ in range(int(len(tokens) * dup_rate))]
+    scans += [("wrong_event", rnd.choice(other_tokens)) for _ in range(int(len(tokens) * wrong_rate))]
+    # QR giả: đổi 1 ký tự trong chữ ký của token thật
+    for _ in range(int(len(tokens) * forged_rate)):
+        tk = rnd.choice(tokens)
+        scans.append(("forged", tk[:-2] + ("A" if tk[-2] != "A" else "B") + tk[-1]))
+    rnd.shuffle(scans)
+    return scans
+
+
+def _gate(app, organizer_id: int, event_id: int, scans: list) -> list:
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(organizer_id)
+        sess["_fresh"] = True
+    out = []
+    for kind, token in scans:
+        t = time.perf_counter()
+        r = client.post("/api/qr/validate", json={"qr": token, "event_id": event_id})
+        elapsed = time.perf_counter() - t
+        j = r.get_json(silent=True) or {}
+        out.append((kind, j.get("error") or j.get("message") or str(r.status_code),
+                    (j.get("ticket") or {}).get("id") if j.get("ok") else None, elapsed))
+    return out
+
+
+def run(n_tickets: int, gates: int, dup_rate: float, wrong_rate: float, forged_rate: float,
+        doors: bool, seed: int):
+    from app import db
+    from app.models import Ticket, TicketStatus
+
+    app = make_app()
+    rnd = random.Random(seed)
+    with app.app_context():
+        organizer = make_user(db, "gate-organizer", role="ORGANIZER")
+        buyer = make_user(db, "gate-buyer")
+        ev, (tt,) = seed_event(db, quantity=n_tickets, name="Gate bench", organizer=organizer)
+        other, (other_tt,) = seed_event(db, quantity=1000, name="Other event", organizer=organizer)
+
+        t0 = time.perf_counter()
+        _issue(db, buyer, tt, n_tickets)
+        _issue(db, buyer, other_tt, min(1000, n_tickets))
+        issue_s = time.perf_counter() - t0
+
+        tokens = [q for (q,) in db.session.query(Ticket.qr_data).filter(Ticket.event_id == ev.id)]
+        other_tokens = [q for (q,) in db.session.query(Ticket.qr_data).filter(Ticket.event_id == other.id)]
+        event_id, organizer_id = ev.id, organizer.id
+        if doors:
+            app.extensions["doors"].open(event_id)
+        counter = RoundTripCounter(db.engine)
+        db.session.remove()
+
+    scans = _plan(rnd, tokens, other_tokens, dup_rate, wrong_rate, forged_rate)
+    lanes = [scans[i::gates] for i in range(gates)]
+    print(f"{len(tokens)} vé ký qua TicketIssuanceService trong {issue_s:.1f}s; "
+          f"{len(scans)} lượt quét trên {gates} cổng ({'mở cổng / bộ nhớ' if doors else 'DB'}, "
+          f"{app.config['QR_TOKEN_FORMAT']})")
+
+    with counter.counting():
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=gates) as pool:
+            results = [r for lane in pool.map(lambda l: _gate(app, organizer_id, event_id, l), lanes) for r in lane]
+        elapsed = time.perf_counter() - t0
+
+    p = percentiles([r[3] for r in results])
+    print(f"\nThời gian: {elapsed:.2f}s  |  {len(results) / elapsed:.0f} lượt quét/s")
+    print(f"Độ trễ  p50={p[50] * 1000:.2f}ms  p95={p[95] * 1000:.2f}ms  p99={p[99] * 1000:.2f}ms")
+    print(f"Round trip DB: {counter.total} ({counter.statements} lệnh + {counter.commits} commit), "
+          f"{counter.total / max(1, len(results)):.2f} / lượt quét")
+
+    print("\nKết quả theo loại lượt quét:")
+    by_kind = Counter((kind, outcome) for kind, outcome, _, _ in results)
+    for (kind, outcome), n in sorted(by_kind.items()):
+        print(f"  {kind:<12}{outcome:<22}{n:>8}")
+
+    admitted = Counter(tid for _, _, tid, _ in results if tid is not None)
+    doubles = sum(1 for n in admitted.values() if n > 1)
+    with app.app_context():
+        used = Ticket.query.filter(Ticket.event_id == event_id, Ticket.status == TicketStatus.USED).count()
+        if doors:
+            app.extensions["doors"].close(event_id)
+    wrongly_admitted = sum(1 for kind, _, tid, _ in results if tid is not None and kind in ("wrong_event", "forged"))
+    print(f"\nVé đã vào: {len(admitted)} (USED trong DB: {used})  |  CHO VÀO 2 LẦN: {doubles}  |  "
+          f"vé sai sự kiện / QR giả được cho vào: {wrongly_admitted}")
+    return {"doubles": doubles, "wrong": wrongly_admitted, "mismatch": used != len(admitted)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=100_000)
+    parser.add_argument("--gates", type=int, default=16)
+    parser.add_argument("--dup-rate", type=float, default=0.05)
+    parser.add_argument("--wrong-rate", type=float, default=0.02)
+    parser.add_argument("--forged-rate", type=float, default=0.01)
+    parser.add_argument("--doors", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    report = run(args.tickets, args.gates, args.dup_rate, args.wrong_rate, args.forged_rate,
+                 args.doors, args.seed)
+    raise SystemExit(1 if any(report.values()) else 0)
@@ -0,0 +1,76 @@
+# benchmarks/bench_issue_tickets.py
+"""
+So sánh phát hành 10k vé cho 1 đơn hàng:
+  - legacy : add + flush từng vé để lấy id rồi ký QR (cách cũ của _issue_tickets)
+  - bulk   : TicketIssuanceService (ký theo ticket_code, 1 lệnh executemany)
+  - bulk-v2: như bulk nhưng QR_TOKEN_FORMAT=v2 (insert, đọc id, 1 UPDATE ... CASE)
+
+    python -m benchmarks.bench_issue_tickets [--tickets 10000]
+"""
+import argparse
+from datetime import datetime
+
+from benchmarks.common import make_app, RoundTripCounter, seed_event, make_user, make_paid_order, timed
+
+
+def legacy_issue(db, order_id: int):
+    from sqlalchemy.orm import joinedload
+    from app.models import OrderDetail, Ticket, TicketStatus
+    from app.dao.ticket_type_dao import add_sold
+    from app.services.issuance_service import gen_ticket_code
+    from app.utils.qr_utils import sign_payload
+
+    ods = (db.session.query(OrderDetail).options(joinedload(OrderDetail.ticket_type))
+           .filter(OrderDetail.order_id == order_id).all())
+    for od in ods:
+        add_sold(od.ticket_type_id, od.quantity)
+        for _ in range(od.quantity):
+            tk = Ticket(ticket_code=gen_ticket_code(), status=TicketStatus.ACTIVE, order_id=order_id,
+                        ticket_type_id=od.ticket_type_id, event_id=od.ticket_type.event_id)
+            db.session.add(tk)
+            db.session.flush()
+            tk.qr_data = sign_payload({"tid": tk.id, "oid": order_id, "eid": od.ticket_type.event_id})
+            tk.issued_at = datetime.utcnow()
+    db.session.commit()
+
+
+def bulk_issue(db, order_id: int):
+    from app.services.issuance_service import TicketIssuanceService
+    TicketIssuanceService().issue_for_order(order_id)
+
+
+def bulk_issue_v2(db, order_id: int):
+    from flask import current_app
+    current_app.config["QR_TOKEN_FORMAT"] = "v2"
+    try:
+        bulk_issue(db, order_id)
+    finally:
+        current_app.config["QR_TOKEN_FORMAT"] = "v1"
+
+
+def run(n_tickets: int):
+    from app import db
+    from app.models import Ticket
+
+    app = make_app()
+    with app.app_context():
+        buyer = make_user(db, "bench-buyer")
+        _, (tt,) = seed_event(db, quantity=n_tickets * 3)
+        counter = RoundTripCounter(db.engine)
+
+        print(f"Phát hành {n_tickets} vé / 1 đơn ({db.engine.url.drivername})")
+        print(f"{'mode':<8}{'time (s)':>10}{'statements':>12}{'commits':>9}{'tickets':>9}")
+        for mode, fn in (("legacy", legacy_issue), ("bulk", bulk_issue), ("bulk-v2", bulk_issue_v2)):
+            order = make_paid_order(db, buyer, tt, n_tickets)
+            db.session.expire_all()
+            with counter.counting(), timed() as t:
+                fn(db, order.id)
+            issued = Ticket.query.filter_by(order_id=order.id).count()
+            print(f"{mode:<8}{t['elapsed']:>10.3f}{counter.statements:>12}{counter.commits:>9}{issued:>9}")
+            counter.reset()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickets", type=int, default=10_000)
+    run(parser.parse_args().tickets)
@@ -0,0 +1,162 @@
+# benchmarks/bench_order_flow.py
+"""
+Tải đồng thời cho luồng mua vé thật qua Flask app:
+    xem sự kiện -> orders.create (giữ chỗ) -> orders.pay -> cổng giả lập -> return URL (phát hành vé)
+
+Seed 1 sự kiện có số vé giới hạn, cho nhiều khách (mỗi khách 1 test client + 1 tài khoản)
+mua cùng lúc rồi báo cáo throughput, p50/p95/p99, số round trip DB / đơn và quan trọng nhất:
+số vé bị bán vượt (oversell) đối chiếu bảng ticket với TicketType.quantity.
+
+    python -m benchmarks.bench_order_flow [--buyers 300] [--concurrency 50] [--stock 500]
+                                          [--max-qty 4] [--gateway VNPAY|MOMO] [--shards 1]
+
+Mặc định dùng SQLite file; BENCH_DATABASE_URI=mysql+pymysql://... để chạy trên MySQL.
+"""
+import argparse
+import random
+import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import stub_gateways
+from benchmarks.common import make_app, RoundTripCounter, seed_event, make_user, percentiles
+
+_ORDER_URL = re.compile(r"/orders/(\d+)/checkout")
+
+
+def _buy(app, user_id: int, event_id: int, tt_id: int, qty: int, gateway: str) -> dict:
+    """1 khách đi hết luồng mua; trả về kết quả + thời gian từng bước."""
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+
+    steps = {}
+    t0 = time.perf_counter()
+
+    t = time.perf_counter()
+    client.get(f"/events/{event_id}")
+    steps["browse"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    r = client.post("/orders/create", data={"event_id": event_id, f"items[{tt_id}]": qty})
+    steps["create"] = time.perf_counter() - t
+    m = _ORDER_URL.search(r.headers.get("Location", ""))
+    if r.status_code != 302 or not m:
+        return {"outcome": "sold_out", "qty": qty, "steps": steps, "total": time.perf_counter() - t0}
+    order_id = int(m.group(1))
+
+    t = time.perf_counter()
+    r = client.post(f"/orders/{order_id}/pay", data={"gateway": gateway})
+    steps["pay"] = time.perf_counter() - t
+    pay_url = r.headers.get("Location", "")
+    if r.status_code != 302 or "stub" not in pay_url:
+        return {"outcome": "pay_error", "qty": qty, "steps": steps, "total": time.perf_counter() - t0}
+
+    # "khách" thanh toán trên cổng giả lập rồi được redirect về return URL
+    path, build_query = stub_gateways.RETURN_PATHS[gateway]
+    t = time.perf_counter()
+    r = client.get(f"{path}?{build_query(pay_url)}")
+    steps["return"] = time.perf_counter() - t
+
+    outcome = "paid" if r.status_code < 500 else "return_error"
+    return {"outcome": outcome, "order_id": order_id, "qty": qty, "steps": steps,
+            "total": time.perf_counter() - t0}
+
+
+def _audit(db, event_id: int) -> dict:
+    """Đối chiếu sau khi chạy: vé phát hành thật so với tồn kho và số lượng đã đặt."""
+    from sqlalchemy import func
+    from app.models import Ticket, TicketStatus, TicketType, OrderDetail, IssuanceLedger, IssuanceStatus
+
+    db.session.expire_all()
+    report = {"oversold": 0, "over_issued_orders": 0, "counter_drift": 0}
+    for tt in TicketType.query.filter_by(event_id=event_id).all():
+        issued = (Ticket.query
+                  .filter(Ticket.ticket_type_id == tt.id,
+                          Ticket.status.in_([TicketStatus.ACTIVE, TicketStatus.USED]))
+                  .count())
+        report["issued"] = report.get("issued", 0) + issued
+        report["stock"] = report.get("stock", 0) + tt.quantity
+        report["oversold"] += max(0, issued - tt.quantity)
+        report["counter_drift"] += abs(tt.sold_count - issued)
+
+    # đơn được phát hành nhiều vé hơn số đã đặt (phát hành trùng)
+    ordered = dict(db.session.query(OrderDetail.order_id, func.sum(OrderDetail.quantity))
+                   .group_by(OrderDetail.order_id).all())
+    per_order = (db.session.query(Ticket.order_id, func.count(Ticket.id))
+                 .filter(Ticket.event_id == event_id).group_by(Ticket.order_id).all())
+    report["over_issued_orders"] = sum(1 for oid, n in per_order if n > (ordered.get(oid) or 0))
+    report["failed_issuance"] = IssuanceLedger.query.filter_by(status=IssuanceStatus.FAILED).count()
+    return report
+
+
+def run(buyers: int, concurrency: int, stock: int, max_qty: int, gateway: str, shards: int, seed: int):
+    from app import db
+    from app.dao.ticket_type_dao import set_shard_layout
+
+    patcher = stub_gateways.install()
+    app = make_app()
+    rnd = random.Random(seed)
+    try:
+        with app.app_context():
+            ev, (tt,) = seed_event(db, quantity=stock, name="Load test")
+            if shards > 1:
+                set_shard_layout(tt, shards)
+                db.session.commit()
+            users = [make_user(db, f"buyer-{i}").id for i in range(buyers)]
+            jobs = [(uid, rnd.randint(1, max_qty)) for uid in users]
+            event_id, tt_id = ev.id, tt.id
+            counter = RoundTripCounter(db.engine)
+            db.session.remove()
+
+        demand = sum(q for _, q in jobs)
+        print(f"{buyers} khách / {concurrency} đồng thời, tồn kho {stock} vé, nhu cầu {demand} vé, "
+              f"cổng {gateway}, {shards} shard")
+
+        with counter.counting():
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(lambda j: _buy(app, j[0], event_id, tt_id, j[1], gateway), jobs))
+            elapsed = time.perf_counter() - t0
+
+        outcomes = Counter(r["outcome"] for r in results)
+        paid = [r for r in results if r["outcome"] == "paid"]
+        p_total = percentiles([r["total"] for r in results])
+
+        print(f"\nThời gian: {elapsed:.2f}s  |  throughput: {len(results) / elapsed:.1f} lượt/s, "
+              f"{len(paid) / elapsed:.1f} đơn thanh toán/s")
+        print("Kết quả: " + ", ".join(f"{k}={v}" for k, v in sorted(outcomes.items())))
+        print(f"Cả luồng  p50={p_total[50] * 1000:.0f}ms  p95={p_total[95] * 1000:.0f}ms  p99={p_total[99] * 1000:.0f}ms")
+        for step in ("browse", "create", "pay", "return"):
+            samples = [r["steps"][step] for r in results if step in r["steps"]]
+            p = percentiles(samples)
+            print(f"  {step:<7} p50={p[50] * 1000:>7.1f}ms  p95={p[95] * 1000:>7.1f}ms  p99={p[99] * 1000:>7.1f}ms"
+                  f"  (n={len(samples)})")
+        print(f"Round trip DB: {counter.total} ({counter.statements} lệnh + {counter.commits} commit), "
+              f"{counter.total / max(1, len(paid)):.1f} / đơn đã thanh toán")
+
+        with app.app_context():
+            audit = _audit(db, event_id)
+        print(f"\nĐã phát hành {audit['issued']}/{audit['stock']} vé, "
+              f"{sum(r['qty'] for r in paid)} vé thuộc đơn đã thanh toán")
+        print(f"OVERSOLD: {audit['oversold']} vé  |  đơn phát hành trùng: {audit['over_issued_orders']}  |  "
+              f"lệch bộ đếm: {audit['counter_drift']}  |  phát hành thất bại: {audit['failed_issuance']}")
+        return audit
+    finally:
+        patcher.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buyers", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--max-qty", type=int, default=4)
+    parser.add_argument("--gateway", choices=sorted(stub_gateways.RETURN_PATHS), default="VNPAY")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    audit = run(args.buyers, args.concurrency, args.stock, args.max_qty, args.gateway, args.shards, args.seed)
+    raise SystemExit(1 if audit["oversold"] or audit["over_issued_orders"] else 0)
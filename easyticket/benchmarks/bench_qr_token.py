@@ -0,0 +1,96 @@
+# benchmarks/bench_qr_token.py
+"""
+So sánh token QR v1 (JSON header.payload.sig) và v2 (nhị phân gọn, base32):
+độ dài token, QR version (mức sửa lỗi M như ảnh vé), thời gian ký và verify.
+Thêm bảng ký/verify v1 trước keyring (đọc QR_SECRET + hmac.new mỗi lần) và sau
+keyring (HMAC nạp khóa sẵn, copy() mỗi lần).
+
+    python -m benchmarks.bench_qr_token [--tokens 20000]
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+import qrcode
+
+from benchmarks.common import make_app, percentiles
+
+
+def qr_version(token: str) -> int:
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M)
+    qr.add_data(token)
+    qr.make(fit=True)
+    return qr.version
+
+
+def _per_call_us(fn, items) -> float:
+    t0 = time.perf_counter()
+    for it in items:
+        fn(it)
+    return (time.perf_counter() - t0) / len(items) * 1e6
+
+
+def legacy_sign(payload: dict) -> str:
+    from flask import current_app
+    secret = current_app.config["QR_SECRET"].encode()
+    header = {"alg": "HS256", "typ": "QR"}
+    b64 = lambda b: base64.urlsafe_b64encode(b).decode().rstrip("=")
+    h = b64(json.dumps(header, separators=(",", ":"), ensure_ascii=False).encode())
+    p = b64(json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode())
+    return f"{h}.{p}.{b64(hmac.new(secret, f'{h}.{p}'.encode(), hashlib.sha256).digest())}"
+
+
+def legacy_verify(token: str):
+    from flask import current_app
+    h, p, sig = token.split(".")
+    secret = current_app.config["QR_SECRET"].encode()
+    expect = base64.urlsafe_b64encode(hmac.new(secret, f"{h}.{p}".encode(), hashlib.sha256).digest())
+    ok = hmac.compare_digest(expect.decode().rstrip("="), sig)
+    return ok, json.loads(base64.urlsafe_b64decode(p + "=" * (-len(p) % 4))), "OK"
+
+
+def run_keyring(n_tokens: int):
+    from app.utils.qr_utils import sign_payload, verify_token
+
+    payloads = [{"code": f"TKT-{i:012X}", "oid": i // 4, "eid": 42} for i in range(n_tokens)]
+    print(f"\nv1 ký/verify: trước và sau keyring ({n_tokens} token)")
+    print(f"{'impl':<9}{'sign/s':>10}{'verify/s':>11}")
+    for name, sign, verify in (("legacy", legacy_sign, legacy_verify), ("keyring", sign_payload, verify_token)):
+        sign_us = _per_call_us(sign, payloads)
+        tokens = [sign(p) for p in payloads]
+        verify_us = _per_call_us(verify, tokens)
+        print(f"{name:<9}{1e6 / sign_us:>10.0f}{1e6 / verify_us:>11.0f}")
+
+
+def run(n_tokens: int):
+    from app.utils.qr_utils import sign_payload, sign_compact, verify_token
+
+    app = make_app()
+    with app.app_context():
+        ids = [(100_000 + i, 42) for i in range(n_tokens)]
+        signers = {
+            "v1": lambda a: sign_payload({"code": f"TKT-{a[0]:012X}", "oid": a[0] // 4, "eid": a[1]}),
+            "v2": lambda a: sign_compact(a[0], a[1]),
+        }
+
+        print(f"{n_tokens} token / định dạng")
+        print(f"{'fmt':<5}{'len':>6}{'qr ver':>8}{'modules':>9}{'sign (us)':>11}{'verify (us)':>13}")
+        for fmt, sign in signers.items():
+            sign_us = _per_call_us(sign, ids)
+            tokens = [sign(a) for a in ids]
+            assert all(verify_token(t)[0] for t in tokens[:100])
+            verify_us = _per_call_us(verify_token, tokens)
+            lengths = percentiles([len(t) for t in tokens], points=(99,))
+            ver = qr_version(tokens[-1])
+            print(f"{fmt:<5}{lengths[99]:>6}{ver:>8}{17 + 4 * ver:>9}{sign_us:>11.1f}{verify_us:>13.1f}")
+
+        run_keyring(n_tokens)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=20_000)
+    run(parser.parse_args().tokens)
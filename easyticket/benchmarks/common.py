@@ -0,0 +1,167 @@
+# benchmarks/common.py
+"""
+Tiện ích dùng chung cho các benchmark: tạo app trên SQLite file (hoặc DB chỉ định
+qua BENCH_DATABASE_URI), đếm số round trip tới DB, seed dữ liệu sự kiện.
+
+Chạy từ thư mục easyticket/, ví dụ:  python -m benchmarks.bench_issue_tickets
+"""
+import os
+import tempfile
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import event as sa_event
+from werkzeug.security import generate_password_hash
+
+warnings.filterwarnings("ignore")
+
+
+def make_app(db_path: str | None = None, **config):
+    from app import create_app, db
+
+    uri = os.getenv("BENCH_DATABASE_URI")
+    if not uri:
+        db_path = db_path or os.path.join(tempfile.mkdtemp(prefix="easyticket-bench-"), "bench.db")
+        uri = f"sqlite:///{db_path}"
+
+    app = create_app({
+        "TESTING": True,
+        "WTF_CSRF_ENABLED": False,
+        "SQLALCHEMY_DATABASE_URI": uri,
+        "SQLALCHEMY_ENGINE_OPTIONS": {"connect_args": {"timeout": 60}} if uri.startswith("sqlite") else {},
+        "SECRET_KEY": "bench-secret",
+        **config,
+    })
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+class RoundTripCounter:
+    """Đếm số lệnh SQL (executemany tính là 1) và số commit gửi tới DB (an toàn đa luồng)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = 0
+        self.commits = 0
+        self._on = False
+        self._lock = threading.Lock()
+
+    def _on_execute(self, *args, **kwargs):
+        if self._on:
+            with self._lock:
+                self.statements += 1
+
+    def _on_commit(self, *args, **kwargs):
+        if self._on:
+            with self._lock:
+                self.commits += 1
+
+    @property
+    def total(self) -> int:
+        return self.statements + self.commits
+
+    def reset(self):
+        self.statements = self.commits = 0
+
+    @contextmanager
+    def counting(self):
+        sa_event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        sa_event.listen(self.engine, "commit", self._on_commit)
+        self._on = True
+        try:
+            yield self
+        finally:
+            self._on = False
+            sa_event.remove(self.engine, "before_cursor_execute", self._on_execute)
+            sa_event.remove(self.engine, "commit", self._on_commit)
+
+
+def seed_event(db, quantity: int, *, name: str = "Bench Concert", ticket_types: int = 1, organizer=None):
+    """Tạo organizer + event PUBLISHED + ticket type(s), trả về (event, [ticket_type])."""
+    from app.models import Category, EventType, Event, TicketType, EventStatus
+
+    if organizer is None:
+        organizer = make_user(db, f"org-{name}".replace(" ", "-").lower(), role="ORGANIZER")
+    cat = Category(name="Music", description="Âm nhạc", active=True)
+    et = EventType(name="CONCERT", active=True)
+    db.session.add_all([cat, et])
+    db.session.flush()
+
+    ev = Event(
+        organizer_id=organizer.id,
+        name=name,
+        description="Benchmark event",
+        status=EventStatus.PUBLISHED,
+        event_type_id=et.id,
+        category_id=cat.id,
+        start_datetime=datetime.now() + timedelta(days=1),
+        end_datetime=datetime.now() + timedelta(days=1, hours=3),
+        address="Hà Nội",
+    )
+    db.session.add(ev)
+    db.session.flush()
+
+    tts = []
+    for i in range(ticket_types):
+        tt = TicketType(event_id=ev.id, name=f"GA-{i}", description="General Admission",
+                        quantity=quantity, price=Decimal("100000"), active=True)
+        db.session.add(tt)
+        tts.append(tt)
+    db.session.commit()
+    return ev, tts
+
+
+_PWD_HASH = None
+
+
+def make_user(db, username: str, role: str = "USER"):
+    global _PWD_HASH
+    from app.models import User
+
+    _PWD_HASH = _PWD_HASH or generate_password_hash("123456")
+    u = User(first_name="Bench", last_name=username, username=username,
+             email=f"{username}@bench.local", phone=f"09{abs(hash(username)) % 10**9:09d}",
+             password=_PWD_HASH, user_role=role, active=True)
+    db.session.add(u)
+    db.session.commit()
+    return u
+
+
+def make_paid_order(db, customer, ticket_type, qty: int):
+    """Order + OrderDetail (không giữ chỗ) để benchmark phát hành vé."""
+    from app.models import Order, OrderDetail
+    from uuid import uuid4
+
+    order = Order(order_code=f"ORD-{uuid4().hex[:8].upper()}", customer_id=customer.id,
+                  total_amount=ticket_type.price * qty)
+    db.session.add(order)
+    db.session.flush()
+    db.session.add(OrderDetail(order_id=order.id, ticket_type_id=ticket_type.id,
+                               quantity=qty, price=ticket_type.price))
+    db.session.commit()
+    return order
+
+
+def percentiles(samples: list[float], points=(50, 95, 99)) -> dict[int, float]:
+    if not samples:
+        return {p: 0.0 for p in points}
+    data = sorted(samples)
+    out = {}
+    for p in points:
+        k = min(len(data) - 1, max(0, int(round(p / 100 * len(data))) - 1))
+        out[p] = data[k]
+    return out
+
+
+@contextmanager
+def timed():
+    box = {}
+    t0 = time.perf_counter()
+    yield box
+    box["elapsed"] = time.perf_counter() - t0
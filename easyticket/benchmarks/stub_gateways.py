@@ -0,0 +1,113 @@
+# benchmarks/stub_gateways.py
+"""
+Cổng thanh toán giả lập chạy trong process cho benchmark: MoMo/VNPay dùng secret cục bộ,
+"người dùng" luôn thanh toán thành công và cổng redirect về return URL với chữ ký hợp lệ.
+Không gọi mạng: requests.post của MoMoService được thay bằng hàm trả payUrl giả.
+"""
+import json
+import threading
+from itertools import count
+from unittest import mock
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from app.configs import momo_configs as MoMoConfigs, vnpay_configs as VNPayConfigs
+from app.utils.momo_utils import hmac_sha256_hex
+from app.utils.vnpay_utils import hmac_sha512
+
+MOMO_PAY_URL = "https://momo.stub/pay"
+VNPAY_PAY_URL = "https://vnpay.stub/paymentv2/vpcpay.html"
+
+_trans_no = count(10_000_000)
+_trans_lock = threading.Lock()
+
+
+def _next_trans_no() -> str:
+    with _trans_lock:
+        return str(next(_trans_no))
+
+
+class _StubResponse:
+    def __init__(self, data: dict):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def _momo_create(url, json=None, timeout=None):
+    # /create của MoMo: trả payUrl mang theo các trường cần để "cổng" redirect về sau đó
+    fields = {k: json[k] for k in ("orderId", "amount", "requestId", "orderInfo", "extraData")}
+    return _StubResponse({"resultCode": 0, "payUrl": f"{MOMO_PAY_URL}?{urlencode(fields)}"})
+
+
+def install():
+    """Cấu hình secret cục bộ + chặn HTTP ra ngoài. Trả về patcher (gọi .stop() để gỡ)."""
+    MoMoConfigs.MOMO_PARTNER_CODE = "MOMOSTUB"
+    MoMoConfigs.MOMO_ACCESS_KEY = "stub-access"
+    MoMoConfigs.MOMO_SECRET_KEY = "stub-momo-secret"
+    MoMoConfigs.MOMO_REDIRECT_URL = "http://localhost/orders/payment/momo/return"
+    MoMoConfigs.MOMO_IPN_URL = "http://localhost/orders/payment/momo/ipn"
+    MoMoConfigs.MOMO_ENDPOINT = "https://momo.stub/v2/gateway/api/create"
+    MoMoConfigs.MOMO_REQUEST_TYPE = "captureWallet"
+
+    VNPayConfigs.VNP_TMNCODE = "VNPSTUB"
+    VNPayConfigs.VNP_HASHSECRET = "stub-vnpay-secret"
+    VNPayConfigs.VNP_URL = VNPAY_PAY_URL
+    VNPayConfigs.VNP_RETURNURL = "http://localhost/orders/payment/vnpay/return"
+    VNPayConfigs.VNP_VERSION = "2.1.0"
+    VNPayConfigs.VNP_COMMAND = "pay"
+
+    patcher = mock.patch("app.services.momo_service.requests.post", side_effect=_momo_create)
+    patcher.start()
+    return patcher
+
+
+def momo_return_query(pay_url: str) -> str:
+    """Người dùng thanh toán xong trên MoMo -> query string của redirect về momo_return."""
+    q = dict(parse_qsl(urlsplit(pay_url).query))
+    params = {
+        "partnerCode": MoMoConfigs.MOMO_PARTNER_CODE,
+        "orderId": q["orderId"],
+        "requestId": q["requestId"],
+        "amount": q["amount"],
+        "orderInfo": q["orderInfo"],
+        "orderType": "momo_wallet",
+        "transId": _next_trans_no(),
+        "resultCode": "0",
+        "message": "Successful.",
+        "payType": "qr",
+        "responseTime": "1700000000000",
+        "extraData": q["extraData"],
+    }
+    keys = ["accessKey", "amount", "extraData", "message", "orderId", "orderInfo", "orderType",
+            "partnerCode", "payType", "requestId", "responseTime", "resultCode", "transId"]
+    raw = "&".join(f"{k}={MoMoConfigs.MOMO_ACCESS_KEY if k == 'accessKey' else params.get(k, '')}" for k in keys)
+    params["signature"] = hmac_sha256_hex(raw, MoMoConfigs.MOMO_SECRET_KEY)
+    return urlencode(params)
+
+
+def vnpay_return_query(pay_url: str) -> str:
+    """Người dùng thanh toán xong trên VNPay -> query string của redirect về vnpay_return."""
+    from app.services.vnpay_service import VNPayServiceImpl
+
+    q = dict(parse_qsl(urlsplit(pay_url).query))
+    params = {
+        "vnp_Amount": q["vnp_Amount"],
+        "vnp_BankCode": "NCB",
+        "vnp_OrderInfo": q["vnp_OrderInfo"],
+        "vnp_PayDate": q["vnp_CreateDate"],
+        "vnp_ResponseCode": "00",
+        "vnp_TmnCode": q["vnp_TmnCode"],
+        "vnp_TransactionNo": _next_trans_no(),
+        "vnp_TransactionStatus": "00",
+        "vnp_TxnRef": q["vnp_TxnRef"],
+    }
+    raw = VNPayServiceImpl._encode_pairs_sorted(params)
+    params["vnp_SecureHash"] = hmac_sha512(VNPayConfigs.VNP_HASHSECRET, raw)
+    return urlencode(params)
+
+
+RETURN_PATHS = {
+    "MOMO": ("/orders/payment/momo/return", momo_return_query),
+    "VNPAY": ("/orders/payment/vnpay/return", vnpay_return_query),
+}
@@ -0,0 +1,36 @@
+"""add sold/reserved inventory counters to ticket_type
+
+Revision ID: 9b2d4f6a8c10
+Revises: 63d162d3e78f
+Create Date: 2025-09-24 21:10:42.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b2d4f6a8c10'
+down_revision = '63d162d3e78f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ticket_type', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sold', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('reserved', sa.Integer(), server_default='0', nullable=False))
+
+    # khởi tạo bộ đếm từ dữ liệu vé hiện có
+    op.execute(
+        "UPDATE ticket_type SET sold = ("
+        " SELECT COUNT(*) FROM ticket"
+        " WHERE ticket.ticket_type_id = ticket_type.id"
+        " AND ticket.status IN ('ACTIVE', 'USED'))"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('ticket_type', schema=None) as batch_op:
+        batch_op.drop_column('reserved')
+        batch_op.drop_column('sold')
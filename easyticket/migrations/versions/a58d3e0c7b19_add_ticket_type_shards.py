@@ -0,0 +1,51 @@
+"""add ticket_type_shard table and shard columns
+
+Revision ID: a58d3e0c7b19
+Revises: f1a2c6e8b304
+Create Date: 2025-09-28 15:02:11.448120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a58d3e0c7b19'
+down_revision = 'f1a2c6e8b304'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ticket_type_shard',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('ticket_type_id', sa.Integer(), nullable=False),
+    sa.Column('shard_no', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('sold', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('reserved', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['ticket_type_id'], ['ticket_type.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('ticket_type_id', 'shard_no', name='uq_ticket_type_shard')
+    )
+    with op.batch_alter_table('ticket_type_shard', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ticket_type_shard_ticket_type_id'), ['ticket_type_id'], unique=False)
+
+    with op.batch_alter_table('ticket_type', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('shard_count', sa.Integer(), server_default='1', nullable=False))
+
+    with op.batch_alter_table('ticket_hold', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('shard_no', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('ticket_hold', schema=None) as batch_op:
+        batch_op.drop_column('shard_no')
+
+    with op.batch_alter_table('ticket_type', schema=None) as batch_op:
+        batch_op.drop_column('shard_count')
+
+    with op.batch_alter_table('ticket_type_shard', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ticket_type_shard_ticket_type_id'))
+
+    op.drop_table('ticket_type_shard')
@@ -0,0 +1,26 @@
+"""add index on order.created_at
+
+Revision ID: b6e94f27d0c3
+Revises: a58d3e0c7b19
+Create Date: 2025-09-29 08:41:05.377912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e94f27d0c3'
+down_revision = 'a58d3e0c7b19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_created_at'))
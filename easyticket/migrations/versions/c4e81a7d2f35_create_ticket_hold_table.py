@@ -0,0 +1,41 @@
+"""create ticket_hold table
+
+Revision ID: c4e81a7d2f35
+Revises: 9b2d4f6a8c10
+Create Date: 2025-09-25 20:42:17.905113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e81a7d2f35'
+down_revision = '9b2d4f6a8c10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ticket_hold',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('ticket_type_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['order.id'], ),
+    sa.ForeignKeyConstraint(['ticket_type_id'], ['ticket_type.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ticket_hold', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ticket_hold_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ticket_hold_order_id'), ['order_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ticket_hold', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ticket_hold_order_id'))
+        batch_op.drop_index(batch_op.f('ix_ticket_hold_expires_at'))
+
+    op.drop_table('ticket_hold')
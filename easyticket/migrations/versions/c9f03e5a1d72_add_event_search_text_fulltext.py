@@ -0,0 +1,69 @@
+"""add event.search_text + full-text index
+
+Revision ID: c9f03e5a1d72
+Revises: b6e94f27d0c3
+Create Date: 2025-09-29 15:12:40.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9f03e5a1d72'
+down_revision = 'b6e94f27d0c3'
+branch_labels = None
+depends_on = None
+
+
+FTS5_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS event_fts USING fts5("
+    "search_text, content='event', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_ai AFTER INSERT ON event BEGIN "
+    "INSERT INTO event_fts(rowid, search_text) VALUES (new.id, new.search_text); END",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_ad AFTER DELETE ON event BEGIN "
+    "INSERT INTO event_fts(event_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); END",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_au AFTER UPDATE OF search_text ON event BEGIN "
+    "INSERT INTO event_fts(event_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+    "INSERT INTO event_fts(rowid, search_text) VALUES (new.id, new.search_text); END",
+)
+
+
+def upgrade():
+    from app.utils.search_utils import fold_text
+
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('search_text', sa.Text(), nullable=True))
+
+    # điền search_text cho sự kiện đã có (bản bỏ dấu của name + description + address)
+    conn = op.get_bind()
+    event = sa.table('event', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                     sa.column('description', sa.String), sa.column('address', sa.String),
+                     sa.column('search_text', sa.Text))
+    rows = conn.execute(sa.select(event.c.id, event.c.name, event.c.description, event.c.address)).fetchall()
+    for r in rows:
+        conn.execute(event.update().where(event.c.id == r.id).values(
+            search_text=fold_text(" ".join(filter(None, (r.name, r.description, r.address))))))
+
+    if conn.dialect.name == 'mysql':
+        # cần ngram_token_size=2 (mặc định của MySQL) cho từ tiếng Việt ngắn, và tắt stopword
+        # khi tạo index: ngram bỏ mọi token chứa stopword ("a", "i") -> "ha", "an", "in" mất khỏi index
+        op.execute("SET SESSION innodb_ft_enable_stopword = OFF")
+        op.execute("ALTER TABLE event ADD FULLTEXT INDEX ix_event_search_text (search_text) WITH PARSER ngram")
+    elif conn.dialect.name == 'sqlite':
+        for ddl in FTS5_DDL:
+            op.execute(ddl)
+        op.execute("INSERT INTO event_fts(event_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == 'mysql':
+        op.execute("ALTER TABLE event DROP INDEX ix_event_search_text")
+    elif conn.dialect.name == 'sqlite':
+        for trigger in ('event_fts_ai', 'event_fts_ad', 'event_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS event_fts")
+
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.drop_column('search_text')
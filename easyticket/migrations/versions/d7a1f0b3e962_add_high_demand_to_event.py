@@ -0,0 +1,26 @@
+"""add high_demand flag to event
+
+Revision ID: d7a1f0b3e962
+Revises: c4e81a7d2f35
+Create Date: 2025-09-26 19:05:33.417620
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a1f0b3e962'
+down_revision = 'c4e81a7d2f35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('high_demand', sa.Boolean(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.drop_column('high_demand')
@@ -0,0 +1,42 @@
+"""create issuance_ledger table
+
+Revision ID: e3b59c1d7a48
+Revises: d7a1f0b3e962
+Create Date: 2025-09-27 10:26:51.803177
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b59c1d7a48'
+down_revision = 'd7a1f0b3e962'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('issuance_ledger',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('payment_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.Enum('ISSUED', name='issuancestatus'), nullable=False),
+    sa.Column('ticket_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['order.id'], ),
+    sa.ForeignKeyConstraint(['payment_id'], ['payment.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('issuance_ledger', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_issuance_ledger_order_id'), ['order_id'], unique=True)
+        batch_op.create_index(batch_op.f('ix_issuance_ledger_payment_id'), ['payment_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('issuance_ledger', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_issuance_ledger_payment_id'))
+        batch_op.drop_index(batch_op.f('ix_issuance_ledger_order_id'))
+
+    op.drop_table('issuance_ledger')
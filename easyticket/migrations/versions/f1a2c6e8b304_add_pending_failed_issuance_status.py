@@ -0,0 +1,35 @@
+"""add pending/failed issuance status and error column
+
+Revision ID: f1a2c6e8b304
+Revises: e3b59c1d7a48
+Create Date: 2025-09-28 09:14:37.219405
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a2c6e8b304'
+down_revision = 'e3b59c1d7a48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('issuance_ledger', schema=None) as batch_op:
+        batch_op.alter_column('status',
+               existing_type=sa.Enum('ISSUED', name='issuancestatus'),
+               type_=sa.Enum('PENDING', 'ISSUED', 'FAILED', name='issuancestatus'),
+               existing_nullable=False)
+        batch_op.add_column(sa.Column('error', sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    op.execute("DELETE FROM issuance_ledger WHERE status <> 'ISSUED'")
+    with op.batch_alter_table('issuance_ledger', schema=None) as batch_op:
+        batch_op.drop_column('error')
+        batch_op.alter_column('status',
+               existing_type=sa.Enum('PENDING', 'ISSUED', 'FAILED', name='issuancestatus'),
+               type_=sa.Enum('ISSUED', name='issuancestatus'),
+               existing_nullable=False)